@@ -15,3 +15,8 @@ from channels.routing import get_default_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'asg_rev.settings')
 
 application = get_default_application()
+
+# models load with the application
+from chats.persistence import start_write_behind  # noqa: E402
+
+start_write_behind()
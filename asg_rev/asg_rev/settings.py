@@ -189,6 +189,73 @@ CHANNEL_LAYERS = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env('REDIS_URL'),
+    },
+}
+
+# Roles of each user, cached for TIMEOUT seconds in the CACHES entry CACHE
+# names, see workspaces.roles. A local memory cache only suits a single
+# process, role changes are invalidated in the process that made them.
+ROLE_INDEX = {
+    'CACHE': env('ROLE_INDEX_CACHE', default='default'),
+    'TIMEOUT': env.int('ROLE_INDEX_TIMEOUT', default=60 * 60),
+}
+
+# Chat messages are written in batches when enabled, numbered and broadcast
+# as they are queued. At most MAX_PENDING messages wait to be written, a message
+# that failed MAX_ATTEMPTS writes is dropped.
+# Each daphne process leases a message id worker (0-15) in the default cache:
+# WORKER_ID, or the first free one when unset; a process whose WORKER_ID is
+# in use fails at startup, see chats.utils.claim_worker_id
+CHAT_WRITE_BEHIND = {
+    'ENABLED': env.bool('CHAT_WRITE_BEHIND', default=False),
+    'MAX_BATCH_SIZE': env.int('CHAT_WRITE_BEHIND_BATCH_SIZE', default=100),
+    'MAX_DELAY_MS': env.int('CHAT_WRITE_BEHIND_DELAY_MS', default=50),
+    'MAX_PENDING': env.int('CHAT_WRITE_BEHIND_MAX_PENDING', default=10000),
+    'MAX_ATTEMPTS': env.int('CHAT_WRITE_BEHIND_MAX_ATTEMPTS', default=5),
+    'WORKER_ID': env.int('CHAT_WORKER_ID', default=None),
+}
+
+# Client frames per socket and per user: token buckets holding BURST
+# frames, refilled at RATE frames a second. A socket is closed after
+# MAX_VIOLATIONS frames over the limit.
+CHAT_RATE_LIMIT = {
+    'ENABLED': env.bool('CHAT_RATE_LIMIT', default=True),
+    'CONNECTION_RATE': env.float('CHAT_RATE_LIMIT_CONNECTION_RATE', default=5),
+    'CONNECTION_BURST': env.int('CHAT_RATE_LIMIT_CONNECTION_BURST', default=20),
+    'USER_RATE': env.float('CHAT_RATE_LIMIT_USER_RATE', default=10),
+    'USER_BURST': env.int('CHAT_RATE_LIMIT_USER_BURST', default=40),
+    'MAX_VIOLATIONS': env.int('CHAT_RATE_LIMIT_MAX_VIOLATIONS', default=20),
+}
+
+# Frames waiting to go out to one socket before its client counts as too
+# slow and gets disconnected, 0 for no limit. Only servers whose send
+# waits for the client, like uvicorn, let the queue fill; daphne buffers
+# every frame itself, see chats.consumers.base.
+CHAT_SEND_QUEUE_SIZE = env.int('CHAT_SEND_QUEUE_SIZE', default=256)
+
+# Sockets that negotiate batching get broadcasts collected for WINDOW_MS,
+# at most MAX_SIZE of them, as one array frame.
+CHAT_BATCH = {
+    'WINDOW_MS': env.int('CHAT_BATCH_WINDOW_MS', default=5),
+    'MAX_SIZE': env.int('CHAT_BATCH_MAX_SIZE', default=100),
+}
+
+# Each worker keeps the last RING_SIZE messages of the channels its sockets
+# are in, so resuming after a short disconnect doesn't hit the database.
+CHAT_RESUME = {
+    'RING_SIZE': env.int('CHAT_RESUME_RING_SIZE', default=500),
+}
+
+CHAT_RETENTION = {
+    'ARCHIVE_DIR': env('CHAT_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'chat_archive')),
+    'PARTITION_MONTHS_AHEAD': env.int('CHAT_PARTITION_MONTHS_AHEAD', default=3),
+    'BATCH_SIZE': env.int('CHAT_RETENTION_BATCH_SIZE', default=5000),
+}
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_USE_TLS = True
@@ -0,0 +1,214 @@
+"""Retention of chat messages.
+
+Every workspace can set `message_retention_days`. Messages older than that
+are written to gzip compressed JSON lines files under
+CHAT_RETENTION['ARCHIVE_DIR']/<workspace id>/ and removed from the
+database, see `manage.py chat_retention`.
+
+On a partitioned PostgreSQL table a month partition that has expired for
+every workspace with messages in it is exported and then detached and
+dropped as a whole; whatever is left is archived and deleted in batches."""
+import datetime
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+from chats import partitions
+from chats.models.message import GroupMessage, MessageReaction
+from workspaces.models import Workspace
+
+ARCHIVE_FIELDS = (
+    'id',
+    'channel_id',
+    'sender_id',
+    'sender_name',
+    'sender_email',
+    'parent_id',
+    'content',
+    'file',
+    'reactions',
+    'created_at',
+    'edited_at',
+    'deleted_at',
+)
+
+
+class ArchiveWriter:
+    """One `<timestamp>.jsonl.gz` file per workspace, opened on first use.
+
+    Every batch is flushed to disk before the caller deletes its rows, so an
+    interrupted run leaves a readable archive of everything it removed."""
+
+    def __init__(self, root, started_at):
+        self.root = root
+        self.filename = f'{started_at:%Y%m%dT%H%M%S}.jsonl.gz'
+        self.files = {}
+        self.counts = {}
+
+    def path(self, workspace_id):
+        return os.path.join(self.root, str(workspace_id), self.filename)
+
+    def write(self, workspace_id, rows):
+        archive = self.files.get(workspace_id)
+        if archive is None:
+            path = self.path(workspace_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            archive = self.files[workspace_id] = gzip.open(path, 'at', encoding='utf-8')
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        archive.flush()
+        self.counts[workspace_id] = self.counts.get(workspace_id, 0) + len(rows)
+
+    def close(self):
+        for archive in self.files.values():
+            archive.close()
+        self.files.clear()
+
+
+def retention_cutoffs(now):
+    """workspace id -> created_at before which its messages are expired."""
+    return {
+        workspace_id: now - datetime.timedelta(days=days)
+        for workspace_id, days in Workspace.objects.exclude(
+            message_retention_days=None
+        ).values_list('id', 'message_retention_days')
+    }
+
+
+def _partition_workspaces(lower, upper):
+    """Workspaces with messages in [lower, upper), only scans that partition."""
+    return set(
+        GroupMessage.objects.filter(
+            created_at__gte=lower,
+            created_at__lt=upper
+        ).values_list('channel__category__workspace_id', flat=True).distinct()
+    )
+
+
+def _expired_partitions(now, cutoffs):
+    """Month partitions that every workspace with rows in them has expired."""
+    current_month = partitions.month_start(now)
+    for name, lower, upper in partitions.list_partitions():
+        if upper > current_month:
+            break
+        workspaces = _partition_workspaces(lower, upper)
+        if all(
+            workspace_id in cutoffs and upper <= cutoffs[workspace_id]
+            for workspace_id in workspaces
+        ):
+            yield name, lower, upper
+
+
+def _archive_batches(queryset, writer, workspace_id, batch_size, dry_run):
+    """Archive and delete `queryset` in (created_at, id) order. Returns the
+    number of messages it covered."""
+    if dry_run:
+        return queryset.count()
+
+    total = 0
+    while True:
+        batch = list(queryset.order_by('created_at', 'id').values(*ARCHIVE_FIELDS)[:batch_size])
+        if not batch:
+            return total
+        writer.write(workspace_id, batch)
+        ids = [row['id'] for row in batch]
+        with transaction.atomic():
+            # reactions don't reference messages with a database foreign key
+            MessageReaction.objects.filter(message_id__in=ids).delete()
+            GroupMessage.objects.filter(
+                id__in=ids,
+                created_at__lte=batch[-1]['created_at']
+            ).delete()
+        total += len(batch)
+
+
+def archive_partition(name, lower, upper, writer, batch_size, dry_run=False):
+    """Export a fully expired month partition, then detach and drop it."""
+    queryset = GroupMessage.objects.filter(created_at__gte=lower, created_at__lt=upper)
+    if dry_run:
+        return queryset.count()
+
+    total = 0
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(created_at__gte=last[0]).exclude(
+                created_at=last[0], id__lte=last[1]
+            )
+        batch = list(page.order_by('created_at', 'id').values(
+            'channel__category__workspace_id', *ARCHIVE_FIELDS
+        )[:batch_size])
+        if not batch:
+            break
+        by_workspace = {}
+        for row in batch:
+            by_workspace.setdefault(row.pop('channel__category__workspace_id'), []).append(row)
+        for workspace_id, rows in by_workspace.items():
+            writer.write(workspace_id, rows)
+        MessageReaction.objects.filter(message_id__in=[row['id'] for row in batch]).delete()
+        last = (batch[-1]['created_at'], batch[-1]['id'])
+        total += len(batch)
+
+    with transaction.atomic():
+        partitions.drop_partition(name)
+    return total
+
+
+def apply_retention(now, *, months_ahead=None, batch_size=None, dry_run=False):
+    """Create upcoming partitions and archive everything past retention.
+
+    Returns a summary dict of what was (or, for a dry run, would be) done."""
+    config = settings.CHAT_RETENTION
+    if months_ahead is None:
+        months_ahead = config['PARTITION_MONTHS_AHEAD']
+    if batch_size is None:
+        batch_size = config['BATCH_SIZE']
+
+    summary = {
+        'created_partitions': [],
+        'dropped_partitions': {},
+        'archived_messages': {},
+        'archive_files': {},
+    }
+    partitioned = partitions.is_partitioned()
+    if partitioned and not dry_run:
+        summary['created_partitions'] = partitions.ensure_partitions(now, months_ahead)
+
+    cutoffs = retention_cutoffs(now)
+    writer = ArchiveWriter(config['ARCHIVE_DIR'], now)
+    # ranges already handled a partition at a time
+    dropped = Q()
+    try:
+        if partitioned:
+            for name, lower, upper in list(_expired_partitions(now, cutoffs)):
+                summary['dropped_partitions'][name] = archive_partition(
+                    name, lower, upper, writer, batch_size, dry_run
+                )
+                dropped |= Q(created_at__gte=lower, created_at__lt=upper)
+
+        for workspace_id, cutoff in cutoffs.items():
+            archived = _archive_batches(
+                GroupMessage.objects.filter(
+                    channel__category__workspace_id=workspace_id,
+                    created_at__lt=cutoff
+                ).exclude(dropped),
+                writer,
+                workspace_id,
+                batch_size,
+                dry_run
+            )
+            if archived:
+                summary['archived_messages'][str(workspace_id)] = archived
+    finally:
+        writer.close()
+
+    summary['archive_files'] = {
+        str(workspace_id): writer.path(workspace_id) for workspace_id in writer.counts
+    }
+    return summary
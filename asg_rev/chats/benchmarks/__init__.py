@@ -0,0 +1,156 @@
+"""Helpers shared by the `chat_benchmark` scenarios.
+
+Every scenario runs against a throwaway test database (the same one
+`manage.py test` would create), an in-memory channel layer and a
+local-memory cache, so it can be pointed at a dev settings module without
+touching real data. Frame rate limits are off, the scenarios send as fast
+as they can."""
+import statistics
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from crum import impersonate
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chats import utils
+from users.models import User
+from workspaces.models import (
+    Workspace,
+    WorkspaceRole,
+    Category,
+    CategoryRole,
+    Channel,
+    ChannelRole,
+    Team,
+)
+
+IN_MEMORY_CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        # the default of 100 silently drops fan-out of larger runs
+        'CONFIG': {'capacity': 100000},
+    },
+}
+
+LOCAL_MEMORY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
+@contextmanager
+def benchmark_environment():
+    """Create the test database, swap in in-memory channel layer and cache
+    and lease a message id worker."""
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with override_settings(
+            CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS,
+            CACHES=LOCAL_MEMORY_CACHES,
+            CHAT_RATE_LIMIT={**settings.CHAT_RATE_LIMIT, 'ENABLED': False}
+        ):
+            # for the message ids the scenarios make
+            utils.claim_worker_id()
+            try:
+                yield
+            finally:
+                utils.release_worker_id()
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def create_fixture(*, users, channels):
+    """One workspace and category with `channels` channels that all
+    `users` users are reviewees of. Returns (users, workspace, category, channels)."""
+    owner = User.objects.create_user(
+        username='bench_owner',
+        email='bench_owner@example.com',
+        password='bench'
+    )
+    workspace = Workspace.objects.create(name='bench', owner=owner)
+    WorkspaceRole.objects.create(user=owner, workspace=workspace, role='workspace_admin')
+    category = Category.objects.create(name='bench', workspace=workspace)
+
+    members = User.objects.bulk_create([
+        User(username=f'bench_{i}', email=f'bench_{i}@example.com')
+        for i in range(users)
+    ])
+    WorkspaceRole.objects.bulk_create([
+        WorkspaceRole(user=user, workspace=workspace, role='workspace_member')
+        for user in members
+    ])
+    CategoryRole.objects.bulk_create([
+        CategoryRole(user=user, category=category, role='category_member')
+        for user in members
+    ])
+
+    bench_channels = []
+    with impersonate(owner):
+        for i in range(channels):
+            channel = Channel.objects.create(name=f'bench_{i}', category=category)
+            team = Team.objects.create(team_name='Unassigned', channel=channel)
+            ChannelRole.objects.bulk_create([
+                ChannelRole(user=user, channel=channel, role='reviewee', team=team)
+                for user in members
+            ])
+            bench_channels.append(channel)
+
+    return members, workspace, category, bench_channels
+
+
+def room_name(workspace, category, channel):
+    return f'{workspace.id}_{category.id}_{channel.id}'
+
+
+def group_chat_communicator(user, workspace, category, channel, query=''):
+    """Communicator for the group chat socket, `query` is added to the url."""
+    from asg_rev.routing import application
+
+    token = AccessToken.for_user(user)
+    return WebsocketCommunicator(
+        application,
+        f'/ws/group-chat/{room_name(workspace, category, channel)}/?token={token}{query}'
+    )
+
+
+def percentiles(samples):
+    """p50/p95/p99 of `samples` (seconds) in milliseconds."""
+    if not samples:
+        return {'p50': None, 'p95': None, 'p99': None}
+    if len(samples) == 1:
+        value = round(samples[0] * 1000, 3)
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49] * 1000, 3),
+        'p95': round(cuts[94] * 1000, 3),
+        'p99': round(cuts[98] * 1000, 3),
+    }
+
+
+class QueryCounter:
+    """Database execute wrapper counting every query it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+async def ainstall_query_counter():
+    """Count queries of the connection the thread sensitive executor uses,
+    which is where every sync_to_async and async ORM call ends up."""
+    counter = QueryCounter()
+
+    def install():
+        connection.execute_wrappers.append(counter)
+
+    await sync_to_async(install)()
+    return counter
@@ -0,0 +1,132 @@
+"""Membership questions: the role tables versus the workspace ACL.
+
+Every one of `--users` members is a reviewee of every one of `--channels`
+channels, in teams of `--team-size`. Asks which channels of the category
+each member sees, who is in each channel, who reviews it and who is in
+each team, once through the ORM and once through workspaces.acl, and
+checks both agree. Reports microseconds per question, ACL ones including
+the version check against the cache every lookup makes, the time to
+load the ACL and to save one role change and apply it."""
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from chats.benchmarks import create_fixture
+from workspaces.acl import workspace_acls
+from workspaces.models import ChannelRole, Team
+
+
+def _setup(options):
+    users, workspace, category, channels = create_fixture(
+        users=options['users'],
+        channels=options['channels']
+    )
+    team_size = options['team_size']
+    teams = []
+    for channel in channels:
+        channel_teams = Team.objects.bulk_create([
+            Team(team_name=f'bench_{i}', channel=channel)
+            for i in range(0, len(users), team_size)
+        ])
+        roles = list(ChannelRole.objects.filter(channel=channel, role='reviewee').order_by('user_id'))
+        for i, role in enumerate(roles):
+            role.team = channel_teams[i // team_size]
+        ChannelRole.objects.bulk_update(roles, ['team'])
+        teams.extend(channel_teams)
+    return users, workspace, category, channels, teams
+
+
+def _questions(users, category, channels, teams):
+    """(name, ORM calls, ACL calls) of every question asked."""
+    roles = ChannelRole.objects.order_by()
+    return [
+        (
+            'visible_channels',
+            [
+                lambda user=user: roles.filter(
+                    user=user,
+                    channel__category=category
+                ).values_list('channel_id', flat=True)
+                for user in users
+            ],
+            [
+                lambda user=user: workspace_acls.get(category.workspace_id).visible_channels(
+                    user.id, category.id
+                )
+                for user in users
+            ],
+        ),
+        (
+            'channel_members',
+            [lambda channel=channel: roles.filter(channel=channel).values_list('user_id', flat=True)
+             for channel in channels],
+            [lambda channel=channel: workspace_acls.get(category.workspace_id).channel_members_of(channel.id)
+             for channel in channels],
+        ),
+        (
+            'reviewers',
+            [lambda channel=channel: roles.filter(channel=channel, role='reviewer').values_list('user_id', flat=True)
+             for channel in channels],
+            [lambda channel=channel: workspace_acls.get(category.workspace_id).reviewers_of(channel.id)
+             for channel in channels],
+        ),
+        (
+            'team_roster',
+            [lambda team=team: roles.filter(team=team).values_list('user_id', flat=True)
+             for team in teams],
+            [lambda team=team: workspace_acls.get(category.workspace_id).team_roster(team.id)
+             for team in teams],
+        ),
+    ]
+
+
+def _time(calls):
+    """Answers of `calls` and microseconds per call."""
+    started = time.perf_counter()
+    answers = [sorted(call()) for call in calls]
+    return answers, round((time.perf_counter() - started) * 1e6 / max(len(calls), 1), 2)
+
+
+def _run(options):
+    users, workspace, category, channels, teams = _setup(options)
+
+    workspace_acls.clear()
+    started = time.perf_counter()
+    workspace_acls.get(workspace.id)
+    load_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    results = {}
+    for name, orm_calls, acl_calls in _questions(users, category, channels, teams):
+        orm_answers, orm_us = _time(orm_calls)
+        acl_answers, acl_us = _time(acl_calls)
+        assert orm_answers == acl_answers, f'{name}: the ACL disagrees with the ORM'
+        results[name] = {
+            'questions': len(orm_calls),
+            'orm_us': orm_us,
+            'acl_us': acl_us,
+            'speedup': round(orm_us / max(acl_us, 0.01), 1),
+        }
+
+    # one role change, as the signals apply it after commit
+    role = ChannelRole.objects.filter(channel=channels[0], user=users[0]).first()
+    started = time.perf_counter()
+    with transaction.atomic():
+        role.role = 'reviewer'
+        role.save()
+    update_ms = round((time.perf_counter() - started) * 1000, 3)
+    acl = workspace_acls.get(workspace.id)
+    assert users[0].id in acl.reviewers_of(channels[0].id), 'the change was not applied in place'
+
+    return {
+        'members': len(users),
+        'channels': len(channels),
+        'teams': len(teams),
+        'acl_load_ms': load_ms,
+        'role_change_ms': update_ms,
+        'questions': results,
+    }
+
+
+async def run(options):
+    return await sync_to_async(_run)(options)
@@ -0,0 +1,102 @@
+"""Fan-out of a busy channel with plain and batched broadcast frames.
+
+`--messages` chat messages are published at `--rate` a second straight to
+the channel layer group of one channel that all `--users` sockets are in,
+once to plain
+sockets and once to sockets that negotiated `?batch=1`. Every frame a
+consumer sends is one write on the real server, so frames per delivered
+message stands in for send syscalls. CPU is the process time of the whole
+delivery: consumers, channel layer and the decoding test clients."""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+
+from chats import utils
+from chats.benchmarks import (
+    create_fixture,
+    group_chat_communicator,
+    percentiles,
+)
+
+
+async def _receive(communicator, expected, stats, latencies):
+    delivered = 0
+    while delivered < expected:
+        output = await communicator.receive_output(timeout=60)
+        frame = json.loads(output['text'])
+        stats['frames'] += 1
+        messages = frame if isinstance(frame, list) else [frame]
+        received_at = time.perf_counter()
+        for message in messages:
+            latencies.append(received_at - float(message['content']))
+        delivered += len(messages)
+    stats['delivered'] += delivered
+
+
+async def _round(users, workspace, category, channel, count, rate, batch):
+    query = '&batch=1' if batch else ''
+    communicators = [
+        group_chat_communicator(user, workspace, category, channel, query)
+        for user in users
+    ]
+    for communicator in communicators:
+        connected, _ = await communicator.connect(timeout=30)
+        assert connected, 'benchmark user could not connect'
+
+    channel_layer = get_channel_layer()
+    group = utils.channel_group_name(channel.id)
+    stats = {'frames': 0, 'delivered': 0}
+    latencies = []
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    receivers = asyncio.gather(*(
+        _receive(communicator, count, stats, latencies)
+        for communicator in communicators
+    ))
+    for i in range(count):
+        # keep to the publish schedule, however long the fan-out took
+        await asyncio.sleep(max(0.0, started + i / rate - time.perf_counter()))
+        await channel_layer.group_send(group, {
+            'type': 'chat_message',
+            'message': {
+                'id': i,
+                'sender_name': 'bench',
+                'sender_email': 'bench@example.com',
+                # the publish time travels in the content to time delivery
+                'content': str(time.perf_counter()),
+                'channel': str(channel.id),
+                'created_at': None,
+            }
+        })
+    await receivers
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+    return {
+        'frames': stats['frames'],
+        'delivered': stats['delivered'],
+        'frames_per_message': round(stats['frames'] / stats['delivered'], 4),
+        'cpu_us_per_message': round(cpu / stats['delivered'] * 1e6, 2),
+        'deliveries_per_sec': round(stats['delivered'] / elapsed, 1),
+        'delivery_latency_ms': percentiles(latencies),
+    }
+
+
+async def run(options):
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=options['users'],
+        channels=1
+    )
+    count, rate = options['messages'], options['rate']
+    plain = await _round(users, workspace, category, channels[0], count, rate, batch=False)
+    batched = await _round(users, workspace, category, channels[0], count, rate, batch=True)
+    return {
+        'plain': plain,
+        'batched': batched,
+        'frames_ratio': round(plain['frames'] / batched['frames'], 1),
+        'cpu_ratio': round(plain['cpu_us_per_message'] / batched['cpu_us_per_message'], 2),
+    }
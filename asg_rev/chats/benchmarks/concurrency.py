@@ -0,0 +1,66 @@
+"""Connect and message latency as the number of concurrent sockets grows.
+
+For each concurrency level every user connects at the same time, then
+every user sends one message at the same time and waits for its own
+echo."""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+
+from chats.benchmarks import (
+    create_fixture,
+    group_chat_communicator,
+    percentiles,
+)
+
+
+async def _connect(communicator):
+    started = time.perf_counter()
+    connected, _ = await communicator.connect(timeout=60)
+    assert connected, 'benchmark user could not connect'
+    return time.perf_counter() - started
+
+
+async def _round_trip(communicator, content):
+    started = time.perf_counter()
+    await communicator.send_to(text_data=json.dumps({'content': content}))
+    while True:
+        frame = json.loads(await communicator.receive_from(timeout=60))
+        if frame.get('content') == content:
+            return time.perf_counter() - started
+
+
+async def _level(users, workspace, category, channel, concurrency):
+    communicators = [
+        group_chat_communicator(user, workspace, category, channel)
+        for user in users[:concurrency]
+    ]
+    connect_latencies = await asyncio.gather(*(
+        _connect(communicator) for communicator in communicators
+    ))
+    message_latencies = await asyncio.gather(*(
+        _round_trip(communicator, f'c{concurrency}-u{i}')
+        for i, communicator in enumerate(communicators)
+    ))
+    await asyncio.gather(*(
+        communicator.disconnect() for communicator in communicators
+    ))
+    return {
+        'concurrency': concurrency,
+        'connect_latency_ms': percentiles(connect_latencies),
+        'message_latency_ms': percentiles(message_latencies),
+    }
+
+
+async def run(options):
+    levels = sorted(options['levels'])
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=levels[-1],
+        channels=1
+    )
+    return [
+        await _level(users, workspace, category, channels[0], concurrency)
+        for concurrency in levels
+    ]
@@ -0,0 +1,60 @@
+"""Reconnect storm: every user drops and reopens its socket at once.
+
+Reports connect latency and database queries per connect for the first
+(cold cache) and second (warm cache) wave."""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+
+from chats.benchmarks import (
+    create_fixture,
+    group_chat_communicator,
+    percentiles,
+    ainstall_query_counter,
+)
+
+
+async def _connect(communicator, latencies):
+    started = time.perf_counter()
+    connected, _ = await communicator.connect(timeout=30)
+    latencies.append(time.perf_counter() - started)
+    assert connected, 'benchmark user could not connect'
+
+
+async def _wave(users, workspace, category, channels, counter):
+    communicators = [
+        group_chat_communicator(user, workspace, category, channel)
+        for user in users
+        for channel in channels
+    ]
+    latencies = []
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _connect(communicator, latencies) for communicator in communicators
+    ))
+    elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+
+    await asyncio.gather(*(
+        communicator.disconnect() for communicator in communicators
+    ))
+    return {
+        'connects': len(communicators),
+        'connects_per_sec': round(len(communicators) / elapsed, 1),
+        'connect_latency_ms': percentiles(latencies),
+        'queries_per_connect': round(queries / len(communicators), 2),
+    }
+
+
+async def run(options):
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=options['users'],
+        channels=options['channels']
+    )
+    counter = await ainstall_query_counter()
+    return {
+        'cold': await _wave(users, workspace, category, channels, counter),
+        'warm': await _wave(users, workspace, category, channels, counter),
+    }
@@ -0,0 +1,192 @@
+"""Deadline traffic: polling for review results versus pushed events.
+
+Every team submits once and is reviewed once. Without events each
+reviewee polls SubmissionRevieweeView and RevieweeIterationView and each
+reviewer polls SubmissionReviewerView every `--poll-interval` seconds to
+notice that; with events every connected socket gets one frame per
+change. Measures one poll of each endpoint and the pushed round, and
+reports both totals over a `--window` second deadline window."""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from chats.benchmarks import (
+    create_fixture,
+    group_chat_communicator,
+    percentiles,
+    ainstall_query_counter,
+)
+from workspaces.models import (
+    Assignment,
+    AssignmentStatus,
+    ChannelRole,
+    Iteration,
+    Submission,
+    Team,
+)
+
+# polls of the same endpoint measured to average out the first one
+POLL_SAMPLES = 20
+
+
+def _setup(options):
+    users, workspace, category, channels = create_fixture(
+        users=options['users'],
+        channels=options['channels']
+    )
+    team_size = options['team_size']
+    teams = {}
+    for channel in channels:
+        Assignment.objects.create(id=channel, description='bench', total_points=10)
+        teams[channel.id] = Team.objects.bulk_create([
+            Team(team_name=f'bench_{i}', channel=channel)
+            for i in range(0, len(users), team_size)
+        ])
+        roles = list(ChannelRole.objects.filter(channel=channel, role='reviewee').order_by('user_id'))
+        for i, role in enumerate(roles):
+            role.team = teams[channel.id][i // team_size]
+        ChannelRole.objects.bulk_update(roles, ['team'])
+    return users, workspace, category, channels, teams
+
+
+def _review_round(channels, teams, members, reviewer):
+    """One submission, iteration and grade per team, like the views make them."""
+    for channel in channels:
+        for team in teams[channel.id]:
+            with transaction.atomic():
+                submission = Submission.objects.create(
+                    assignment_id=channel.id,
+                    sender=members[team.id][0],
+                    sender_team=team,
+                    content='bench'
+                )
+            with transaction.atomic():
+                Iteration.objects.create(
+                    submission=submission,
+                    reviewer=reviewer,
+                    remarks='bench'
+                )
+                AssignmentStatus.objects.update_or_create(
+                    assignment_id=channel.id,
+                    team=team,
+                    defaults={'status': 'completed', 'earned_points': 7}
+                )
+
+
+def _poll_urls(workspace, category, channel, submission):
+    prefix = f'/api/workspaces/{workspace.id}/categories/{category.id}/channels/{channel.id}/submissions/'
+    return {
+        'submission_reviewee': prefix + 'reviewee/',
+        'reviewee_iterations': prefix + f'{submission.id}/reviewee-iterations/',
+        'submission_reviewer': prefix + 'reviewer/',
+    }
+
+
+def _measure_polls(workspace, category, channel, reviewee, reviewer, counter):
+    """Queries and latency of one poll of each endpoint."""
+    submission = Submission.objects.filter(sender=reviewee, assignment_id=channel.id).first()
+    results = {}
+    for name, url in _poll_urls(workspace, category, channel, submission).items():
+        # 'testserver' is only allowed under the test runner
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(reviewer if name == 'submission_reviewer' else reviewee)
+        latencies = []
+        queries_before = counter.count
+        for _ in range(POLL_SAMPLES):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, f'{name} poll failed: {response.status_code}'
+        results[name] = {
+            'queries_per_poll': round((counter.count - queries_before) / POLL_SAMPLES, 2),
+            'latency_ms': percentiles(latencies),
+        }
+    return results
+
+
+async def _receive_events(communicator, expected, latencies):
+    for _ in range(expected):
+        frame = await communicator.receive_json_from(timeout=30)
+        received_at = timezone.now()
+        assert frame.get('type') == 'event', f'unexpected frame {frame}'
+        latencies.append((received_at - parse_datetime(frame['created_at'])).total_seconds())
+
+
+async def run(options):
+    users, workspace, category, channels, teams = await sync_to_async(_setup)(options)
+    reviewer = workspace.owner
+    members = {}
+    for channel in channels:
+        for i, team in enumerate(teams[channel.id]):
+            size = options['team_size']
+            members[team.id] = users[i * size:(i + 1) * size]
+
+    sockets = []
+    for channel in channels:
+        for team in teams[channel.id]:
+            for user in members[team.id]:
+                # three events per team reach every member
+                sockets.append((group_chat_communicator(user, workspace, category, channel), 3))
+        sockets.append((
+            group_chat_communicator(reviewer, workspace, category, channel),
+            3 * len(teams[channel.id])
+        ))
+    for communicator, _ in sockets:
+        connected, _ = await communicator.connect(timeout=30)
+        assert connected, 'benchmark user could not connect'
+
+    counter = await ainstall_query_counter()
+    latencies = []
+    receiving = asyncio.gather(*(
+        _receive_events(communicator, expected, latencies)
+        for communicator, expected in sockets
+    ))
+    started = time.perf_counter()
+    await sync_to_async(_review_round)(channels, teams, members, reviewer)
+    write_queries = counter.count
+    await receiving
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*(communicator.disconnect() for communicator, _ in sockets))
+
+    event_count = sum(3 * len(teams[channel.id]) for channel in channels)
+    polls = await sync_to_async(_measure_polls)(
+        workspace, category, channels[0], users[0], reviewer, counter
+    )
+
+    # every poll interval each reviewee hits two endpoints and each reviewer one
+    rounds = options['window'] // options['poll_interval']
+    reviewee_polls = rounds * len(users) * len(channels)
+    reviewer_polls = rounds * len(channels)
+    poll_requests = 2 * reviewee_polls + reviewer_polls
+    poll_queries = (
+        reviewee_polls * polls['submission_reviewee']['queries_per_poll']
+        + reviewee_polls * polls['reviewee_iterations']['queries_per_poll']
+        + reviewer_polls * polls['submission_reviewer']['queries_per_poll']
+    )
+    return {
+        'polling': {
+            'endpoints': polls,
+            'requests': poll_requests,
+            'queries': round(poll_queries),
+        },
+        'events': {
+            'events': event_count,
+            'deliveries': len(latencies),
+            'queries': write_queries,
+            'queries_per_event': round(write_queries / event_count, 2),
+            'delivery_latency_ms': percentiles(latencies),
+            'round_sec': round(elapsed, 3),
+        },
+        # the event queries include the writes themselves, which polling
+        # has on top of its own
+        'removed': {
+            'requests': poll_requests,
+            'queries': round(poll_queries),
+            'queries_ratio': round(poll_queries / max(write_queries, 1), 1),
+        },
+    }
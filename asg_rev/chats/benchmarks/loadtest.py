@@ -0,0 +1,127 @@
+"""End to end load test: N users spread over M channels connect, each sends
+`messages` chat messages, every message fans out to the other sockets in
+its channel, then everyone disconnects.
+
+Reported: connect and fan-out latency percentiles, messages processed and
+delivered per second (a message is processed once every socket in its
+channel has received it), database queries per message and resident
+memory per open connection."""
+import asyncio
+import json
+import resource
+import time
+
+from asgiref.sync import sync_to_async
+
+from chats.benchmarks import (
+    create_fixture,
+    group_chat_communicator,
+    percentiles,
+    ainstall_query_counter,
+)
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # peak rather than current RSS, the best there is without /proc
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def _connect(communicator, latencies):
+    started = time.perf_counter()
+    connected, _ = await communicator.connect(timeout=60)
+    assert connected, 'load test user could not connect'
+    latencies.append(time.perf_counter() - started)
+
+
+async def _send(communicator, sender, count):
+    for i in range(count):
+        # the send time travels in the content so receivers can time fan-out
+        content = f'{sender}:{i}:{time.perf_counter()}'
+        await communicator.send_to(text_data=json.dumps({'content': content}))
+
+
+async def _receive(communicator, expected, fanout_latencies):
+    for _ in range(expected):
+        frame = json.loads(await communicator.receive_from(timeout=60))
+        sent_at = float(frame['content'].rsplit(':', 1)[1])
+        fanout_latencies.append(time.perf_counter() - sent_at)
+
+
+async def run(options):
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=options['users'],
+        channels=options['channels']
+    )
+    per_message = options['messages']
+
+    # user i watches channel i % M
+    assignments = [
+        (user, channels[i % len(channels)]) for i, user in enumerate(users)
+    ]
+    members = {}
+    for _, channel in assignments:
+        members[channel.id] = members.get(channel.id, 0) + 1
+
+    communicators = [
+        group_chat_communicator(user, workspace, category, channel)
+        for user, channel in assignments
+    ]
+    counter = await ainstall_query_counter()
+
+    rss_before = rss_bytes()
+    connect_latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _connect(communicator, connect_latencies) for communicator in communicators
+    ))
+    connect_elapsed = time.perf_counter() - started
+    rss_connected = rss_bytes()
+
+    fanout_latencies = []
+    queries_before = counter.count
+    started = time.perf_counter()
+    receivers = [
+        asyncio.ensure_future(_receive(
+            communicator,
+            members[channel.id] * per_message,
+            fanout_latencies
+        ))
+        for communicator, (_, channel) in zip(communicators, assignments)
+    ]
+    await asyncio.gather(*(
+        _send(communicator, f'u{i}', per_message)
+        for i, communicator in enumerate(communicators)
+    ))
+    await asyncio.gather(*receivers)
+    deliver_elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        communicator.disconnect() for communicator in communicators
+    ))
+    disconnect_elapsed = time.perf_counter() - started
+
+    sent = len(communicators) * per_message
+    return {
+        'connections': len(communicators),
+        'channels': len(channels),
+        'messages_sent': sent,
+        'messages_delivered': len(fanout_latencies),
+        'connect_latency_ms': percentiles(connect_latencies),
+        'connects_per_sec': round(len(communicators) / connect_elapsed, 1),
+        'fanout_latency_ms': percentiles(fanout_latencies),
+        'msgs_per_sec': round(sent / deliver_elapsed, 1),
+        'msgs_per_sec_delivered': round(len(fanout_latencies) / deliver_elapsed, 1),
+        'db_queries_per_message': round(queries / sent, 2),
+        'rss_bytes_per_connection': round((rss_connected - rss_before) / len(communicators)),
+        'disconnect_seconds': round(disconnect_elapsed, 3),
+    }
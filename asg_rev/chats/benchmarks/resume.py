@@ -0,0 +1,153 @@
+"""Catching up after a reconnect: reloading history versus resuming.
+
+A channel has `--history` messages when a socket drops, `--messages` more
+are posted while it is away. Without sequence numbers the client reloads
+the history through ChannelMessagesView page by page; with them it sends
+one `resume` frame with the last `seq` it saw. The resume is measured
+served from the worker's ring, while another socket keeps the channel
+warm, and from the database once the last socket left. Reports requests
+or frames, queries, bytes and time of each."""
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chats import utils
+from chats.benchmarks import (
+    ainstall_query_counter,
+    create_fixture,
+    group_chat_communicator,
+)
+from chats.models.message import GroupMessage
+from chats.persistence import abroadcast_messages, write_group_messages
+from chats.resume import RESUME_MAX_PAGE_SIZE, recent_messages
+
+
+def _messages(users, channel, start, count):
+    return [
+        GroupMessage(
+            id=utils.next_message_id(),
+            channel=channel,
+            sender=users[i % len(users)],
+            sender_name=users[i % len(users)].username,
+            sender_email=users[i % len(users)].email,
+            content=f'Message {i}, about the length of a typical chat line.',
+            created_at=timezone.now()
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def _write(messages, batch_size=1000):
+    for start in range(0, len(messages), batch_size):
+        write_group_messages(messages[start:start + batch_size])
+
+
+def _reload_history(user, workspace, category, channel, counter):
+    """Every page of ChannelMessagesView, newest page first."""
+    url = (
+        f'/api/workspaces/{workspace.id}/categories/{category.id}'
+        f'/channels/{channel.id}/chat/'
+    )
+    # 'testserver' is only allowed under the test runner
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+    requests = size = 0
+    params = {'limit': utils.HISTORY_MAX_PAGE_SIZE}
+    queries_before = counter.count
+    started = time.perf_counter()
+    while True:
+        response = client.get(url, params)
+        assert response.status_code == 200, f'history page failed: {response.status_code}'
+        requests += 1
+        size += len(response.content)
+        page = response.json()
+        if not page['has_more']:
+            break
+        params['before'] = page['results'][0]['id']
+    return {
+        'requests': requests,
+        'queries': counter.count - queries_before,
+        'bytes': size,
+        'ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+async def _resume(communicator, after, expected, counter):
+    frames = size = received = 0
+    queries_before = counter.count
+    started = time.perf_counter()
+    source = None
+    while True:
+        await communicator.send_json_to({
+            'type': 'resume',
+            'after': after,
+            'limit': RESUME_MAX_PAGE_SIZE,
+        })
+        output = await communicator.receive_output(timeout=30)
+        frames += 1
+        size += len(output['text'].encode('utf8'))
+        frame = json.loads(output['text'])
+        assert frame.get('type') == 'resume', f'unexpected frame {frame}'
+        source = frame['source']
+        received += len(frame['results'])
+        if not frame['has_more']:
+            break
+        after = frame['results'][-1]['seq']
+    assert received == expected, f'resumed {received} of {expected} messages'
+    return {
+        'frames': frames,
+        'queries': counter.count - queries_before,
+        'bytes': size,
+        'ms': round((time.perf_counter() - started) * 1000, 3),
+        'source': source,
+    }
+
+
+async def run(options):
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=2,
+        channels=1
+    )
+    channel = channels[0]
+    history, missed = options['history'], options['messages']
+    await sync_to_async(_write)(_messages(users, channel, 0, history))
+    last_seen = history
+
+    # the other member stays connected, so the worker keeps the ring
+    watcher = group_chat_communicator(users[1], workspace, category, channel)
+    connected, _ = await watcher.connect(timeout=30)
+    assert connected, 'benchmark user could not connect'
+    messages = _messages(users, channel, history, missed)
+    await sync_to_async(_write)(messages)
+    await abroadcast_messages(messages)
+    for _ in range(missed):
+        await watcher.receive_json_from(timeout=30)
+
+    counter = await ainstall_query_counter()
+    reload = await sync_to_async(_reload_history)(users[0], workspace, category, channel, counter)
+
+    communicator = group_chat_communicator(users[0], workspace, category, channel)
+    connected, _ = await communicator.connect(timeout=30)
+    assert connected, 'benchmark user could not connect'
+    from_ring = await _resume(communicator, last_seen, missed, counter)
+    await communicator.disconnect()
+    await watcher.disconnect()
+
+    recent_messages.clear()
+    communicator = group_chat_communicator(users[0], workspace, category, channel)
+    connected, _ = await communicator.connect(timeout=30)
+    assert connected, 'benchmark user could not connect'
+    from_database = await _resume(communicator, last_seen, missed, counter)
+    await communicator.disconnect()
+
+    return {
+        'missed': missed,
+        'history': history + missed,
+        'reload_history': reload,
+        'resume_memory': from_ring,
+        'resume_database': from_database,
+        'bytes_ratio': round(reload['bytes'] / max(from_database['bytes'], 1), 1),
+    }
@@ -0,0 +1,143 @@
+"""JSON text frames versus msgpack binary frames.
+
+Builds the frames the consumers send, a broadcast chat message, a
+submission event and a full history page serialized from real messages,
+and reports bytes per frame and encode/decode time per frame for both
+formats. A round of `--messages` broadcasts through `--users` msgpack and
+JSON sockets checks the end to end bytes on the wire."""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from chats import utils
+from chats.benchmarks import create_fixture, group_chat_communicator
+from chats.models.message import GroupMessage
+from chats.protocol import decode_msgpack, encode_json, encode_msgpack
+from chats.serializers.message import GroupMessageSerializer
+
+# encodes and decodes timed per frame and format
+ITERATIONS = 2000
+
+
+def _message(channel, i):
+    return {
+        'type': 'message',
+        'id': utils.next_message_id(),
+        'sender_name': f'bench_{i}',
+        'sender_email': f'bench_{i}@example.com',
+        'content': f'Message {i}, about the length of a typical chat line.',
+        'channel': str(channel.id),
+        'created_at': timezone.now().isoformat(),
+    }
+
+
+def _sample_frames(users, channel):
+    GroupMessage.objects.bulk_create([
+        GroupMessage(
+            id=utils.next_message_id(),
+            channel=channel,
+            sender=users[i % len(users)],
+            sender_name=users[i % len(users)].username,
+            sender_email=users[i % len(users)].email,
+            content=f'Message {i}, about the length of a typical chat line.'
+        )
+        for i in range(utils.HISTORY_PAGE_SIZE)
+    ])
+    page, has_more = utils.get_message_page(GroupMessage.objects.filter(channel=channel))
+    return {
+        'message': _message(channel, 0),
+        'event': {
+            'type': 'event',
+            'channel': str(channel.id),
+            'seq': 42,
+            'event': 'iteration.created',
+            'team': None,
+            'data': {'id': 7, 'submission': 3, 'reviewer': 1, 'remarks': 'Looks good.',
+                     'created_at': timezone.now().isoformat()},
+            'created_at': timezone.now().isoformat(),
+        },
+        'history_page': {
+            'type': 'history',
+            'channel': str(channel.id),
+            'results': GroupMessageSerializer(page, many=True).data,
+            'has_more': has_more,
+        },
+    }
+
+
+def _time_per_call(function, argument):
+    started = time.process_time()
+    for _ in range(ITERATIONS):
+        function(argument)
+    return round((time.process_time() - started) / ITERATIONS * 1e6, 2)
+
+
+def _compare(frame):
+    text = encode_json(frame)
+    binary = encode_msgpack(frame)
+    json_bytes = len(text.encode('utf8'))
+    return {
+        'json_bytes': json_bytes,
+        'msgpack_bytes': len(binary),
+        'size_ratio': round(len(binary) / json_bytes, 3),
+        'json_encode_us': _time_per_call(encode_json, frame),
+        'msgpack_encode_us': _time_per_call(encode_msgpack, frame),
+        'json_decode_us': _time_per_call(json.loads, text),
+        'msgpack_decode_us': _time_per_call(decode_msgpack, binary),
+    }
+
+
+async def _wire_bytes(users, workspace, category, channel, count, query):
+    communicators = [
+        group_chat_communicator(user, workspace, category, channel, query)
+        for user in users
+    ]
+    for communicator in communicators:
+        connected, _ = await communicator.connect(timeout=30)
+        assert connected, 'benchmark user could not connect'
+
+    channel_layer = get_channel_layer()
+    for i in range(count):
+        message = _message(channel, i)
+        del message['type']
+        await channel_layer.group_send(
+            utils.channel_group_name(channel.id),
+            {'type': 'chat_message', 'message': message}
+        )
+
+    async def receive(communicator):
+        total = 0
+        for _ in range(count):
+            output = await communicator.receive_output(timeout=60)
+            total += len(output['bytes']) if output.get('bytes') else len(output['text'].encode('utf8'))
+        return total
+
+    sizes = await asyncio.gather(*(receive(communicator) for communicator in communicators))
+    await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+    return sum(sizes)
+
+
+async def run(options):
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=options['users'],
+        channels=1
+    )
+    channel = channels[0]
+    frames = await sync_to_async(_sample_frames)(users, channel)
+    json_bytes = await _wire_bytes(users, workspace, category, channel, options['messages'], '')
+    msgpack_bytes = await _wire_bytes(
+        users, workspace, category, channel, options['messages'], '&format=msgpack'
+    )
+    return {
+        'frames': {name: _compare(frame) for name, frame in frames.items()},
+        'wire': {
+            'deliveries': len(users) * options['messages'],
+            'json_bytes': json_bytes,
+            'msgpack_bytes': msgpack_bytes,
+            'size_ratio': round(msgpack_bytes / json_bytes, 3),
+        },
+    }
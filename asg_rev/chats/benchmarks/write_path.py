@@ -0,0 +1,90 @@
+"""Messages per second through GroupChatConsumer with and without write-behind.
+
+With write-behind a message is broadcast when it is queued, so each
+sender's echo waits for no database round trip, and the inserts and
+their numbering happen in batches of up to `--batch-size` every
+`--delay-ms`."""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.test.utils import override_settings
+
+from chats.benchmarks import create_fixture, group_chat_communicator
+from chats.models.message import GroupMessage
+from chats.persistence import message_buffer
+
+
+async def _sender(communicator, count, prefix):
+    """Send `count` messages, each one after the echo of the previous one."""
+    for i in range(count):
+        content = f'{prefix}-{i}'
+        await communicator.send_to(text_data=json.dumps({'content': content}))
+        while True:
+            frame = json.loads(await communicator.receive_from(timeout=30))
+            if frame.get('content') == content:
+                break
+
+
+async def _drain(communicators):
+    for communicator in communicators:
+        while not await communicator.receive_nothing(timeout=0.01):
+            await communicator.receive_from()
+
+
+async def _run_mode(users, workspace, category, channel, messages):
+    communicators = [
+        group_chat_communicator(user, workspace, category, channel)
+        for user in users
+    ]
+    for communicator in communicators:
+        connected, _ = await communicator.connect()
+        assert connected, 'benchmark user could not connect'
+
+    before = await sync_to_async(GroupMessage.objects.count)()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _sender(communicator, messages, f'u{i}')
+        for i, communicator in enumerate(communicators)
+    ))
+    broadcast_done = time.perf_counter()
+    await message_buffer.flush()
+    persisted = time.perf_counter()
+
+    await _drain(communicators)
+    for communicator in communicators:
+        await communicator.disconnect()
+
+    total = len(communicators) * messages
+    written = await sync_to_async(GroupMessage.objects.count)() - before
+    return {
+        'messages': total,
+        'persisted': written,
+        'msgs_per_sec': round(total / (broadcast_done - started), 1),
+        'msgs_per_sec_incl_flush': round(total / (persisted - started), 1),
+    }
+
+
+async def run(options):
+    users, workspace, category, channels = await sync_to_async(create_fixture)(
+        users=options['users'],
+        channels=1
+    )
+    channel = channels[0]
+
+    results = {}
+    for mode, enabled in (('sync', False), ('write_behind', True)):
+        config = {
+            'ENABLED': enabled,
+            'MAX_BATCH_SIZE': options['batch_size'],
+            'MAX_DELAY_MS': options['delay_ms'],
+            'MAX_PENDING': options['messages'],
+            'MAX_ATTEMPTS': 5,
+            'WORKER_ID': 0,
+        }
+        with override_settings(CHAT_WRITE_BEHIND=config):
+            results[mode] = await _run_mode(
+                users, workspace, category, channel, options['messages']
+            )
+    return results
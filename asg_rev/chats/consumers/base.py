@@ -0,0 +1,484 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, Any, Optional
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from chats import mutations, utils
+from chats.events import aevents_after, event_group_names, parse_event_params
+from chats.membership import aget_channel_membership
+from chats.models.message import GroupMessage
+from chats.persistence import (
+    abroadcast_messages,
+    message_buffer,
+    write_behind_enabled,
+    write_group_messages,
+)
+from chats.protocol import negotiate
+from chats.ratelimit import FrameLimiter, rate_limit_enabled
+from chats.resume import amessages_after, parse_resume_params, recent_messages
+from chats.serializers.message import GroupMessageSerializer
+from chats.unread import amark_read
+
+
+class BaseChatConsumer(AsyncJsonWebsocketConsumer):
+    """Frame handling, message persistence and fan-out shared by the chat consumers.
+
+    Subclasses implement `handle_frame` for decoded client frames and keep
+    track of which channel-layer groups they joined. Every frame is
+    checked against the user's current role in its channel, and a change
+    of the user's roles (`chats.membership.send_roles_changed`) has the
+    socket leave the channels the user left, `refresh_memberships`.
+
+    Client frames go through the CHAT_RATE_LIMIT token buckets. Frames are
+    JSON text or msgpack binary as the socket negotiated (see
+    `chats.protocol`), sockets that negotiated `batch` get broadcasts as
+    arrays, one frame per CHAT_BATCH window.
+
+    Outbound frames are queued for one writer task per socket, at most
+    CHAT_SEND_QUEUE_SIZE of them; a socket whose queue is full is closed
+    with 1013 instead of piling up frames in the worker. The queue fills
+    when the ASGI server's send waits for the client's socket to drain,
+    as uvicorn's and hypercorn's do. Daphne buffers every frame and
+    returns at once, so there the queue can't see a slow reader, and dead
+    clients are dropped by its websocket pings (`--ping-interval`,
+    `--ping-timeout`)."""
+    # how often a long lived socket drops stale or broken db connections
+    connection_check_interval = 60
+    # how long `close` waits for queued frames to go out
+    close_drain_timeout = 1.0
+    rate_limit_close_code = 1008
+    slow_reader_close_code = 1013
+    # frames changing an existing message, see `change_message`
+    change_frames = ('edit', 'delete', 'react', 'unreact')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_connection_check = 0.0
+        self.limiter = None
+        self.outbound = None
+        self.writer = None
+        self.closing = False
+        self.wire = None
+        self.pending_broadcasts = []
+        self.batch_timer = None
+        # channel -> last seq a resume replayed, live copies of those are skipped
+        self.resumed: Dict[str, int] = {}
+
+    @property
+    def user(self):
+        return self.scope["user"]
+
+    async def accept(self, subprotocol=None, headers=None):
+        self.wire = negotiate(self.scope)
+        await super().accept(subprotocol or self.wire.subprotocol, headers)
+        # told when the user's roles change, see `roles_changed`
+        await self.channel_layer.group_add(utils.user_group_name(self.user.id), self.channel_name)
+        self.last_connection_check = time.monotonic()
+        if rate_limit_enabled():
+            self.limiter = FrameLimiter(self.user.id)
+        self.outbound = asyncio.Queue(maxsize=settings.CHAT_SEND_QUEUE_SIZE)
+        self.writer = asyncio.ensure_future(self.write_outbound())
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        """Queue a frame for the writer task."""
+        if self.closing:
+            return
+        if self.outbound is None:
+            await super().send(text_data, bytes_data, close)
+            return
+        try:
+            self.outbound.put_nowait((text_data, bytes_data))
+        except asyncio.QueueFull:
+            await self.drop_slow_reader()
+            return
+        if close:
+            await self.close(close)
+
+    async def write_outbound(self) -> None:
+        while True:
+            text_data, bytes_data = await self.outbound.get()
+            try:
+                await super().send(text_data, bytes_data)
+            finally:
+                self.outbound.task_done()
+
+    async def stop_writer(self, drain: bool) -> None:
+        """Stop the writer task, after it sent what is queued when `drain`."""
+        if self.writer is None:
+            return
+        if drain:
+            try:
+                await asyncio.wait_for(self.outbound.join(), self.close_drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.writer.cancel()
+        self.writer = None
+
+    async def close(self, code=None, reason=None):
+        """Close the socket once pending broadcasts and queued frames went out."""
+        if self.closing:
+            return
+        await self.flush_broadcasts()
+        self.closing = True
+        await self.stop_writer(drain=True)
+        await super().close(code, reason)
+
+    async def drop_slow_reader(self) -> None:
+        """Close a socket whose client doesn't keep up with its frames,
+        dropping what is queued for it."""
+        self.closing = True
+        self.cancel_batch_timer()
+        await self.stop_writer(drain=False)
+        await super().close(self.slow_reader_close_code)
+
+    async def disconnect(self, close_code: int) -> None:
+        """Make queued messages durable and release the db connection."""
+        self.cancel_batch_timer()
+        await self.stop_writer(drain=False)
+        if self.user.is_authenticated:
+            await self.channel_layer.group_discard(utils.user_group_name(self.user.id), self.channel_name)
+        if write_behind_enabled():
+            await message_buffer.flush()
+        await utils.aclose_old_connections()
+
+    async def check_db_connection(self) -> None:
+        """Recycle db connections per CONN_MAX_AGE, like request_finished does for http."""
+        now = time.monotonic()
+        if now - self.last_connection_check >= self.connection_check_interval:
+            self.last_connection_check = now
+            await utils.aclose_old_connections()
+
+    async def receive(self, text_data: str = None, bytes_data: bytes = None) -> None:
+        """Decode a client frame and hand it to `handle_frame`."""
+        try:
+            if not (text_data or bytes_data) or self.closing:
+                return
+            if self.limiter is not None and not self.limiter.allow():
+                await self.reject_frame()
+                return
+
+            try:
+                data = self.wire.decode(text_data, bytes_data)
+            except ValueError:
+                await self.send_error("Invalid message format")
+                return
+            await self.check_db_connection()
+            await self.handle_frame(data)
+        except Exception as e:
+            await self.send_error(f"Failed to process message: {str(e)}")
+
+    async def handle_frame(self, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def reject_frame(self) -> None:
+        """Answer a frame over the rate limit, and close the socket once
+        the client kept sending past MAX_VIOLATIONS of them."""
+        if self.limiter.exhausted:
+            await self.send_error("Rate limit exceeded, closing connection")
+            await self.close(self.rate_limit_close_code)
+        else:
+            await self.send_error("Rate limit exceeded")
+
+    async def post_message(self, channel_id: uuid.UUID, data: Dict[str, Any]) -> None:
+        """Save a chat message, or a thread reply when the frame names a
+        `parent`, and broadcast it to everyone in the channel."""
+        content = data.get('content', '').strip()
+        if not content:
+            return
+
+        parent_id = data.get('parent')
+        if parent_id is not None:
+            try:
+                parent_id = mutations.parse_message_id(parent_id, 'parent')
+                await self.flush_pending_writes()
+                await mutations.acheck_parent(channel_id, parent_id)
+            except ValueError as e:
+                await self.send_error(str(e))
+                return
+
+        message = await self.save_message(channel_id, content, parent_id)
+        await abroadcast_messages([message])
+
+    async def save_message(self, channel_id: uuid.UUID, content: str,
+                           parent_id: Optional[int] = None) -> GroupMessage:
+        """Save and number a text message. With write-behind enabled it is
+        queued instead, under an id of this worker (see
+        utils.next_message_id), to be broadcast before it is written and
+        numbered."""
+        message = GroupMessage(
+            sender=self.user,
+            sender_name=self.user.username,
+            sender_email=self.user.email,
+            content=content,
+            channel_id=channel_id,
+            parent_id=parent_id,
+            created_at=timezone.now()
+        )
+        try:
+            if write_behind_enabled():
+                message.id = utils.next_message_id()
+                await message_buffer.add(message)
+            else:
+                await sync_to_async(write_group_messages)([message])
+            return message
+        except DatabaseError as e:
+            raise ValueError(f"Failed to save message: {str(e)}")
+
+    async def send_history(self, channel_id: uuid.UUID, data: Dict[str, Any]) -> None:
+        """Send one page of channel history, same paging as ChannelMessagesView."""
+        await self.send_message_page(
+            GroupMessage.objects.filter(channel_id=channel_id, parent=None),
+            GroupMessageSerializer,
+            data,
+            channel=str(channel_id)
+        )
+
+    async def send_thread(self, channel_id: uuid.UUID, data: Dict[str, Any]) -> None:
+        """Send one page of the replies to `message`, same paging as the history."""
+        try:
+            parent_id = mutations.parse_message_id(data.get('message'))
+        except ValueError as e:
+            await self.send_error(str(e))
+            return
+
+        await self.send_message_page(
+            mutations.thread_queryset(channel_id, parent_id),
+            GroupMessageSerializer,
+            data,
+            frame_type='thread',
+            channel=str(channel_id),
+            parent=parent_id
+        )
+
+    async def send_message_page(self, queryset, serializer_class, data: Dict[str, Any],
+                                frame_type: str = 'history', **extra) -> None:
+        """Send the history page of `queryset` that `data` asks for, tagged with `extra`."""
+        try:
+            before, after, limit = utils.parse_history_params(data)
+        except ValueError as e:
+            await self.send_error(str(e))
+            return
+
+        messages, has_more = await utils.aget_message_page(
+            queryset,
+            before=before,
+            after=after,
+            limit=limit
+        )
+        await self.send_frame({
+            'type': frame_type,
+            **extra,
+            'results': serializer_class(messages, many=True).data,
+            'has_more': has_more,
+        })
+
+    async def mark_read(self, channel_id: uuid.UUID, data: Dict[str, Any]) -> None:
+        """Move the read cursor to `message` and reply with the unread count."""
+        try:
+            message_id = int(data.get('message'))
+        except (TypeError, ValueError):
+            await self.send_error("'message' must be a message id")
+            return
+
+        await self.flush_pending_writes()
+        read_state = await amark_read(self.user.id, channel_id, message_id)
+        if read_state is None:
+            await self.send_error("User is not a member of this channel")
+            return
+        await self.send_frame({
+            'type': 'read',
+            'channel': str(channel_id),
+            **read_state,
+        })
+
+    async def change_message(self, channel_id: uuid.UUID, membership: Dict[str, Any],
+                             data: Dict[str, Any]) -> None:
+        """Apply an edit, delete, react or unreact frame and broadcast the delta."""
+        frame_type = data.get('type')
+        try:
+            message_id = mutations.parse_message_id(data.get('message'))
+            await self.flush_pending_writes()
+            if frame_type == 'edit':
+                delta = await sync_to_async(mutations.edit_message)(
+                    self.user, channel_id, message_id, data.get('content')
+                )
+            elif frame_type == 'delete':
+                delta = await sync_to_async(mutations.delete_message)(
+                    self.user, membership, channel_id, message_id
+                )
+            else:
+                delta = await sync_to_async(mutations.react)(
+                    self.user,
+                    channel_id,
+                    message_id,
+                    mutations.parse_emoji(data.get('emoji')),
+                    added=frame_type == 'react'
+                )
+        except ValueError as e:
+            await self.send_error(str(e))
+            return
+
+        if delta is not None:
+            await mutations.abroadcast_delta(delta)
+
+    async def flush_pending_writes(self) -> None:
+        """Write the write-behind queue, for frames that refer to messages
+        which may still be waiting in it."""
+        if write_behind_enabled() and len(message_buffer):
+            await message_buffer.flush()
+
+    async def refresh_membership(self, channel_id: uuid.UUID,
+                                 membership: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The user's membership of the channel now, roles change while a
+        socket is open. The event groups follow a changed role or team;
+        None when the user left the channel, its event groups are left."""
+        current = await aget_channel_membership(self.user.id, channel_id)
+        if current != membership:
+            await self.leave_events(channel_id, membership)
+            if current is not None:
+                await self.join_events(channel_id, current)
+        return current
+
+    async def refresh_memberships(self) -> None:
+        """Check every channel of the socket against the user's roles now."""
+        raise NotImplementedError
+
+    async def roles_changed(self, event: Dict[str, Any]) -> None:
+        """The user's roles changed, leave the channels they left."""
+        await self.refresh_memberships()
+
+    async def join_events(self, channel_id: uuid.UUID, membership: Dict[str, Any]) -> None:
+        """Listen to the submission and grading events `membership` may see."""
+        for group in event_group_names(channel_id, membership):
+            await self.channel_layer.group_add(group, self.channel_name)
+
+    async def leave_events(self, channel_id: uuid.UUID, membership: Dict[str, Any]) -> None:
+        for group in event_group_names(channel_id, membership):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def send_events(self, channel_id: uuid.UUID, membership: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """Send the events after sequence number `after` that the socket missed."""
+        try:
+            after, limit = parse_event_params(data)
+        except ValueError as e:
+            await self.send_error(str(e))
+            return
+
+        events, has_more = await aevents_after(channel_id, membership, after, limit)
+        await self.send_frame({
+            'type': 'events',
+            'channel': str(channel_id),
+            'results': events,
+            'has_more': has_more,
+        })
+
+    async def channel_event(self, event: Dict[str, Any]) -> None:
+        """Send a submission or grading event to WebSocket."""
+        await self.send_broadcast({'type': 'event', **event['event']})
+
+    async def chat_message(self, event: Dict[str, Any]) -> None:
+        """Send chat message to WebSocket."""
+        message = event['message']
+        recent_messages.add(message)
+        seq = message.get('seq')
+        if seq is not None and seq <= self.resumed.get(message.get('channel'), 0):
+            return
+        await self.send_broadcast({'type': 'message', **message})
+
+    async def messages_numbered(self, event: Dict[str, Any]) -> None:
+        """Send the seqs write-behind messages got when they were written."""
+        messages = event['messages']
+        for message in messages:
+            recent_messages.add(message)
+        await self.send_broadcast({
+            'type': 'numbered',
+            'channel': messages[0]['channel'],
+            'seqs': [[message['id'], message['seq']] for message in messages],
+        })
+
+    async def message_delta(self, event: Dict[str, Any]) -> None:
+        """Send an edit, delete or reaction of a message to WebSocket."""
+        delta = event['delta']
+        recent_messages.patch(delta)
+        await self.send_broadcast(delta)
+
+    async def join_channel(self, channel_id: uuid.UUID) -> None:
+        """Get the channel's chat messages and keep its recent ones for resumes."""
+        await self.channel_layer.group_add(utils.channel_group_name(channel_id), self.channel_name)
+        recent_messages.retain(channel_id)
+
+    async def leave_channel(self, channel_id: uuid.UUID) -> None:
+        await self.channel_layer.group_discard(utils.channel_group_name(channel_id), self.channel_name)
+        recent_messages.release(channel_id)
+        self.resumed.pop(str(channel_id), None)
+
+    async def send_resume(self, channel_id: uuid.UUID, data: Dict[str, Any]) -> None:
+        """Send the messages after sequence number `after` that the socket missed."""
+        try:
+            after, limit = parse_resume_params(data)
+        except ValueError as e:
+            await self.send_error(str(e))
+            return
+
+        messages, has_more, source = await amessages_after(channel_id, after, limit)
+        if messages:
+            key = str(channel_id)
+            self.resumed[key] = max(self.resumed.get(key, 0), messages[-1]['seq'])
+        await self.send_frame({
+            'type': 'resume',
+            'channel': str(channel_id),
+            'results': messages,
+            'has_more': has_more,
+            'source': source,
+        })
+
+    async def send_broadcast(self, data: Dict[str, Any]) -> None:
+        """Send a frame fanned out to the channel, collected into the next
+        array frame when the socket negotiated batching."""
+        if not (self.wire and self.wire.batch):
+            await self.send_frame(data)
+            return
+
+        self.pending_broadcasts.append(data)
+        config = settings.CHAT_BATCH
+        if len(self.pending_broadcasts) >= config['MAX_SIZE']:
+            await self.flush_broadcasts()
+        elif self.batch_timer is None:
+            self.batch_timer = asyncio.get_running_loop().call_later(
+                config['WINDOW_MS'] / 1000,
+                lambda: asyncio.ensure_future(self.flush_broadcasts())
+            )
+
+    def cancel_batch_timer(self) -> None:
+        if self.batch_timer is not None:
+            self.batch_timer.cancel()
+            self.batch_timer = None
+
+    async def flush_broadcasts(self) -> None:
+        """Send the collected broadcasts as one array frame."""
+        self.cancel_batch_timer()
+        if not self.pending_broadcasts:
+            return
+        frames, self.pending_broadcasts = self.pending_broadcasts, []
+        await self.send_encoded(frames)
+
+    async def send_frame(self, data: Dict[str, Any]) -> None:
+        # collected broadcasts go first so frames keep their order
+        await self.flush_broadcasts()
+        await self.send_encoded(data)
+
+    async def send_encoded(self, data) -> None:
+        text_data, bytes_data = self.wire.encode(data)
+        await self.send(text_data=text_data, bytes_data=bytes_data)
+
+    async def send_error(self, message: str) -> None:
+        """Send error message to client."""
+        await self.send_frame({
+            'error': message
+        })
@@ -0,0 +1,94 @@
+from typing import Dict, Any, Optional
+
+from channels.exceptions import DenyConnection
+from django.db import DatabaseError
+from django.utils import timezone
+
+from chats.consumers.base import BaseChatConsumer
+from chats.direct import aopen_chat, private_group_name
+from chats.models.message import PrivateMessage
+from chats.models.private_chat import PrivateChat
+from chats.serializers.private_chat import PrivateMessageSerializer
+
+
+class DirectMessageConsumer(BaseChatConsumer):
+    """Direct chat with another user, `ws/dm/<user id>/`.
+
+    Opening the socket finds the chat on the participant pair index, or
+    starts it when both users share a workspace. Frames are
+    `{"type": "history", ...}` for a history page and `{"content": "..."}`
+    for a message; server frames carry the `chat` id."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat: Optional[PrivateChat] = None
+        self.group_name: Optional[str] = None
+
+    async def connect(self) -> None:
+        """Handle WebSocket connection."""
+        if not self.user.is_authenticated:
+            raise DenyConnection("Authentication required")
+
+        other_id = self.scope["url_route"]["kwargs"]["user_id"]
+        self.chat = await aopen_chat(self.user.id, other_id)
+        if self.chat is None:
+            raise DenyConnection("Cannot message this user")
+
+        self.group_name = private_group_name(self.chat.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code: int) -> None:
+        """Handle WebSocket disconnection."""
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        await super().disconnect(close_code)
+
+    async def handle_frame(self, data: Dict[str, Any]) -> None:
+        if data.get('type') == 'history':
+            await self.send_message_page(
+                PrivateMessage.objects.filter(chat_id=self.chat.id),
+                PrivateMessageSerializer,
+                data,
+                chat=str(self.chat.id)
+            )
+            return
+
+        await self.post_direct_message(data.get('content', ''))
+
+    async def post_direct_message(self, content: str) -> None:
+        """Save a direct message, bump the inbox order and send it to both sides."""
+        content = content.strip()
+        if not content:
+            return
+
+        message = PrivateMessage(
+            chat_id=self.chat.id,
+            sender=self.user,
+            sender_name=self.user.username,
+            sender_email=self.user.email,
+            content=content,
+            created_at=timezone.now()
+        )
+        try:
+            await message.asave(force_insert=True)
+            await PrivateChat.objects.filter(pk=self.chat.id).aupdate(
+                last_message_at=message.created_at
+            )
+        except DatabaseError as e:
+            raise ValueError(f"Failed to save message: {str(e)}")
+
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                'type': 'chat_message',
+                'message': {
+                    'id': message.id,
+                    'sender_name': message.sender_name,
+                    'sender_email': message.sender_email,
+                    'content': content,
+                    'chat': str(self.chat.id),
+                    'created_at': message.created_at.isoformat()
+                }
+            }
+        )
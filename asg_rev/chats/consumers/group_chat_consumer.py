@@ -1,20 +1,24 @@
-import json
+import uuid
 from typing import Dict, Any, Optional
-from django.shortcuts import get_object_or_404
-from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from asgiref.sync import sync_to_async
-from django.db import DatabaseError
+from urllib.parse import parse_qs
 from channels.exceptions import DenyConnection
-from workspaces.models import Channel, ChannelRole
-from chats.models.message import GroupMessage
-from users.models import User
+from chats import utils
+from chats.consumers.base import BaseChatConsumer
+from chats.membership import aget_channel_membership
+
+class GroupChatConsumer(BaseChatConsumer):
+    """One socket per channel, `ws/group-chat/<workspace>_<category>_<channel>/`.
+
+    The socket is closed once the user is removed from the channel, as
+    soon as their roles change and again on their next frame."""
+    removed_close_code = 1008
 
-class GroupChatConsumer(AsyncJsonWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.room_name: Optional[str] = None
         self.room_group_name: Optional[str] = None
-        self.channel: Optional[Channel] = None
+        self.channel_id: Optional[uuid.UUID] = None
+        self.membership: Optional[Dict[str, Any]] = None
 
     async def connect(self) -> None:
         """Handle WebSocket connection."""
@@ -24,91 +28,83 @@ class GroupChatConsumer(AsyncJsonWebsocketConsumer):
                 raise DenyConnection("Room name is required")
 
             workspace_id, category_id, channel_id = self.room_name.split("_")
-            self.room_group_name = f"group_chat_{self.room_name}"
+            self.channel_id = uuid.UUID(channel_id)
+            self.room_group_name = utils.channel_group_name(self.channel_id)
 
-            user = self.scope["user"]
-            user_exists = await sync_to_async(User.objects.filter(email=user.email).exists)()
-            if not user_exists:
+            # JWTAuthMiddleware already loaded the user from the database
+            if not self.user.is_authenticated:
                 raise DenyConnection("Authentication required")
 
-            self.channel = await sync_to_async(get_object_or_404)(Channel, id=channel_id)
-            channel_role_exists = await sync_to_async(ChannelRole.objects.filter(channel=self.channel, user=user).exists)()
-            if not channel_role_exists:
+            self.membership = await aget_channel_membership(self.user.id, self.channel_id)
+            if self.membership is None:
                 raise DenyConnection("User is not a member of this channel")
 
-            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+            await self.join_channel(self.channel_id)
+            await self.join_events(self.channel_id, self.membership)
             await self.accept()
 
         except ValueError:
             raise DenyConnection("Invalid room name format")
-        except Channel.DoesNotExist:
-            raise DenyConnection("Channel does not exist")
         except Exception as e:
             raise DenyConnection(f"Connection failed: {str(e)}")
 
+        # `?resume=<seq>` replays the messages missed since the last one seen
+        params = parse_qs(self.scope.get('query_string', b'').decode('utf8'))
+        if 'resume' in params:
+            await self.send_resume(self.channel_id, {'after': params['resume'][-1]})
+
     async def disconnect(self, close_code: int) -> None:
         """Handle WebSocket disconnection."""
-        if self.room_group_name and self.channel_name:
-            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
-
-    async def receive(self, text_data: str) -> None:
-        """Handle incoming text messages."""
-        try:
-            if not text_data:
-                return
-
-            await self.handle_text_message(text_data)
-                
-        except Exception as e:
-            await self.send_error(f"Failed to process message: {str(e)}")
-
-    async def handle_text_message(self, text_data: str) -> None:
-        """Handle regular text messages."""
-        try:
-            data = json.loads(text_data)
-            content = data.get('content', '').strip()
-
-            if not content:
-                return
-
-            message = await self.save_message(content)
-
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'chat_message',
-                    'message': {
-                        'id': message.id,
-                        'sender_name': self.scope["user"].username,
-                        'sender_email': self.scope["user"].email,
-                        'content': content,
-                        'channel': str(self.channel.id),
-                        'created_at': message.created_at.isoformat()
-                    }
-                }
-            )
-        except json.JSONDecodeError:
-            await self.send_error("Invalid message format")
-        except Exception as e:
-            await self.send_error(f"Failed to process message: {str(e)}")
-
-    async def save_message(self, content: str) -> GroupMessage:
-        """Save a text message to the database."""
-        try:
-            return await sync_to_async(GroupMessage.objects.create)(
-                sender=self.scope["user"],
-                content=content,  # Changed from text_content to content
-                channel=self.channel
-            )
-        except DatabaseError as e:
-            raise ValueError(f"Failed to save message: {str(e)}")
-
-    async def chat_message(self, event: Dict[str, Any]) -> None:
-        """Send chat message to WebSocket."""
-        await self.send(text_data=json.dumps(event['message']))
-
-    async def send_error(self, message: str) -> None:
-        """Send error message to client."""
-        await self.send(text_data=json.dumps({
-            'error': message
-        }))
\ No newline at end of file
+        if self.membership is not None:
+            await self.leave_channel(self.channel_id)
+            await self.leave_events(self.channel_id, self.membership)
+        await super().disconnect(close_code)
+
+    async def handle_frame(self, data: Dict[str, Any]) -> None:
+        """`{"type": "history", ...}` loads a history page, `{"type": "read",
+        "message": <id>}` moves the read cursor, `{"type": "events", "after":
+        <seq>}` replays missed submission and grading events, `{"type":
+        "resume", "after": <seq>}` the missed chat messages, `{"type":
+        "thread", "message": <id>, ...}` loads a page of replies, `edit`,
+        `delete`, `react` and `unreact` change a message (see
+        `chats.mutations`), anything else is a chat message, a reply when
+        it has a `parent`."""
+        if not await self.refresh():
+            return
+        if data.get('type') == 'history':
+            await self.send_history(self.channel_id, data)
+            return
+        if data.get('type') == 'read':
+            await self.mark_read(self.channel_id, data)
+            return
+        if data.get('type') == 'events':
+            await self.send_events(self.channel_id, self.membership, data)
+            return
+        if data.get('type') == 'resume':
+            await self.send_resume(self.channel_id, data)
+            return
+        if data.get('type') == 'thread':
+            await self.send_thread(self.channel_id, data)
+            return
+        if data.get('type') in self.change_frames:
+            await self.change_message(self.channel_id, self.membership, data)
+            return
+
+        await self.post_message(self.channel_id, data)
+
+    async def refresh(self) -> bool:
+        """Update the membership to the user's current role, or close the
+        socket when the user isn't a member any more. Returns whether it's
+        still open."""
+        self.membership = await self.refresh_membership(self.channel_id, self.membership)
+        if self.membership is not None:
+            return True
+
+        await self.leave_channel(self.channel_id)
+        await self.send_error("User is not a member of this channel")
+        await self.close(self.removed_close_code)
+        return False
+
+    async def refresh_memberships(self) -> None:
+        if self.membership is not None:
+            await self.refresh()
@@ -0,0 +1,153 @@
+import uuid
+from typing import Dict, Any, Optional
+
+from channels.exceptions import DenyConnection
+
+from chats.consumers.base import BaseChatConsumer
+from chats.membership import aget_channel_membership
+
+
+class MultiplexChatConsumer(BaseChatConsumer):
+    """One authenticated socket per user session, `ws/chat/`.
+
+    Channels are joined on demand instead of opening a socket per room:
+
+        {"type": "subscribe", "channel": "<uuid>", "resume": <seq>}
+        {"type": "unsubscribe", "channel": "<uuid>"}
+        {"type": "message", "channel": "<uuid>", "content": "...", "parent": <id>}
+        {"type": "history", "channel": "<uuid>", "before": <id>, "limit": <n>}
+        {"type": "read", "channel": "<uuid>", "message": <id>}
+        {"type": "events", "channel": "<uuid>", "after": <seq>, "limit": <n>}
+        {"type": "resume", "channel": "<uuid>", "after": <seq>, "limit": <n>}
+        {"type": "thread", "channel": "<uuid>", "message": <id>, "before": <id>, "limit": <n>}
+        {"type": "edit", "channel": "<uuid>", "message": <id>, "content": "..."}
+        {"type": "delete", "channel": "<uuid>", "message": <id>}
+        {"type": "react", "channel": "<uuid>", "message": <id>, "emoji": "..."}
+        {"type": "unreact", "channel": "<uuid>", "message": <id>, "emoji": "..."}
+
+    A subscription also delivers the channel's submission and grading
+    events as `{"type": "event", "seq": <n>, ...}`; after a reconnect the
+    `events` frame replays the ones after the last `seq` seen. Chat
+    messages carry a gapless per channel `seq` too, `resume` (or the
+    optional `resume` of `subscribe`) sends the ones after the last seen.
+    With write-behind on, messages are sent before they are written and
+    numbered, their seqs follow as `{"type": "numbered", "seqs": [[<id>,
+    <seq>], ...]}`.
+    Changes to existing messages arrive as deltas, see `chats.mutations`.
+
+    Every server frame carries the `channel` it belongs to.
+
+    A user removed from a channel is unsubscribed from it, as soon as
+    their roles change and again when a frame names the channel."""
+    max_subscriptions = 200
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # channel id -> membership ({'role', 'team_id'}) of the user
+        self.subscriptions: Dict[uuid.UUID, Dict[str, Any]] = {}
+
+    async def connect(self) -> None:
+        """Handle WebSocket connection."""
+        if not self.user.is_authenticated:
+            raise DenyConnection("Authentication required")
+        await self.accept()
+
+    async def disconnect(self, close_code: int) -> None:
+        """Handle WebSocket disconnection."""
+        for channel_id, membership in list(self.subscriptions.items()):
+            await self.leave_channel(channel_id)
+            await self.leave_events(channel_id, membership)
+        self.subscriptions.clear()
+        await super().disconnect(close_code)
+
+    async def handle_frame(self, data: Dict[str, Any]) -> None:
+        frame_type = data.get('type')
+        try:
+            channel_id = uuid.UUID(str(data.get('channel')))
+        except ValueError:
+            await self.send_error("A valid 'channel' is required")
+            return
+
+        if frame_type == 'subscribe':
+            await self.subscribe(channel_id, data.get('resume'))
+        elif frame_type == 'unsubscribe':
+            await self.unsubscribe(channel_id)
+        elif frame_type not in ('message', 'history', 'read', 'events', 'resume', 'thread',
+                                *self.change_frames):
+            await self.send_error(f"Unknown frame type '{frame_type}'")
+        elif channel_id not in self.subscriptions:
+            await self.send_error("Subscribe to the channel first")
+        elif not await self.refresh_subscription(channel_id):
+            await self.send_error("User is not a member of this channel")
+        elif frame_type == 'history':
+            await self.send_history(channel_id, data)
+        elif frame_type == 'read':
+            await self.mark_read(channel_id, data)
+        elif frame_type == 'events':
+            await self.send_events(channel_id, self.subscriptions[channel_id], data)
+        elif frame_type == 'resume':
+            await self.send_resume(channel_id, data)
+        elif frame_type == 'thread':
+            await self.send_thread(channel_id, data)
+        elif frame_type in self.change_frames:
+            await self.change_message(channel_id, self.subscriptions[channel_id], data)
+        else:
+            await self.post_message(channel_id, data)
+
+    async def subscribe(self, channel_id: uuid.UUID, resume: Optional[int] = None) -> None:
+        if channel_id in self.subscriptions:
+            if not await self.refresh_subscription(channel_id):
+                await self.send_error("User is not a member of this channel")
+                return
+        else:
+            if len(self.subscriptions) >= self.max_subscriptions:
+                await self.send_error("Too many subscriptions")
+                return
+
+            membership = await aget_channel_membership(self.user.id, channel_id)
+            if membership is None:
+                await self.send_error("User is not a member of this channel")
+                return
+
+            self.subscriptions[channel_id] = membership
+            await self.join_channel(channel_id)
+            await self.join_events(channel_id, membership)
+
+        await self.send_frame({
+            'type': 'subscribed',
+            'channel': str(channel_id),
+            'role': self.subscriptions[channel_id]['role'],
+        })
+        if resume is not None:
+            await self.send_resume(channel_id, {'after': resume})
+
+    async def unsubscribe(self, channel_id: uuid.UUID) -> None:
+        membership = self.subscriptions.pop(channel_id, None)
+        if membership is not None:
+            await self.leave_channel(channel_id)
+            await self.leave_events(channel_id, membership)
+        await self.send_frame({
+            'type': 'unsubscribed',
+            'channel': str(channel_id),
+        })
+
+    async def refresh_subscription(self, channel_id: uuid.UUID) -> bool:
+        """Update the subscription to the user's current role, or drop it
+        and tell the client when the user isn't a member any more. Returns
+        whether it's kept."""
+        membership = await self.refresh_membership(channel_id, self.subscriptions[channel_id])
+        if membership is not None:
+            self.subscriptions[channel_id] = membership
+            return True
+
+        del self.subscriptions[channel_id]
+        await self.leave_channel(channel_id)
+        await self.send_frame({
+            'type': 'unsubscribed',
+            'channel': str(channel_id),
+        })
+        return False
+
+    async def refresh_memberships(self) -> None:
+        for channel_id in list(self.subscriptions):
+            await self.refresh_subscription(channel_id)
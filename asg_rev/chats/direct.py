@@ -0,0 +1,77 @@
+"""Direct messages between two users.
+
+A PrivateChat is keyed by its sorted participant pair, so finding or
+opening the chat of two users is one lookup on the unique pair index. A
+chat can only be started between users that share a workspace; once it
+exists that is not checked again."""
+from django.db.models import F, Q
+
+from chats.models.private_chat import PrivateChat
+from workspaces.models import WorkspaceRole
+
+
+def participant_pair(user_id, other_id):
+    """(user_low, user_high) ids of the chat between two users."""
+    return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+
+def private_group_name(chat_id):
+    """Channel layer group every socket of a direct chat joins."""
+    return f"private_chat_{chat_id}"
+
+
+def _chat(user_id, other_id):
+    low, high = participant_pair(user_id, other_id)
+    return PrivateChat.objects.filter(user_low_id=low, user_high_id=high)
+
+
+def _shared_workspace(user_id, other_id):
+    return WorkspaceRole.objects.filter(
+        user_id=other_id,
+        workspace__in=WorkspaceRole.objects.filter(user_id=user_id).values('workspace')
+    )
+
+
+def open_chat(user_id, other_id):
+    """The chat between two users, created on first contact. Returns None
+    when they cannot message each other."""
+    if user_id == other_id:
+        return None
+    chat = _chat(user_id, other_id).first()
+    if chat is not None:
+        return chat
+    if not _shared_workspace(user_id, other_id).exists():
+        return None
+    low, high = participant_pair(user_id, other_id)
+    chat, _ = PrivateChat.objects.get_or_create(user_low_id=low, user_high_id=high)
+    return chat
+
+
+async def aopen_chat(user_id, other_id):
+    """Async ORM version of `open_chat`."""
+    if user_id == other_id:
+        return None
+    chat = await _chat(user_id, other_id).afirst()
+    if chat is not None:
+        return chat
+    if not await _shared_workspace(user_id, other_id).aexists():
+        return None
+    low, high = participant_pair(user_id, other_id)
+    chat, _ = await PrivateChat.objects.aget_or_create(user_low_id=low, user_high_id=high)
+    return chat
+
+
+def user_chats(user):
+    """Chats the user takes part in."""
+    return PrivateChat.objects.filter(Q(user_low=user) | Q(user_high=user))
+
+
+def inbox(user):
+    """The user's chats, most recent conversation first."""
+    return user_chats(user).select_related(
+        'user_low',
+        'user_high'
+    ).order_by(
+        F('last_message_at').desc(nulls_last=True),
+        '-created_at'
+    )
@@ -0,0 +1,118 @@
+"""Submission and grading events pushed to channel sockets.
+
+Every event takes the next sequence number of its channel and is stored
+in the transaction that made the change, then sent over the channel layer
+once that transaction commits. Reviewers of the channel get all events,
+reviewees only the ones of their own team, so a reviewee sees gaps where
+other teams' events were. A socket that was away asks for the events
+after the last number it saw, see `aevents_after`."""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from chats import sequences
+from chats.models.event import ChannelEvent
+
+EVENT_PAGE_SIZE = 100
+EVENT_MAX_PAGE_SIZE = 500
+
+SUBMISSION_CREATED = 'submission.created'
+SUBMISSION_UPDATED = 'submission.updated'
+SUBMISSION_DELETED = 'submission.deleted'
+ITERATION_CREATED = 'iteration.created'
+ASSIGNMENT_STATUS_CHANGED = 'assignment_status.changed'
+
+
+def reviewers_group_name(channel_id):
+    """Channel layer group of the reviewers' sockets of a channel."""
+    return f"events_{channel_id}_reviewers"
+
+
+def team_group_name(channel_id, team_id):
+    """Channel layer group of a team's sockets in a channel."""
+    return f"events_{channel_id}_{team_id}"
+
+
+def event_group_names(channel_id, membership):
+    """Groups a socket with `membership` ({'role', 'team_id'}) listens on."""
+    if membership['role'] == 'reviewer':
+        return [reviewers_group_name(channel_id)]
+    if membership['team_id'] is None:
+        return []
+    return [team_group_name(channel_id, membership['team_id'])]
+
+
+def serialize_event(event):
+    return {
+        'channel': str(event.channel_id),
+        'seq': event.seq,
+        'event': event.event,
+        'team': str(event.team_id) if event.team_id else None,
+        'data': event.data,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+def send_event(event):
+    """Send a stored event to the sockets allowed to see it."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = {'type': 'channel_event', 'event': serialize_event(event)}
+    send = async_to_sync(channel_layer.group_send)
+    send(reviewers_group_name(event.channel_id), message)
+    if event.team_id is not None:
+        send(team_group_name(event.channel_id, event.team_id), message)
+
+
+def record_event(channel_id, team_id, event, data):
+    """Store an event under the channel's next sequence number and send it
+    once the current transaction commits."""
+    with transaction.atomic():
+        channel_event = ChannelEvent.objects.create(
+            channel_id=channel_id,
+            seq=sequences.take(channel_id, 'last_event_seq'),
+            team_id=team_id,
+            event=event,
+            data=data
+        )
+    transaction.on_commit(lambda: send_event(channel_event))
+    return channel_event
+
+
+def parse_event_params(params):
+    """Validate `after` and `limit` event params.
+
+    Raises ValueError with a client facing message on bad input."""
+    after = params.get('after')
+    try:
+        after = 0 if after in (None, '') else int(after)
+    except (TypeError, ValueError):
+        raise ValueError("'after' must be a sequence number")
+
+    limit = params.get('limit')
+    try:
+        limit = EVENT_PAGE_SIZE if limit in (None, '') else int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be a number")
+    return max(0, after), max(1, min(limit, EVENT_MAX_PAGE_SIZE))
+
+
+def visible_events(channel_id, membership):
+    """Events of the channel a member with `membership` may see."""
+    events = ChannelEvent.objects.filter(channel_id=channel_id)
+    if membership['role'] != 'reviewer':
+        events = events.filter(team_id=membership['team_id'])
+    return events
+
+
+async def aevents_after(channel_id, membership, after, limit=EVENT_PAGE_SIZE):
+    """Visible events after sequence number `after`, oldest first, as
+    (serialized events, has_more)."""
+    events = [
+        serialize_event(event)
+        async for event in visible_events(channel_id, membership).filter(
+            seq__gt=after
+        ).order_by('seq')[:limit + 1]
+    ]
+    return events[:limit], len(events) > limit
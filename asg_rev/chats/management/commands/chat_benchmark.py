@@ -0,0 +1,102 @@
+import json
+import platform
+import subprocess
+from importlib import import_module
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from chats.benchmarks import benchmark_environment
+
+SCENARIOS = {
+    'acl': 'chats.benchmarks.acl',
+    'concurrency': 'chats.benchmarks.concurrency',
+    'batching': 'chats.benchmarks.batching',
+    'connect': 'chats.benchmarks.connect',
+    'events': 'chats.benchmarks.events',
+    'loadtest': 'chats.benchmarks.loadtest',
+    'resume': 'chats.benchmarks.resume',
+    'wire-format': 'chats.benchmarks.wire_format',
+    'write-path': 'chats.benchmarks.write_path',
+}
+
+REPORTED_OPTIONS = (
+    'users',
+    'channels',
+    'messages',
+    'levels',
+    'batch_size',
+    'delay_ms',
+    'team_size',
+    'poll_interval',
+    'window',
+    'rate',
+    'history',
+)
+
+
+def current_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a websocket chat benchmark against a throwaway test database "
+        "and print the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--channels', type=int, default=1)
+        parser.add_argument('--messages', type=int, default=50,
+                            help="messages sent per user")
+        parser.add_argument('--levels', type=int, nargs='+', default=[1, 10, 50, 100],
+                            help="concurrency levels for the concurrency scenario")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="write-behind MAX_BATCH_SIZE")
+        parser.add_argument('--delay-ms', type=int, default=50,
+                            help="write-behind MAX_DELAY_MS")
+        parser.add_argument('--team-size', type=int, default=3,
+                            help="reviewees per team for the events and acl scenarios")
+        parser.add_argument('--poll-interval', type=int, default=30,
+                            help="seconds between polls the events scenario compares against")
+        parser.add_argument('--window', type=int, default=3600,
+                            help="seconds of deadline traffic the events scenario extrapolates to")
+        parser.add_argument('--rate', type=int, default=500,
+                            help="messages per second published by the batching scenario")
+        parser.add_argument('--history', type=int, default=2000,
+                            help="messages in the channel before the resume scenario's disconnect")
+        parser.add_argument('--output', help="also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        scenario = import_module(SCENARIOS[options['scenario']])
+        with benchmark_environment():
+            results = async_to_sync(scenario.run)(options)
+
+        report = {
+            'scenario': options['scenario'],
+            'revision': current_revision(),
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'options': {key: options[key] for key in REPORTED_OPTIONS},
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        self.stdout.write(output)
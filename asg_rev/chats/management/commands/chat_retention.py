@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chats.archive import apply_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly chat message partitions and archive "
+        "messages past their workspace's retention to compressed JSON lines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int,
+                            help="future monthly partitions to keep ready "
+                                 "(default CHAT_RETENTION['PARTITION_MONTHS_AHEAD'])")
+        parser.add_argument('--batch-size', type=int,
+                            help="messages archived per batch "
+                                 "(default CHAT_RETENTION['BATCH_SIZE'])")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="only report what would be archived")
+
+    def handle(self, *args, **options):
+        summary = apply_retention(
+            timezone.now(),
+            months_ahead=options['months_ahead'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+        self.stdout.write(json.dumps(summary, indent=2))
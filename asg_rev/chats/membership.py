@@ -0,0 +1,25 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from chats import utils
+from workspaces.roles import aget_role_index
+
+
+async def aget_channel_membership(user_id, channel_id):
+    """Role and team of the user in the channel ({'role', 'team_id'}), or
+    None. Served from the user's role index, see workspaces.roles."""
+    index = await aget_role_index(user_id)
+    return index.channel_membership(channel_id)
+
+
+def send_roles_changed(user_ids):
+    """Have the open sockets of the users check their channels again."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not user_ids:
+        return
+
+    async def send():
+        for user_id in user_ids:
+            await channel_layer.group_send(utils.user_group_name(user_id), {'type': 'roles_changed'})
+
+    async_to_sync(send)()
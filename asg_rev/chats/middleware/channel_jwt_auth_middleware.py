@@ -1,14 +1,14 @@
 from urllib.parse import parse_qs
 
 from channels.auth import AuthMiddlewareStack
-from channels.db import database_sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-from django.db import close_old_connections
 from jwt import InvalidSignatureError, ExpiredSignatureError, DecodeError
 from jwt import decode as jwt_decode
 
+from chats.utils import aclose_old_connections
+
 User = get_user_model()
 
 
@@ -21,7 +21,7 @@ class JWTAuthMiddleware:
 
     async def __call__(self, scope, receive, send):
         """Authenticate the user based on jwt."""
-        close_old_connections()
+        await aclose_old_connections()
         try:
             # Decode the query string and get token parameter from it.
             token = parse_qs(scope["query_string"].decode("utf8")).get('token', None)[0]
@@ -36,11 +36,10 @@ class JWTAuthMiddleware:
             scope['user'] = AnonymousUser()
         return await self.app(scope, receive, send)
 
-    @database_sync_to_async
-    def get_user(self, user_id):
+    async def get_user(self, user_id):
         """Return the user based on user id."""
         try:
-            return User.objects.get(id=user_id)
+            return await User.objects.aget(id=user_id)
         except User.DoesNotExist:
             return AnonymousUser()
 
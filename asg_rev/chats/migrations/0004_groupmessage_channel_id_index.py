@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_rename_text_content_message_content'),
+        ('workspaces', '0005_iteration_reviewee'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['channel', 'message_ptr'], name='chats_group_channel_id_idx'),
+        ),
+    ]
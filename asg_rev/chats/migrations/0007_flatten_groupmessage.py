@@ -0,0 +1,216 @@
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import migrations, models, transaction
+
+# rows copied per transaction, each batch only locks what it touches
+BATCH_SIZE = 5000
+
+
+def copy_messages(apps, schema_editor):
+    """Copy chats_message + chats_groupmessage rows into the flat table,
+    filling in the sender's name and email, one committed batch at a time."""
+    OldGroupMessage = apps.get_model('chats', 'GroupMessage')
+    FlatGroupMessage = apps.get_model('chats', 'FlatGroupMessage')
+    db_alias = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        batch = list(
+            OldGroupMessage.objects.using(db_alias).filter(
+                message_ptr_id__gt=last_id
+            ).order_by('message_ptr_id').values(
+                'message_ptr_id',
+                'sender_id',
+                'sender__username',
+                'sender__email',
+                'content',
+                'file',
+                'created_at',
+                'channel_id',
+            )[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        with transaction.atomic(using=db_alias):
+            FlatGroupMessage.objects.using(db_alias).bulk_create([
+                FlatGroupMessage(
+                    id=row['message_ptr_id'],
+                    sender_id=row['sender_id'],
+                    sender_name=row['sender__username'],
+                    sender_email=row['sender__email'],
+                    content=row['content'],
+                    file=row['file'],
+                    created_at=row['created_at'],
+                    channel_id=row['channel_id'],
+                )
+                for row in batch
+            ])
+        last_id = batch[-1]['message_ptr_id']
+
+    reset_sequence(FlatGroupMessage, schema_editor)
+
+
+def copy_messages_back(apps, schema_editor):
+    Message = apps.get_model('chats', 'Message')
+    OldGroupMessage = apps.get_model('chats', 'GroupMessage')
+    FlatGroupMessage = apps.get_model('chats', 'FlatGroupMessage')
+    connection = schema_editor.connection
+    db_alias = connection.alias
+
+    last_id = 0
+    while True:
+        batch = list(
+            FlatGroupMessage.objects.using(db_alias).filter(
+                id__gt=last_id
+            ).order_by('id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        with transaction.atomic(using=db_alias):
+            Message.objects.using(db_alias).bulk_create([
+                Message(
+                    id=message.id,
+                    sender_id=message.sender_id,
+                    content=message.content,
+                    file=message.file,
+                    created_at=message.created_at,
+                )
+                for message in batch
+            ])
+            # bulk_create refuses multi-table inherited models
+            opts = OldGroupMessage._meta
+            channel_field = opts.get_field('channel')
+            qn = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {qn(opts.db_table)} "
+                    f"({qn(opts.pk.column)}, {qn(channel_field.column)}) VALUES (%s, %s)",
+                    [
+                        (message.id, channel_field.get_db_prep_save(message.channel_id, connection))
+                        for message in batch
+                    ]
+                )
+        last_id = batch[-1].id
+
+    reset_sequence(Message, schema_editor)
+
+
+def reset_sequence(model, schema_editor):
+    """Move the id sequence past the copied ids."""
+    connection = schema_editor.connection
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_trigger(apps, schema_editor):
+    """Search trigger of 0006, recreated for the flat table. It is added
+    before the copy so copied rows get their search_vector on insert."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE TRIGGER chats_groupmessage_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF content ON chats_flatgroupmessage "
+        "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger("
+        "search_vector, 'pg_catalog.english', content)"
+    )
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "DROP TRIGGER IF EXISTS chats_groupmessage_search_vector_update "
+        "ON chats_flatgroupmessage"
+    )
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX chats_groupmessage_search_vector_idx "
+        "ON chats_groupmessage USING GIN (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS chats_groupmessage_search_vector_idx")
+
+
+def recreate_old_search_trigger(apps, schema_editor):
+    """Reverse of dropping chats_message: 0006's trigger and index."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE TRIGGER chats_message_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF content ON chats_message "
+        "FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger("
+        "search_vector, 'pg_catalog.english', content)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX chats_message_search_vector_idx "
+        "ON chats_message USING GIN (search_vector)"
+    )
+
+
+class Migration(migrations.Migration):
+    # every batch of the copy commits on its own
+    atomic = False
+
+    dependencies = [
+        ('chats', '0006_search_vector'),
+        ('workspaces', '0006_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlatGroupMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender_name', models.CharField(max_length=150)),
+                ('sender_email', models.EmailField(max_length=254)),
+                ('content', models.TextField()),
+                ('file', models.FileField(null=True, upload_to='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='workspaces.channel')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+        migrations.RunPython(copy_messages, copy_messages_back),
+        migrations.RunPython(migrations.RunPython.noop, recreate_old_search_trigger),
+        migrations.DeleteModel(
+            name='GroupMessage',
+        ),
+        migrations.DeleteModel(
+            name='Message',
+        ),
+        migrations.RenameModel(
+            old_name='FlatGroupMessage',
+            new_name='GroupMessage',
+        ),
+        migrations.AlterField(
+            model_name='groupmessage',
+            name='channel',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_messages', to='workspaces.channel'),
+        ),
+        migrations.AlterField(
+            model_name='groupmessage',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['channel', 'created_at', 'id'], name='chats_group_channel_time_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,144 @@
+import datetime
+
+from django.conf import settings
+from django.db import migrations, transaction
+
+TABLE = 'chats_groupmessage'
+SEQUENCE = 'chats_groupmessage_id_seq'
+# month partitions created past the current one, `manage.py chat_retention`
+# keeps adding them from then on
+MONTHS_AHEAD = 3
+
+
+def _month_start(value):
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def _months(first, last):
+    """(start, end) of every month from the one `first` is in up to `last`."""
+    month = _month_start(first)
+    while month <= last:
+        yield month, _next_month(month)
+        month = _next_month(month)
+
+
+def _rebuild(apps, schema_editor, partitioned):
+    """Recreate chats_groupmessage as a (non-)partitioned table and move
+    the rows over a month at a time, each month in its own transaction."""
+    connection = schema_editor.connection
+    Channel = apps.get_model('workspaces', 'Channel')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    old = f'{TABLE}_old'
+
+    schema_editor.execute(f"ALTER TABLE {TABLE} RENAME TO {old}")
+    if partitioned:
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {old}) PARTITION BY RANGE (created_at)"
+        )
+        # the partition key has to be part of every unique constraint
+        schema_editor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_id_created_at_pk "
+            f"PRIMARY KEY (id, created_at)"
+        )
+    else:
+        schema_editor.execute(f"CREATE TABLE {TABLE} (LIKE {old})")
+        schema_editor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_id_pk PRIMARY KEY (id)"
+        )
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_channel_id_fk "
+        f"FOREIGN KEY (channel_id) REFERENCES {Channel._meta.db_table} (id) "
+        f"DEFERRABLE INITIALLY DEFERRED"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_sender_id_fk "
+        f"FOREIGN KEY (sender_id) REFERENCES {User._meta.db_table} (id) "
+        f"DEFERRABLE INITIALLY DEFERRED"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(created_at), max(created_at) FROM {old}")
+        first, last = cursor.fetchone()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    first = min(first or now, now)
+    last = max(last or now, now)
+    if partitioned:
+        last = _month_start(last)
+        for _ in range(MONTHS_AHEAD):
+            last = _next_month(last)
+        # catches rows no month partition covers
+        schema_editor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+
+    for lower, upper in _months(first, last):
+        if partitioned:
+            schema_editor.execute(
+                f"CREATE TABLE {TABLE}_p{lower:%Y%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [lower, upper]
+            )
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(
+                f"INSERT INTO {TABLE} SELECT * FROM {old} "
+                f"WHERE created_at >= %s AND created_at < %s",
+                [lower, upper]
+            )
+
+    # drops the old identity sequence, indexes and search trigger with it
+    schema_editor.execute(f"DROP TABLE {old}")
+    schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
+    schema_editor.execute(f"CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')"
+    )
+    schema_editor.execute(
+        f"SELECT setval('{SEQUENCE}', coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+    )
+
+    schema_editor.execute(
+        f"CREATE INDEX chats_group_channel_time_idx "
+        f"ON {TABLE} (channel_id, created_at, id)"
+    )
+    schema_editor.execute(f"CREATE INDEX {TABLE}_sender_id_idx ON {TABLE} (sender_id)")
+    schema_editor.execute(
+        f"CREATE INDEX {TABLE}_search_vector_idx ON {TABLE} USING GIN (search_vector)"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {TABLE}_search_vector_update "
+        f"BEFORE INSERT OR UPDATE OF content ON {TABLE} "
+        f"FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger("
+        f"search_vector, 'pg_catalog.english', content)"
+    )
+
+
+def partition_messages(apps, schema_editor):
+    """Monthly range partitions on created_at. PostgreSQL only (13 or
+    newer, for row triggers on partitioned tables), elsewhere the table
+    stays as it is."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _rebuild(apps, schema_editor, partitioned=True)
+
+
+def unpartition_messages(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    _rebuild(apps, schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    # every month of the copy commits on its own
+    atomic = False
+
+    dependencies = [
+        ('chats', '0007_flatten_groupmessage'),
+        ('workspaces', '0007_workspace_message_retention_days'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_messages, unpartition_messages),
+    ]
@@ -0,0 +1,102 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_participant_pairs(apps, schema_editor):
+    """Sorted pair from the old participants M2M. Chats that are not
+    between exactly two users, or repeat an existing pair, had no way of
+    being used and are dropped."""
+    PrivateChat = apps.get_model('chats', 'PrivateChat')
+    db_alias = schema_editor.connection.alias
+
+    seen = set()
+    for chat in PrivateChat.objects.using(db_alias).prefetch_related('participants'):
+        pair = tuple(sorted({user.id for user in chat.participants.all()}))
+        if len(pair) != 2 or pair in seen:
+            chat.delete()
+            continue
+        seen.add(pair)
+        chat.user_low_id, chat.user_high_id = pair
+        chat.save(update_fields=['user_low', 'user_high'])
+
+
+def fill_participants(apps, schema_editor):
+    PrivateChat = apps.get_model('chats', 'PrivateChat')
+    db_alias = schema_editor.connection.alias
+    for chat in PrivateChat.objects.using(db_alias).all():
+        chat.participants.set([chat.user_low_id, chat.user_high_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0008_partition_groupmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='privatechat',
+            name='user_low',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='private_chats_low', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='privatechat',
+            name='user_high',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='private_chats_high', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='privatechat',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_participant_pairs, fill_participants),
+        migrations.RemoveField(
+            model_name='privatechat',
+            name='participants',
+        ),
+        migrations.AlterField(
+            model_name='privatechat',
+            name='user_low',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='private_chats_low', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='privatechat',
+            name='user_high',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='private_chats_high', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='privatechat',
+            index=models.Index(fields=['user_low', 'last_message_at'], name='chats_private_low_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='privatechat',
+            index=models.Index(fields=['user_high', 'last_message_at'], name='chats_private_high_inbox_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='privatechat',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='chats_privatechat_pair_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='privatechat',
+            constraint=models.CheckConstraint(condition=models.Q(('user_low__lt', models.F('user_high'))), name='chats_privatechat_pair_sorted'),
+        ),
+        migrations.CreateModel(
+            name='PrivateMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender_name', models.CharField(max_length=150)),
+                ('sender_email', models.EmailField(max_length=254)),
+                ('content', models.TextField()),
+                ('file', models.FileField(null=True, upload_to='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chats.privatechat')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['chat', 'created_at', 'id'], name='chats_private_chat_time_idx')],
+            },
+        ),
+    ]
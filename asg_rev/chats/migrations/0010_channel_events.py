@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0009_private_chat_pair'),
+        ('workspaces', '0008_channelrole_read_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelCounter',
+            fields=[
+                ('channel', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='counter', serialize=False, to='workspaces.channel')),
+                ('last_event_seq', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChannelEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('team_id', models.UUIDField(null=True)),
+                ('event', models.CharField(max_length=50)),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('channel', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='workspaces.channel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['channel', 'team_id', 'seq'], name='chats_event_team_seq_idx')],
+                'constraints': [models.UniqueConstraint(fields=('channel', 'seq'), name='chats_channelevent_seq_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:17
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models import Max
+
+TABLE = 'chats_groupmessage'
+SEQ_CONSTRAINT = models.UniqueConstraint(
+    fields=['channel', 'seq'],
+    condition=models.Q(seq__isnull=False),
+    name='chats_group_channel_seq_uniq'
+)
+
+
+def number_messages(apps, schema_editor):
+    """Number the existing messages of every channel in (created_at, id)
+    order and start its counter after them, a channel per transaction."""
+    connection = schema_editor.connection
+    GroupMessage = apps.get_model('chats', 'GroupMessage')
+    ChannelCounter = apps.get_model('chats', 'ChannelCounter')
+    channel_field = GroupMessage._meta.get_field('channel')
+
+    channel_ids = list(
+        GroupMessage.objects.values_list('channel_id', flat=True).distinct().order_by()
+    )
+    for channel_id in channel_ids:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(
+                f"UPDATE {TABLE} SET seq = numbered.seq FROM ("
+                f"SELECT id, created_at, row_number() OVER (ORDER BY created_at, id) AS seq "
+                f"FROM {TABLE} WHERE channel_id = %s"
+                f") AS numbered "
+                f"WHERE {TABLE}.id = numbered.id AND {TABLE}.created_at = numbered.created_at",
+                [channel_field.get_db_prep_value(channel_id, connection)]
+            )
+            last = GroupMessage.objects.filter(
+                channel_id=channel_id
+            ).aggregate(last=Max('seq'))['last']
+            ChannelCounter.objects.update_or_create(
+                channel_id=channel_id,
+                defaults={'last_message_seq': last or 0}
+            )
+
+
+def _partitions(schema_editor):
+    """Partitions of the table when it is partitioned (see 0008), else None."""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+        if row is None or row[0] != 'p':
+            return None
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass",
+            [TABLE]
+        )
+        return [name for name, in cursor.fetchall()]
+
+
+def add_seq_constraint(apps, schema_editor):
+    """Unique (channel, seq). A unique index on a partitioned table has to
+    include the partition key, and (channel, seq, created_at) would let
+    the same seq through at another time, so each partition gets its own
+    unique index on (channel, seq) instead, see chats.partitions."""
+    partitions = _partitions(schema_editor)
+    if partitions is None:
+        schema_editor.add_constraint(apps.get_model('chats', 'GroupMessage'), SEQ_CONSTRAINT)
+        return
+    for partition in partitions:
+        schema_editor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {partition}_channel_seq_uniq "
+            f"ON {partition} (channel_id, seq) WHERE seq IS NOT NULL"
+        )
+
+
+def remove_seq_constraint(apps, schema_editor):
+    partitions = _partitions(schema_editor)
+    if partitions is None:
+        schema_editor.remove_constraint(apps.get_model('chats', 'GroupMessage'), SEQ_CONSTRAINT)
+        return
+    for partition in partitions:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {partition}_channel_seq_uniq")
+
+
+class Migration(migrations.Migration):
+    # every channel is numbered in its own transaction
+    atomic = False
+
+    dependencies = [
+        ('chats', '0010_channel_events'),
+        ('workspaces', '0008_channelrole_read_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channelcounter',
+            name='last_message_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(number_messages, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_seq_constraint, remove_seq_constraint),
+            ],
+            state_operations=[
+                migrations.AddConstraint(model_name='groupmessage', constraint=SEQ_CONSTRAINT),
+            ],
+        ),
+    ]
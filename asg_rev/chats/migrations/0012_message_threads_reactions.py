@@ -0,0 +1,73 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0011_groupmessage_seq'),
+        ('workspaces', '0008_channelrole_read_cursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageReaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='deleted_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='edited_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='parent',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='replies', to='chats.groupmessage'),
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='reactions',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['parent', 'created_at', 'id'], name='chats_group_thread_idx'),
+        ),
+        migrations.AddField(
+            model_name='messagereaction',
+            name='channel',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_reactions', to='workspaces.channel'),
+        ),
+        migrations.AddField(
+            model_name='messagereaction',
+            name='message',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reaction_set', to='chats.groupmessage'),
+        ),
+        migrations.AddField(
+            model_name='messagereaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='messagereaction',
+            constraint=models.UniqueConstraint(fields=('message', 'user', 'emoji'), name='chats_reaction_user_emoji_uniq'),
+        ),
+    ]
@@ -1,7 +1,13 @@
 from chats.models.message import (
     Message,
-    GroupMessage
+    GroupMessage,
+    MessageReaction,
+    PrivateMessage,
 )
 from chats.models.private_chat import (
     PrivateChat
-)
\ No newline at end of file
+)
+from chats.models.event import (
+    ChannelCounter,
+    ChannelEvent,
+)
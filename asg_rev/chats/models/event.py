@@ -0,0 +1,69 @@
+from django.db import models
+
+from workspaces.models import Channel
+
+
+class ChannelCounter(models.Model):
+    """Last sequence numbers handed out in a channel, for events and for
+    chat messages.
+
+    Numbers are taken by incrementing the row inside the writing
+    transaction, which keeps them gapless and in commit order per channel.
+    Not a database foreign key: a channel delete cascades into submissions
+    whose delete events still take a number, see `chats.signals.events`."""
+    channel = models.OneToOneField(
+        Channel,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='counter'
+    )
+    last_event_seq = models.PositiveBigIntegerField(
+        default=0
+    )
+    last_message_seq = models.PositiveBigIntegerField(
+        default=0
+    )
+
+
+class ChannelEvent(models.Model):
+    """Submission and grading change in a channel, replayed to sockets that
+    resume from a sequence number.
+
+    Reviewers of the channel get every event, members of `team_id` get the
+    events of their team."""
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='events'
+    )
+    seq = models.PositiveBigIntegerField()
+    # plain id, the team may be deleted in the transaction that records the event
+    team_id = models.UUIDField(
+        null=True
+    )
+    event = models.CharField(
+        max_length=50
+    )
+    data = models.JSONField()
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['channel', 'seq'],
+                name='chats_channelevent_seq_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['channel', 'team_id', 'seq'],
+                name='chats_event_team_seq_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event} #{self.seq} in {self.channel_id}"
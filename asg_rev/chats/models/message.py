@@ -1,4 +1,6 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from users.models import User
 from chats.models.private_chat import (
     PrivateChat,
@@ -7,13 +9,110 @@ from workspaces.models.channel import Channel
 
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
+    # copied from the sender when the message is written so history pages
+    # never join the user table
+    sender_name = models.CharField(max_length=150)
+    sender_email = models.EmailField()
     content = models.TextField()
     file = models.FileField(null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # set by the sender, write-behind batches keep the broadcast timestamp
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
 
 class GroupMessage(Message):
     channel = models.ForeignKey(
         Channel,
         on_delete=models.CASCADE,
         related_name='group_messages'
-    )
\ No newline at end of file
+    )
+    # gapless per channel, taken from ChannelCounter in the insert
+    # transaction, see chats.persistence.write_group_messages
+    seq = models.PositiveBigIntegerField(null=True, editable=False)
+    # threads are one level deep. Not a database foreign key, the table
+    # is partitioned on PostgreSQL, see chats.partitions
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        # chats_group_thread_idx covers it
+        db_index=False,
+        null=True,
+        related_name='replies'
+    )
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    # emoji -> count, kept in step with MessageReaction, see chats.mutations
+    reactions = models.JSONField(default=dict, editable=False)
+    edited_at = models.DateTimeField(null=True, editable=False)
+    # deleted messages stay as tombstones so threads and cursors keep working
+    deleted_at = models.DateTimeField(null=True, editable=False)
+    # kept up to date by a database trigger on PostgreSQL, see chats.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # history pages are a range scan on this index
+            models.Index(
+                fields=['channel', 'created_at', 'id'],
+                name='chats_group_channel_time_idx'
+            ),
+            # thread reply pages, same paging as the history
+            models.Index(
+                fields=['parent', 'created_at', 'id'],
+                name='chats_group_thread_idx'
+            ),
+        ]
+        constraints = [
+            # resuming from a sequence number. On the partitioned table a
+            # unique index per month partition, see chats.partitions
+            models.UniqueConstraint(
+                fields=['channel', 'seq'],
+                condition=models.Q(seq__isnull=False),
+                name='chats_group_channel_seq_uniq'
+            ),
+        ]
+
+class MessageReaction(models.Model):
+    """A user's emoji on a group message, the per emoji counts are
+    denormalized onto GroupMessage.reactions."""
+    message = models.ForeignKey(
+        GroupMessage,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        # chats_reaction_user_emoji_uniq covers it
+        db_index=False,
+        related_name='reaction_set'
+    )
+    # removes the reactions with the channel's messages
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.CASCADE,
+        related_name='message_reactions'
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    emoji = models.CharField(max_length=32)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['message', 'user', 'emoji'],
+                name='chats_reaction_user_emoji_uniq'
+            ),
+        ]
+
+class PrivateMessage(Message):
+    chat = models.ForeignKey(
+        PrivateChat,
+        on_delete=models.CASCADE,
+        related_name='messages'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['chat', 'created_at', 'id'],
+                name='chats_private_chat_time_idx'
+            ),
+        ]
@@ -3,18 +3,64 @@ from users.models import User
 import uuid
 
 class PrivateChat(models.Model):
+    """Direct messages between two users.
+
+    The participants are stored as a sorted pair, `user_low` always has the
+    smaller id, so the chat of two users is a single lookup on the unique
+    (user_low, user_high) index, see `chats.direct.participant_pair`."""
     id = models.UUIDField(
         primary_key=True, 
         default=uuid.uuid4, 
         editable=False
     )
-    participants = models.ManyToManyField(
-        User, 
-        related_name='private_chats'
+    user_low = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='private_chats_low'
+    )
+    user_high = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='private_chats_high'
     )
     created_at = models.DateTimeField(
         auto_now_add=True
     )
+    # bumped on every message, orders the inbox
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_low', 'user_high'],
+                name='chats_privatechat_pair_uniq'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(user_low__lt=models.F('user_high')),
+                name='chats_privatechat_pair_sorted'
+            ),
+        ]
+        indexes = [
+            # a user's inbox is the union of both sides
+            models.Index(
+                fields=['user_low', 'last_message_at'],
+                name='chats_private_low_inbox_idx'
+            ),
+            models.Index(
+                fields=['user_high', 'last_message_at'],
+                name='chats_private_high_inbox_idx'
+            ),
+        ]
+
+    @property
+    def participants(self):
+        return [self.user_low, self.user_high]
+
+    def other_participant(self, user):
+        return self.user_high if user.id == self.user_low_id else self.user_low
 
     def __str__(self):
-        return f"Private chat between {' and '.join([user.username for user in self.participants.all()])}"
+        return f"Private chat between {self.user_low.username} and {self.user_high.username}"
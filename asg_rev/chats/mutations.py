@@ -0,0 +1,160 @@
+"""Edits, deletes, reactions and thread replies of group messages.
+
+Every change is made under a row lock on the message and answered with a
+delta, a frame naming the message by id with only the fields that
+changed:
+
+    {"type": "edited", "channel": "<uuid>", "id": <id>, "content": "...", "edited_at": "..."}
+    {"type": "deleted", "channel": "<uuid>", "id": <id>, "content": "", "reactions": {}, "deleted_at": "..."}
+    {"type": "reaction", "channel": "<uuid>", "id": <id>, "emoji": "...", "user": <id>,
+     "added": true, "reactions": {"<emoji>": <count>}}
+
+Deltas go to the channel's chat group as `message_delta`, so clients patch
+what they show instead of reloading the history. Thread replies are plain
+messages with a `parent`, see `chats.persistence.write_group_messages`."""
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+from chats import utils
+from chats.models.message import GroupMessage, MessageReaction
+
+EDITED = 'edited'
+DELETED = 'deleted'
+REACTION = 'reaction'
+
+EMOJI_MAX_LENGTH = MessageReaction._meta.get_field('emoji').max_length
+
+
+def parse_message_id(value, name='message'):
+    """Raises ValueError with a client facing message on bad input."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a message id")
+
+
+def parse_emoji(value):
+    """Raises ValueError with a client facing message on bad input."""
+    emoji = value.strip() if isinstance(value, str) else ''
+    if not emoji or len(emoji) > EMOJI_MAX_LENGTH or any(char.isspace() for char in emoji):
+        raise ValueError("'emoji' must be a single emoji")
+    return emoji
+
+
+def _locked_message(channel_id, message_id):
+    message = GroupMessage.objects.select_for_update().filter(
+        channel_id=channel_id,
+        pk=message_id
+    ).first()
+    if message is None:
+        raise ValueError("Message not found")
+    return message
+
+
+def _delta(kind, message, **changes):
+    return {'type': kind, 'channel': str(message.channel_id), 'id': message.id, **changes}
+
+
+@transaction.atomic
+def edit_message(user, channel_id, message_id, content):
+    """Replace the content of the user's own message."""
+    content = content.strip() if isinstance(content, str) else ''
+    if not content:
+        raise ValueError("'content' can't be empty")
+
+    message = _locked_message(channel_id, message_id)
+    if message.sender_id != user.id:
+        raise ValueError("Only the sender can edit a message")
+    if message.deleted_at is not None:
+        raise ValueError("Message was deleted")
+
+    message.content = content
+    message.edited_at = timezone.now()
+    message.save(update_fields=['content', 'edited_at'])
+    return _delta(EDITED, message, content=content, edited_at=message.edited_at.isoformat())
+
+
+@transaction.atomic
+def delete_message(user, membership, channel_id, message_id):
+    """Turn a message into a tombstone, its replies and its place in the
+    history stay. Senders delete their own messages, reviewers anyone's.
+    Returns None when it already was deleted."""
+    message = _locked_message(channel_id, message_id)
+    if message.sender_id != user.id and membership['role'] != 'reviewer':
+        raise ValueError("Only the sender or a reviewer can delete a message")
+    if message.deleted_at is not None:
+        return None
+
+    MessageReaction.objects.filter(message_id=message.id).delete()
+    message.content = ''
+    message.file = None
+    message.reactions = {}
+    message.deleted_at = timezone.now()
+    message.save(update_fields=['content', 'file', 'reactions', 'deleted_at'])
+    return _delta(
+        DELETED, message, content='', reactions={}, deleted_at=message.deleted_at.isoformat()
+    )
+
+
+@transaction.atomic
+def react(user, channel_id, message_id, emoji, added=True):
+    """Add or remove the user's `emoji` on a message and keep the count on
+    the message in step. Returns None when that changed nothing."""
+    message = _locked_message(channel_id, message_id)
+    if message.deleted_at is not None:
+        raise ValueError("Message was deleted")
+
+    if added:
+        _, changed = MessageReaction.objects.get_or_create(
+            message_id=message.id,
+            user=user,
+            emoji=emoji,
+            defaults={'channel_id': message.channel_id}
+        )
+    else:
+        changed, _ = MessageReaction.objects.filter(
+            message_id=message.id,
+            user=user,
+            emoji=emoji
+        ).delete()
+    if not changed:
+        return None
+
+    # the row lock keeps the counts and the reaction rows in step
+    count = message.reactions.get(emoji, 0) + (1 if added else -1)
+    if count > 0:
+        message.reactions[emoji] = count
+    else:
+        message.reactions.pop(emoji, None)
+    message.save(update_fields=['reactions'])
+    return _delta(
+        REACTION, message, emoji=emoji, user=user.id, added=added, reactions=message.reactions
+    )
+
+
+async def acheck_parent(channel_id, parent_id):
+    """Raises ValueError unless `parent_id` is a live message of the channel
+    that isn't itself a reply."""
+    parent = await GroupMessage.objects.filter(
+        channel_id=channel_id,
+        pk=parent_id
+    ).values('parent_id', 'deleted_at').afirst()
+    if parent is None:
+        raise ValueError("Message not found")
+    if parent['parent_id'] is not None:
+        raise ValueError("Replies can't have replies")
+    if parent['deleted_at'] is not None:
+        raise ValueError("Message was deleted")
+
+
+def thread_queryset(channel_id, parent_id):
+    """Replies of a thread, paged like the history with `utils.get_message_page`."""
+    return GroupMessage.objects.filter(channel_id=channel_id, parent_id=parent_id)
+
+
+async def abroadcast_delta(delta):
+    await get_channel_layer().group_send(
+        utils.channel_group_name(delta['channel']),
+        {'type': 'message_delta', 'delta': delta}
+    )
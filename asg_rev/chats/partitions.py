@@ -0,0 +1,109 @@
+"""Monthly range partitions of the group message table on PostgreSQL.
+
+`chats_groupmessage` is partitioned by `created_at` (see migration
+0008_partition_groupmessage), one partition per calendar month (UTC) named
+`chats_groupmessage_pYYYYMM`, plus a default partition catching rows no
+month partition covers. The primary key is (id, created_at) because
+PostgreSQL wants the partition key in every unique constraint; nothing may
+reference a message with a database level foreign key. For the same
+reason (channel, seq) is unique per partition, with an index every
+partition gets when it is created.
+
+On other databases the table is a plain table and everything here is a
+no-op."""
+import datetime
+import re
+
+from django.db import connection
+
+from chats.models.message import GroupMessage
+
+PARENT_TABLE = GroupMessage._meta.db_table
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_NAME_RE = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(value):
+    """First instant of the (UTC) month `value` falls in."""
+    value = value.astimezone(datetime.timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [PARENT_TABLE]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions():
+    """Month partitions as (name, lower bound, upper bound), oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [PARENT_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match is None:
+            continue
+        lower = datetime.datetime(
+            int(match.group(1)), int(match.group(2)), 1,
+            tzinfo=datetime.timezone.utc
+        )
+        partitions.append((name, lower, add_months(lower, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(month):
+    """Create the partition for `month` unless it exists. Returns its name."""
+    name = partition_name(month)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {qn(name)} PARTITION OF {qn(PARENT_TABLE)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)]
+        )
+        cursor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {qn(name + '_channel_seq_uniq')} "
+            f"ON {qn(name)} (channel_id, seq) WHERE seq IS NOT NULL"
+        )
+    return name
+
+
+def ensure_partitions(now, months_ahead):
+    """Make sure this month and the next `months_ahead` have a partition."""
+    current = month_start(now)
+    return [
+        create_partition(add_months(current, offset))
+        for offset in range(months_ahead + 1)
+    ]
+
+
+def drop_partition(name):
+    """Detach a month partition and drop it, discarding its rows."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(name)}")
+        cursor.execute(f"DROP TABLE {qn(name)}")
@@ -0,0 +1,244 @@
+import asyncio
+import atexit
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from chats import utils
+from chats.models.message import GroupMessage
+from chats.sequences import number_messages
+from chats.unread import mark_sent
+
+logger = logging.getLogger(__name__)
+
+
+def write_behind_enabled():
+    return settings.CHAT_WRITE_BEHIND['ENABLED']
+
+
+def start_write_behind():
+    """Lease the message id worker of this process when write-behind is
+    on, so a process configured with a worker id already in use fails at
+    startup instead of writing colliding ids, and keep renewing it."""
+    if write_behind_enabled():
+        utils.claim_worker_id()
+        utils.start_worker_renewal()
+        atexit.register(utils.release_worker_id)
+
+
+def write_group_messages(messages):
+    """Number already built GroupMessage instances, insert them in a
+    single round trip, count thread replies on their parents and move the
+    senders' read cursors past them."""
+    unnumbered = [message for message in messages if message.seq is None]
+    try:
+        with transaction.atomic():
+            number_messages(unnumbered)
+            GroupMessage.objects.bulk_create(messages)
+            count_replies(messages)
+            mark_sent(messages)
+    except BaseException:
+        # the rollback gave the numbers back, a retry takes new ones
+        for message in unnumbered:
+            message.seq = None
+        raise
+
+
+def count_replies(messages):
+    """Bump reply_count of the threads `messages` reply to."""
+    per_parent = {}
+    for message in messages:
+        if message.parent_id is not None:
+            per_parent[message.parent_id] = per_parent.get(message.parent_id, 0) + 1
+    for parent_id, count in per_parent.items():
+        GroupMessage.objects.filter(pk=parent_id).update(reply_count=F('reply_count') + count)
+
+
+def message_payload(message):
+    """The `message` of a chat_message event, also what resumes replay."""
+    return {
+        'id': message.id,
+        'seq': message.seq,
+        'parent': message.parent_id,
+        'reply_count': message.reply_count,
+        'sender_name': message.sender_name,
+        'sender_email': message.sender_email,
+        'content': message.content,
+        'reactions': message.reactions,
+        'channel': str(message.channel_id),
+        'created_at': message.created_at.isoformat(),
+        'edited_at': message.edited_at and message.edited_at.isoformat(),
+        'deleted_at': message.deleted_at and message.deleted_at.isoformat(),
+    }
+
+
+async def abroadcast_messages(messages):
+    """Send numbered messages to everyone in their channels."""
+    channel_layer = get_channel_layer()
+    for message in messages:
+        await channel_layer.group_send(
+            utils.channel_group_name(message.channel_id),
+            {'type': 'chat_message', 'message': message_payload(message)}
+        )
+
+
+async def abroadcast_numbered(messages):
+    """Send the seqs written write-behind messages got, one event per
+    channel, with the messages for the workers' resume rings."""
+    per_channel = {}
+    for message in messages:
+        per_channel.setdefault(message.channel_id, []).append(message_payload(message))
+    channel_layer = get_channel_layer()
+    for channel_id, payloads in per_channel.items():
+        await channel_layer.group_send(
+            utils.channel_group_name(channel_id),
+            {'type': 'messages_numbered', 'messages': payloads}
+        )
+
+
+def write_with_retries(batch):
+    """Write `batch`, or when that fails each message of it on its own so
+    one bad row doesn't hold the others back. Returns the messages
+    written and those that failed."""
+    try:
+        write_group_messages(batch)
+        return batch, []
+    except Exception:
+        logger.exception("Failed to write %d chat messages, writing them one by one", len(batch))
+    written, failed = [], []
+    for message in batch:
+        try:
+            write_group_messages([message])
+            written.append(message)
+        except Exception:
+            failed.append(message)
+    return written, failed
+
+
+class MessageWriteBuffer:
+    """Process wide write-behind queue for chat messages.
+
+    Queueing a message doesn't touch the database, so the caller can
+    broadcast it at once, without a seq. Messages are written, and
+    numbered, with `write_group_messages` once MAX_BATCH_SIZE messages
+    are pending or MAX_DELAY_MS after the first one arrived, whichever
+    comes first, and their seqs then broadcast, `abroadcast_numbered`. A
+    batch that fails is written message by message; the
+    messages that still fail go back to the front of the queue, retried
+    after a delay doubling with each failed flush, and are dropped once
+    they failed MAX_ATTEMPTS flushes. A queue holding MAX_PENDING messages
+    makes `add` wait for a flush, and refuse the message when that didn't
+    make room."""
+
+    # longest wait between retries of failed messages
+    max_retry_delay = 5
+
+    def __init__(self):
+        self._pending = []
+        self._lock = None
+        self._loop = None
+        self._timer = None
+        # flushes in a row that left messages to retry
+        self._failures = 0
+        # message -> failed flushes
+        self._attempts = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._timer = None
+        return loop
+
+    async def add(self, message):
+        """Queue `message`. Raises ValueError when the queue is full and a
+        flush couldn't empty it, the database being down or too slow."""
+        config = settings.CHAT_WRITE_BEHIND
+        if len(self._pending) >= config['MAX_PENDING']:
+            await self.flush()
+            if len(self._pending) >= config['MAX_PENDING']:
+                raise ValueError("Too many messages waiting to be saved, try again later")
+
+        loop = self._bind_loop()
+        self._pending.append(message)
+        if len(self._pending) >= config['MAX_BATCH_SIZE']:
+            self._cancel_timer()
+            asyncio.ensure_future(self.flush())
+        elif self._timer is None:
+            self._schedule(loop)
+
+    def _schedule(self, loop, delay_ms=None):
+        if delay_ms is None:
+            delay_ms = settings.CHAT_WRITE_BEHIND['MAX_DELAY_MS']
+        self._timer = loop.call_later(
+            delay_ms / 1000,
+            lambda: asyncio.ensure_future(self.flush())
+        )
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _requeue(self, failed):
+        """Put `failed` back at the front of the queue, but the messages
+        that failed MAX_ATTEMPTS flushes. Returns how many were kept."""
+        retry = []
+        for message in failed:
+            attempts = self._attempts.get(message.id, 0) + 1
+            if attempts >= settings.CHAT_WRITE_BEHIND['MAX_ATTEMPTS']:
+                self._attempts.pop(message.id, None)
+                logger.error(
+                    "Dropped chat message %s of channel %s after %d failed writes",
+                    message.id, message.channel_id, attempts
+                )
+            else:
+                self._attempts[message.id] = attempts
+                retry.append(message)
+        self._pending[:0] = retry
+        return len(retry)
+
+    async def flush(self):
+        """Write everything pending and broadcast the seqs it got. Returns
+        once the batch is committed, or what failed of it has been queued
+        again or dropped."""
+        loop = self._bind_loop()
+        self._cancel_timer()
+
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            written, failed = await sync_to_async(write_with_retries)(batch)
+            for message in written:
+                self._attempts.pop(message.id, None)
+            await abroadcast_numbered(written)
+            if failed and self._requeue(failed):
+                self._failures += 1
+                delay_ms = settings.CHAT_WRITE_BEHIND['MAX_DELAY_MS'] * 2 ** self._failures
+                self._cancel_timer()
+                self._schedule(loop, min(delay_ms, self.max_retry_delay * 1000))
+            else:
+                self._failures = 0
+
+    def flush_sync(self):
+        """Last chance flush for interpreter shutdown, outside the event
+        loop."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        written, failed = write_with_retries(batch)
+        if failed:
+            logger.error("Lost %d chat messages on shutdown", len(failed))
+
+
+message_buffer = MessageWriteBuffer()
+atexit.register(message_buffer.flush_sync)
@@ -0,0 +1,96 @@
+"""Wire options a chat socket negotiates when it connects.
+
+Clients offer them as a websocket subprotocol and the server accepts the
+first one it knows, so the client can tell from the handshake what it
+got. Clients that can't set subprotocols pass query params instead:
+
+    Sec-WebSocket-Protocol: json+batch      ?batch=1
+    Sec-WebSocket-Protocol: msgpack         ?format=msgpack
+    Sec-WebSocket-Protocol: msgpack+batch   ?format=msgpack&batch=1
+
+`msgpack` switches frames in both directions to binary msgpack, with the
+same structure the JSON frames have. `batch` switches broadcast frames
+(chat messages and events) to arrays collected over CHAT_BATCH['WINDOW_MS'],
+see `BaseChatConsumer.send_broadcast`. Without either the socket speaks
+plain JSON text frames, one per broadcast."""
+import json
+from urllib.parse import parse_qs
+
+import msgpack
+from django.core.serializers.json import DjangoJSONEncoder
+
+TRUE_VALUES = ('1', 'true', 'yes')
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+# datetimes, uuids and decimals become strings, like in the JSON frames
+_json_default = DjangoJSONEncoder().default
+
+
+def encode_json(data):
+    return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+def encode_msgpack(data):
+    return msgpack.packb(data, default=_json_default)
+
+
+def decode_msgpack(bytes_data):
+    return msgpack.unpackb(bytes_data)
+
+
+class WireOptions:
+    """What a socket negotiated; `subprotocol` is echoed in the handshake."""
+
+    def __init__(self, format=JSON, batch=False, subprotocol=None):
+        self.format = format
+        self.batch = batch
+        self.subprotocol = subprotocol
+
+    def __repr__(self):
+        return (
+            f'WireOptions(format={self.format!r}, batch={self.batch}, '
+            f'subprotocol={self.subprotocol!r})'
+        )
+
+    def encode(self, data):
+        """(text_data, bytes_data) of the frame for `data`."""
+        if self.format == MSGPACK:
+            return None, encode_msgpack(data)
+        return encode_json(data), None
+
+    def decode(self, text_data=None, bytes_data=None):
+        """The client frame as a dict, ValueError when it isn't one in the
+        negotiated format."""
+        if self.format == MSGPACK:
+            if bytes_data is None:
+                raise ValueError("Expected a binary msgpack frame")
+            data = decode_msgpack(bytes_data)
+        else:
+            if text_data is None:
+                raise ValueError("Expected a JSON text frame")
+            data = json.loads(text_data)
+        if not isinstance(data, dict):
+            raise ValueError("Frames must be objects")
+        return data
+
+
+SUBPROTOCOLS = {
+    'json': {'format': JSON, 'batch': False},
+    'json+batch': {'format': JSON, 'batch': True},
+    'msgpack': {'format': MSGPACK, 'batch': False},
+    'msgpack+batch': {'format': MSGPACK, 'batch': True},
+}
+
+
+def negotiate(scope):
+    """WireOptions for the socket of `scope`."""
+    for offered in scope.get('subprotocols') or []:
+        if offered in SUBPROTOCOLS:
+            return WireOptions(subprotocol=offered, **SUBPROTOCOLS[offered])
+
+    params = parse_qs(scope.get('query_string', b'').decode('utf8'))
+    return WireOptions(
+        format=MSGPACK if params.get('format', [''])[-1].lower() == MSGPACK else JSON,
+        batch=params.get('batch', [''])[-1].lower() in TRUE_VALUES
+    )
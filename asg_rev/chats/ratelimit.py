@@ -0,0 +1,100 @@
+"""Token buckets limiting the frames chat sockets accept.
+
+Every socket has its own bucket and shares a second one with the other
+sockets of its user, so opening more sockets doesn't raise the limit.
+User buckets live in the worker process like the write-behind queue: with
+several daphne workers a user spread over all of them gets the limit once
+per worker."""
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+# user buckets kept per worker, least recently used ones are dropped first
+MAX_USER_BUCKETS = 10000
+
+
+def rate_limit_enabled():
+    return settings.CHAT_RATE_LIMIT['ENABLED']
+
+
+class TokenBucket:
+    """Allows `burst` frames at once, refilled at `rate` frames per second."""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now=None):
+        """Whether the bucket holds a token, without taking it."""
+        self.refill(time.monotonic() if now is None else now)
+        return self.tokens >= 1
+
+    def consume(self, now=None):
+        """Take a token, False when the bucket is empty."""
+        if not self.available(now):
+            return False
+        self.tokens -= 1
+        return True
+
+
+class UserBuckets:
+    """Process wide buckets by user id."""
+
+    def __init__(self, max_size=MAX_USER_BUCKETS):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def get(self, user_id):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            config = settings.CHAT_RATE_LIMIT
+            bucket = TokenBucket(config['USER_RATE'], config['USER_BURST'])
+            self._buckets[user_id] = bucket
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    def clear(self):
+        self._buckets.clear()
+
+
+user_buckets = UserBuckets()
+
+
+class FrameLimiter:
+    """Rate limit of one socket: its own bucket plus its user's."""
+
+    def __init__(self, user_id):
+        config = settings.CHAT_RATE_LIMIT
+        self.connection = TokenBucket(config['CONNECTION_RATE'], config['CONNECTION_BURST'])
+        self.user = user_buckets.get(user_id)
+        self.violations = 0
+
+    def allow(self):
+        """Whether the socket may handle one more frame now."""
+        now = time.monotonic()
+        # a frame refused by either bucket costs neither a token
+        if self.connection.available(now) and self.user.available(now):
+            self.connection.consume(now)
+            self.user.consume(now)
+            return True
+        self.violations += 1
+        return False
+
+    @property
+    def exhausted(self):
+        """Rejected frames reached the point where the socket gets closed."""
+        return self.violations >= settings.CHAT_RATE_LIMIT['MAX_VIOLATIONS']
@@ -0,0 +1,172 @@
+"""Replaying the chat messages a socket missed while it was away.
+
+A client that knows the `seq` of the last message it got asks for the
+ones after it. They are served from a ring of the most recent messages
+each worker keeps for the channels its sockets are in, or from the
+(channel, seq) index when the ring doesn't reach back far enough or has
+a gap, so a reconnect costs the messages missed instead of the history.
+
+Messages are numbered in the transaction that writes them, under the
+channel counter's row lock, so the index has every seq up to the last
+committed one. Write-behind messages join the ring when their seq is
+broadcast after the write, see chats.persistence."""
+import itertools
+from collections import OrderedDict
+
+from django.conf import settings
+
+from chats.models.message import GroupMessage
+from chats.persistence import message_payload
+
+RESUME_PAGE_SIZE = 100
+RESUME_MAX_PAGE_SIZE = 500
+# what edit, delete and reaction deltas change, see chats.mutations
+PATCHED_FIELDS = ('content', 'reactions', 'edited_at', 'deleted_at')
+
+
+class MessageRing:
+    """The last RING_SIZE broadcast messages of one channel by seq.
+
+    `floor` is the seq from which the ring has every message, messages of
+    different workers can arrive slightly out of order. The ring is kept
+    in seq order, so the lowest seq is the one evicted. Deltas patch the
+    messages in place so resumes replay their current state."""
+
+    def __init__(self, size):
+        self.size = size
+        self.messages = OrderedDict()
+        # message id -> seq
+        self.ids = {}
+        self.floor = None
+
+    def add(self, message):
+        seq = message.get('seq')
+        if seq is None or seq in self.messages or (self.floor is not None and seq < self.floor - 1):
+            return
+        # late messages are a few seqs behind at most
+        later = list(itertools.takewhile(lambda key: key > seq, reversed(self.messages)))
+        self.messages[seq] = message
+        for key in reversed(later):
+            self.messages.move_to_end(key)
+        self.ids[message['id']] = seq
+        if self.floor is None or seq == self.floor - 1:
+            self.floor = seq
+        parent = self.get(message.get('parent'))
+        if parent is not None:
+            parent['reply_count'] = parent.get('reply_count', 0) + 1
+        if len(self.messages) > self.size:
+            evicted, evicted_message = self.messages.popitem(last=False)
+            self.ids.pop(evicted_message['id'], None)
+            self.floor = max(self.floor, evicted + 1)
+
+    def get(self, message_id):
+        seq = self.ids.get(message_id)
+        return None if seq is None else self.messages.get(seq)
+
+    def patch(self, delta):
+        message = self.get(delta['id'])
+        if message is not None:
+            message.update({field: delta[field] for field in PATCHED_FIELDS if field in delta})
+
+    def since(self, after, limit):
+        """Messages after `after` as (messages, has_more), or None when
+        the ring can't tell it has all of them."""
+        if self.floor is None or after + 1 < self.floor:
+            return None
+        messages = []
+        for seq in range(after + 1, after + limit + 2):
+            message = self.messages.get(seq)
+            if message is None:
+                break
+            messages.append(message)
+        has_more = len(messages) > limit
+        if not has_more and any(seq > after + len(messages) for seq in self.messages):
+            # a later message arrived before one in between
+            return None
+        return messages[:limit], has_more
+
+
+class RecentMessages:
+    """Process wide rings of the channels this worker has sockets in.
+
+    Sockets retain the channels they join and release them when they
+    leave, the ring of a channel is dropped with its last socket."""
+
+    def __init__(self):
+        self._rings = {}
+        self._sockets = {}
+
+    def retain(self, channel_id):
+        key = str(channel_id)
+        self._sockets[key] = self._sockets.get(key, 0) + 1
+        if key not in self._rings:
+            self._rings[key] = MessageRing(settings.CHAT_RESUME['RING_SIZE'])
+
+    def release(self, channel_id):
+        key = str(channel_id)
+        remaining = self._sockets.get(key, 0) - 1
+        if remaining > 0:
+            self._sockets[key] = remaining
+        else:
+            self._sockets.pop(key, None)
+            self._rings.pop(key, None)
+
+    def add(self, message):
+        """Keep a broadcast message, once per worker however many of its
+        sockets get it."""
+        ring = self._rings.get(message.get('channel'))
+        if ring is not None:
+            ring.add(message)
+
+    def patch(self, delta):
+        """Apply an edit, delete or reaction delta to the kept message."""
+        ring = self._rings.get(delta['channel'])
+        if ring is not None:
+            ring.patch(delta)
+
+    def get(self, channel_id):
+        return self._rings.get(str(channel_id))
+
+    def clear(self):
+        self._rings.clear()
+        self._sockets.clear()
+
+
+recent_messages = RecentMessages()
+
+
+def parse_resume_params(params):
+    """Validate `after` and `limit` resume params.
+
+    Raises ValueError with a client facing message on bad input."""
+    try:
+        after = int(params.get('after'))
+    except (TypeError, ValueError):
+        raise ValueError("'after' must be a sequence number")
+
+    limit = params.get('limit')
+    try:
+        limit = RESUME_PAGE_SIZE if limit in (None, '') else int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be a number")
+    return max(0, after), max(1, min(limit, RESUME_MAX_PAGE_SIZE))
+
+
+async def amessages_after(channel_id, after, limit=RESUME_PAGE_SIZE):
+    """Messages of the channel after sequence number `after`, oldest first,
+    as (payloads, has_more, source) with source 'memory' or 'database'."""
+    ring = recent_messages.get(channel_id)
+    if ring is not None:
+        page = ring.since(after, limit)
+        if page is not None:
+            return (*page, 'memory')
+
+    messages = [
+        message
+        async for message in GroupMessage.objects.filter(
+            channel_id=channel_id,
+            seq__gt=after
+        ).order_by('seq')[:limit + 1]
+    ]
+    has_more = len(messages) > limit
+    return [message_payload(message) for message in messages[:limit]], has_more, 'database'
@@ -1,7 +1,11 @@
 from django.urls import path
 
+from chats.consumers.direct_message_consumer import DirectMessageConsumer
 from chats.consumers.group_chat_consumer import GroupChatConsumer
+from chats.consumers.multiplex_chat_consumer import MultiplexChatConsumer
 
 websocket_urlpatterns = [
     path("ws/group-chat/<room_name>/", GroupChatConsumer.as_asgi()),
-]
\ No newline at end of file
+    path("ws/chat/", MultiplexChatConsumer.as_asgi()),
+    path("ws/dm/<int:user_id>/", DirectMessageConsumer.as_asgi()),
+]
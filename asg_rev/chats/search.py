@@ -0,0 +1,222 @@
+"""Full-text search over chat history, submissions and review remarks.
+
+On PostgreSQL every searchable table carries a `search_vector` column that a
+database trigger keeps current (added by the `search_vector` migrations),
+backed by a GIN index. Queries use `websearch_to_tsquery`, results are
+ranked with `ts_rank` and highlighted with `ts_headline`.
+
+Other databases (SQLite in development) fall back to case-insensitive LIKE
+matching with a rank of 0 and a plain python highlight, so the endpoint
+keeps working without the postgres extensions.
+
+Results are cursor paged on (rank, id), both descending; the cursor is an
+opaque token handed back as `next_cursor`."""
+import base64
+import binascii
+import html
+import json
+import re
+import uuid
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+
+from chats.models.message import GroupMessage
+from workspaces.models import ChannelRole, Iteration, Submission
+
+SEARCH_CONFIG = 'english'
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+# characters of context kept around the first match by the LIKE fallback
+SNIPPET_CONTEXT = 60
+
+
+def _messages(user):
+    return GroupMessage.objects.filter(
+        channel__in=ChannelRole.objects.filter(user=user).values('channel')
+    )
+
+
+def _submissions(user):
+    roles = ChannelRole.objects.filter(user=user)
+    return Submission.objects.filter(
+        Q(assignment__in=roles.filter(role='reviewer').values('channel')) |
+        Q(sender_team__in=roles.exclude(team=None).values('team'))
+    ).select_related('sender')
+
+
+def _remarks(user):
+    roles = ChannelRole.objects.filter(user=user)
+    return Iteration.objects.filter(
+        Q(submission__assignment__in=roles.filter(role='reviewer').values('channel')) |
+        Q(submission__sender_team__in=roles.exclude(team=None).values('team'))
+    ).select_related('reviewer', 'submission')
+
+
+def _message_result(message, headline):
+    return {
+        'id': message.id,
+        'channel': str(message.channel_id),
+        'sender_name': message.sender_name,
+        'created_at': message.created_at,
+        'headline': headline,
+    }
+
+
+def _submission_result(submission, headline):
+    return {
+        'id': submission.id,
+        'channel': str(submission.assignment_id),
+        'sender_name': submission.sender.username,
+        'created_at': submission.submitted_at,
+        'headline': headline,
+    }
+
+
+def _remark_result(iteration, headline):
+    return {
+        'id': iteration.id,
+        'channel': str(iteration.submission.assignment_id),
+        'submission': iteration.submission_id,
+        'sender_name': iteration.reviewer.username,
+        'created_at': iteration.created_at,
+        'headline': headline,
+    }
+
+
+# type -> (scoped queryset, searched text field, channel lookup, result builder)
+SEARCH_TYPES = {
+    'messages': (_messages, 'content', 'channel', _message_result),
+    'submissions': (_submissions, 'content', 'assignment', _submission_result),
+    'remarks': (_remarks, 'remarks', 'submission__assignment', _remark_result),
+}
+
+
+def encode_cursor(rank, pk):
+    token = json.dumps([rank, pk]).encode()
+    return base64.urlsafe_b64encode(token).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of `encode_cursor`, raises ValueError for a malformed token."""
+    try:
+        rank, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid 'cursor'")
+
+
+def parse_search_params(params):
+    """Validate search query parameters.
+
+    Returns (query, search type, channel, cursor, limit) and raises
+    ValueError for bad input, like `utils.parse_history_params`."""
+    query = (params.get('q') or '').strip()
+    if not query:
+        raise ValueError("'q' is required")
+
+    search_type = params.get('type') or 'messages'
+    if search_type not in SEARCH_TYPES:
+        raise ValueError(f"'type' must be one of {', '.join(SEARCH_TYPES)}")
+
+    channel = params.get('channel')
+    if channel:
+        try:
+            channel = uuid.UUID(str(channel))
+        except ValueError:
+            raise ValueError("'channel' must be a channel id")
+
+    cursor = params.get('cursor')
+    if cursor:
+        cursor = decode_cursor(cursor)
+
+    try:
+        limit = int(params.get('limit') or SEARCH_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be an integer")
+    if limit < 1:
+        raise ValueError("'limit' must be positive")
+
+    return query, search_type, channel or None, cursor or None, min(limit, SEARCH_MAX_PAGE_SIZE)
+
+
+class PostgresSearchBackend:
+    """Ranked `search_vector @@ websearch_to_tsquery` matching."""
+
+    def annotate(self, queryset, field, query):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(
+            search_vector=search_query
+        ).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+            headline=SearchHeadline(
+                field,
+                search_query,
+                config=SEARCH_CONFIG,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP
+            )
+        )
+
+    def headline(self, obj, field, query):
+        return obj.headline
+
+
+class LikeSearchBackend:
+    """Unranked substring matching for databases without full-text search."""
+
+    def annotate(self, queryset, field, query):
+        return queryset.filter(
+            **{f'{field}__icontains': query}
+        ).annotate(
+            rank=Value(0.0, output_field=FloatField())
+        )
+
+    def headline(self, obj, field, query):
+        text = getattr(obj, field) or ''
+        match = re.search(re.escape(query), text, re.IGNORECASE)
+        if match is None:
+            return html.escape(text[:2 * SNIPPET_CONTEXT])
+        start = max(match.start() - SNIPPET_CONTEXT, 0)
+        end = match.end() + SNIPPET_CONTEXT
+        return (
+            html.escape(text[start:match.start()]) +
+            HIGHLIGHT_START + html.escape(match.group()) + HIGHLIGHT_STOP +
+            html.escape(text[match.end():end])
+        )
+
+
+def get_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return LikeSearchBackend()
+
+
+def search(user, query, *, search_type='messages', channel=None, cursor=None, limit=SEARCH_PAGE_SIZE):
+    """One page of `search_type` results for `query` that `user` may see.
+
+    Returns (results, next_cursor); next_cursor is None on the last page."""
+    scoped, field, channel_lookup, build_result = SEARCH_TYPES[search_type]
+    backend = get_backend()
+
+    queryset = backend.annotate(scoped(user), field, query)
+    if channel is not None:
+        queryset = queryset.filter(**{channel_lookup: channel})
+    if cursor is not None:
+        rank, pk = cursor
+        queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, pk__lt=pk))
+
+    page = list(queryset.order_by('-rank', '-pk')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    results = [
+        dict(build_result(obj, backend.headline(obj, field, query)), rank=obj.rank)
+        for obj in page
+    ]
+    next_cursor = encode_cursor(page[-1].rank, page[-1].pk) if has_more else None
+    return results, next_cursor
@@ -0,0 +1,38 @@
+"""Gapless per-channel sequence numbers.
+
+Numbers come from the channel's ChannelCounter row, incremented inside
+the transaction that writes what they number. The row stays locked until
+that transaction ends, so numbers are handed out in commit order and a
+rolled back write gives its numbers back.
+
+Write-behind messages are broadcast before they are written, without a
+seq, and numbered like any other when their batch is written (see
+chats.persistence)."""
+from django.db.models import F
+
+from chats.models.event import ChannelCounter
+
+
+def take(channel_id, field, count=1):
+    """Reserve the next `count` numbers of counter `field` in the channel
+    and return the last of them."""
+    counter = ChannelCounter.objects.filter(pk=channel_id)
+    if not counter.update(**{field: F(field) + count}):
+        ChannelCounter.objects.get_or_create(channel_id=channel_id)
+        counter.update(**{field: F(field) + count})
+    return counter.values_list(field, flat=True).get()
+
+
+def number_messages(messages):
+    """Give unsaved GroupMessages the next sequence numbers of their
+    channels, in list order. Counters are locked in channel id order so
+    concurrent batches can't deadlock."""
+    per_channel = {}
+    for message in messages:
+        per_channel.setdefault(message.channel_id, []).append(message)
+
+    for channel_id in sorted(per_channel, key=str):
+        channel_messages = per_channel[channel_id]
+        last = take(channel_id, 'last_message_seq', len(channel_messages))
+        for seq, message in enumerate(channel_messages, start=last - len(channel_messages) + 1):
+            message.seq = seq
@@ -1,17 +1,24 @@
-from rest_framework.serializers import ModelSerializer, CharField
+from rest_framework.serializers import ModelSerializer
 from chats.models.message import GroupMessage
 
 class GroupMessageSerializer(ModelSerializer):
-    sender_name = CharField(source='sender.username', read_only=True)
-    sender_email = CharField(source='sender.email', read_only=True)
-    
     class Meta:
         model = GroupMessage
         fields = [
             'id',
+            'seq',
+            'parent',
+            'reply_count',
             'sender_name',
             'sender_email',
             'content',
+            'reactions',
             'channel',
+            'created_at',
+            'edited_at',
+            'deleted_at',
+        ]
+        read_only_fields = [
+            'seq','parent','reply_count','sender_name','sender_email','reactions',
+            'channel','created_at','edited_at','deleted_at'
         ]
-        read_only_fields = ['sender','channel'] 
\ No newline at end of file
@@ -0,0 +1,34 @@
+from rest_framework import serializers
+from users.serializers import UserSerializer
+from chats.models.message import PrivateMessage
+from chats.models.private_chat import PrivateChat
+
+class PrivateChatSerializer(serializers.ModelSerializer):
+    other_user = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PrivateChat
+        fields = [
+            'id',
+            'other_user',
+            'created_at',
+            'last_message_at',
+        ]
+        read_only_fields = fields
+
+    def get_other_user(self, chat):
+        user = chat.other_participant(self.context['request'].user)
+        return UserSerializer(user).data
+
+class PrivateMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PrivateMessage
+        fields = [
+            'id',
+            'sender_name',
+            'sender_email',
+            'content',
+            'chat',
+            'created_at',
+        ]
+        read_only_fields = ['sender_name','sender_email','chat','created_at']
@@ -0,0 +1,9 @@
+from chats.signals.events import (
+    submission_saved,
+    submission_deleted,
+    iteration_created,
+    remember_grade,
+    assignment_status_saved,
+    delete_channel_events,
+)
+from chats.signals.membership import recheck_sockets
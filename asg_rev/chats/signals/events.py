@@ -0,0 +1,94 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from workspaces.models import (
+    AssignmentStatus,
+    Channel,
+    Iteration,
+    Submission,
+)
+from chats import events
+from chats.models.event import ChannelCounter, ChannelEvent
+
+
+def _submission_data(submission):
+    return {
+        'id': submission.id,
+        'sender': submission.sender_id,
+        'file': submission.file,
+        'submitted_at': submission.submitted_at.isoformat(),
+    }
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, created, **kwargs):
+    events.record_event(
+        instance.assignment_id,
+        instance.sender_team_id,
+        events.SUBMISSION_CREATED if created else events.SUBMISSION_UPDATED,
+        _submission_data(instance)
+    )
+
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted(sender, instance, **kwargs):
+    events.record_event(
+        instance.assignment_id,
+        instance.sender_team_id,
+        events.SUBMISSION_DELETED,
+        {'id': instance.id}
+    )
+
+
+@receiver(post_save, sender=Iteration)
+def iteration_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    submission = instance.submission
+    events.record_event(
+        submission.assignment_id,
+        submission.sender_team_id,
+        events.ITERATION_CREATED,
+        {
+            'id': instance.id,
+            'submission': submission.id,
+            'reviewer': instance.reviewer_id,
+            'remarks': instance.remarks,
+            'created_at': instance.created_at.isoformat(),
+        }
+    )
+
+
+def _grade(status):
+    return status.status, status.earned_points
+
+
+@receiver(post_init, sender=AssignmentStatus)
+def remember_grade(sender, instance, **kwargs):
+    instance._saved_grade = _grade(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=AssignmentStatus)
+def assignment_status_saved(sender, instance, created, **kwargs):
+    grade = _grade(instance)
+    if not created and grade == instance._saved_grade:
+        return
+    instance._saved_grade = grade
+    events.record_event(
+        instance.assignment_id,
+        instance.team_id,
+        events.ASSIGNMENT_STATUS_CHANGED,
+        {
+            'id': instance.id,
+            'status': instance.status,
+            'earned_points': instance.earned_points,
+        }
+    )
+
+
+@receiver(post_delete, sender=Channel)
+def delete_channel_events(sender, instance, **kwargs):
+    # not cascaded by the database, runs after the channel's submissions
+    # are gone so their delete events are cleaned up too
+    ChannelEvent.objects.filter(channel_id=instance.id).delete()
+    ChannelCounter.objects.filter(channel_id=instance.id).delete()
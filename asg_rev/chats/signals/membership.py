@@ -0,0 +1,11 @@
+from django.dispatch import receiver
+
+from chats.membership import send_roles_changed
+from workspaces.roles import roles_changed
+
+
+@receiver(roles_changed)
+def recheck_sockets(sender, user_ids, **kwargs):
+    # sockets of users who left a channel stop getting its messages
+    # without waiting for their next frame
+    send_roles_changed(user_ids)
@@ -1,3 +1,625 @@
-from django.test import TestCase
+import asyncio
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from crum import impersonate
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from chats import utils
+from chats.models import GroupMessage, MessageReaction
+from chats import persistence
+from chats.consumers.multiplex_chat_consumer import MultiplexChatConsumer
+from chats.events import team_group_name
+from chats.mutations import delete_message, edit_message, react
+from chats.persistence import MessageWriteBuffer, write_group_messages
+from chats.ratelimit import FrameLimiter, user_buckets
+from chats.resume import MessageRing, amessages_after, recent_messages
+from chats.sequences import number_messages
+from chats.unread import amark_read, unread_counts
+from users.models import User
+from workspaces.models import (
+    Category,
+    CategoryRole,
+    Channel,
+    ChannelRole,
+    Team,
+    Workspace,
+    WorkspaceRole,
+)
+
+
+CHAT_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'chats-tests',
+        },
+    },
+    'ROLE_INDEX': {'CACHE': 'default', 'TIMEOUT': 60},
+}
+
+
+def write_behind(worker_id=None, **config):
+    return {
+        'ENABLED': True,
+        'MAX_BATCH_SIZE': 100,
+        'MAX_DELAY_MS': 50,
+        'MAX_PENDING': 1000,
+        'MAX_ATTEMPTS': 3,
+        'WORKER_ID': worker_id,
+        **config,
+    }
+
+
+class ChannelTestCase(TestCase):
+    """A channel with its reviewer and two reviewees."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reviewer, cls.reviewee, cls.other = User.objects.bulk_create([
+            User(username=name, email=f'{name}@example.com')
+            for name in ('reviewer', 'reviewee', 'other')
+        ])
+        cls.workspace = Workspace.objects.create(name='workspace', owner=cls.reviewer)
+        cls.category = Category.objects.create(name='category', workspace=cls.workspace)
+        for user, role in ((cls.reviewer, 'workspace_admin'), (cls.reviewee, 'workspace_member'),
+                           (cls.other, 'workspace_member')):
+            WorkspaceRole.objects.create(user=user, workspace=cls.workspace, role=role)
+            CategoryRole.objects.create(user=user, category=cls.category)
+        with impersonate(cls.reviewer):
+            # makes the reviewer the channel's reviewer
+            cls.channel = Channel.objects.create(name='channel', category=cls.category)
+            cls.second_channel = Channel.objects.create(name='second', category=cls.category)
+        cls.team = Team.objects.create(team_name='team', channel=cls.channel)
+        for user in (cls.reviewee, cls.other):
+            ChannelRole.objects.create(user=user, channel=cls.channel, role='reviewee', team=cls.team)
+
+    def setUp(self):
+        cache.clear()
+
+    def message(self, content='hello', sender=None, channel=None, **fields):
+        sender = sender or self.reviewee
+        return GroupMessage(
+            channel=channel or self.channel,
+            sender=sender,
+            sender_name=sender.username,
+            sender_email=sender.email,
+            content=content,
+            **fields
+        )
+
+
+@override_settings(**CHAT_SETTINGS)
+class MessageIdTests(ChannelTestCase):
+
+    def tearDown(self):
+        utils.release_worker_id()
+
+    def test_database_ids_without_write_behind(self):
+        first, second = self.message('first'), self.message('second')
+        write_group_messages([first, second])
+        self.assertIsNotNone(first.id)
+        self.assertLess(first.id, second.id)
+        # far below the worker built ids
+        self.assertLess(second.id, 1 << 40)
+
+    def test_worker_ids_are_leased(self):
+        with override_settings(CHAT_WRITE_BEHIND=write_behind(worker_id=3)):
+            self.assertEqual(utils.claim_worker_id(), 3)
+            message_id = utils.next_message_id()
+            worker_bits = (1 << utils.MESSAGE_ID_WORKER_BITS) - 1
+            self.assertEqual(message_id >> utils.MESSAGE_ID_COUNTER_BITS & worker_bits, 3)
+            self.assertLess(message_id, utils.next_message_id())
+
+            # another process configured with the same id
+            cache.set(utils._worker_key(3), 'another process')
+            utils.release_worker_id()
+            with self.assertRaises(ImproperlyConfigured):
+                utils.claim_worker_id()
+
+        with override_settings(CHAT_WRITE_BEHIND=write_behind()):
+            # the first free one
+            self.assertEqual(utils.claim_worker_id(), 0)
+            utils.release_worker_id()
+            for worker_id in range(1 << utils.MESSAGE_ID_WORKER_BITS):
+                cache.set(utils._worker_key(worker_id), 'another process')
+            with self.assertRaises(ImproperlyConfigured):
+                utils.claim_worker_id()
+
+    def test_lost_lease_is_claimed_again(self):
+        with override_settings(CHAT_WRITE_BEHIND=write_behind()):
+            cache.set(utils._worker_key(0), 'another process')
+            self.assertEqual(utils.claim_worker_id(), 1)
+            cache.clear()
+            # what the renewal thread does, keeping the id it had
+            self.assertEqual(utils.claim_worker_id(), 1)
+            self.assertEqual(cache.get(utils._worker_key(1)), utils._worker[1])
+
+    def test_ids_stay_off_the_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            utils.next_message_id()
+        utils.claim_worker_id()
+        with mock.patch.object(utils, 'cache') as cache_mock:
+            utils.next_message_id()
+        self.assertEqual(cache_mock.mock_calls, [])
+
+
+@override_settings(**CHAT_SETTINGS, CHAT_WRITE_BEHIND=write_behind(MAX_PENDING=4))
+class MessageWriteBufferTests(ChannelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.buffer = MessageWriteBuffer()
+        utils.claim_worker_id()
+        self.addCleanup(utils.release_worker_id)
+
+    def queue(self, *contents):
+        messages = [self.message(content, id=utils.next_message_id()) for content in contents]
+        for message in messages:
+            async_to_sync(self.buffer.add)(message)
+        return messages
+
+    def failing_writes(self, content):
+        def write(batch):
+            if any(message.content == content for message in batch):
+                raise DatabaseError("bad row")
+            write_group_messages(batch)
+        return mock.patch.object(persistence, 'write_group_messages', side_effect=write)
+
+    def saved(self):
+        return list(GroupMessage.objects.order_by('seq').values_list('content', flat=True))
+
+    def test_bad_rows_are_retried_then_dropped(self):
+        with self.failing_writes('bad'), self.assertLogs('chats.persistence'):
+            self.queue('first', 'bad', 'last')
+            async_to_sync(self.buffer.flush)()
+            # the rows around the bad one aren't held back
+            self.assertEqual(self.saved(), ['first', 'last'])
+            self.assertEqual([message.content for message in self.buffer._pending], ['bad'])
+            # its number went back with the rolled back write
+            self.assertIsNone(self.buffer._pending[0].seq)
+
+            async_to_sync(self.buffer.flush)()
+            self.assertEqual(len(self.buffer), 1)
+            with self.assertLogs('chats.persistence', 'ERROR') as logs:
+                async_to_sync(self.buffer.flush)()
+            self.assertIn('Dropped chat message', logs.output[-1])
+            self.assertEqual(len(self.buffer), 0)
+            self.assertEqual(self.saved(), ['first', 'last'])
+
+    def test_messages_are_numbered_when_written(self):
+        layer = get_channel_layer()
+        socket = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(utils.channel_group_name(self.channel.id), socket)
+        # queueing stays off the database
+        with self.assertNumQueries(0):
+            first, second = self.queue('first', 'second')
+        self.assertEqual((first.seq, second.seq), (None, None))
+
+        async_to_sync(self.buffer.flush)()
+        self.assertEqual(
+            list(GroupMessage.objects.order_by('seq').values_list('id', 'seq')),
+            [(first.id, 1), (second.id, 2)]
+        )
+        event = async_to_sync(layer.receive)(socket)
+        self.assertEqual(event['type'], 'messages_numbered')
+        self.assertEqual(
+            [(message['id'], message['seq']) for message in event['messages']],
+            [(first.id, 1), (second.id, 2)]
+        )
+
+    def test_full_queue_refuses_messages(self):
+        with self.failing_writes('bad'), self.assertLogs('chats.persistence'):
+            self.queue('bad', 'bad', 'bad', 'bad')
+            with self.assertRaises(ValueError):
+                self.queue('refused')
+        self.assertEqual(len(self.buffer), 4)
+
+        # once the database writes again the queue makes room
+        self.queue('accepted')
+        self.assertEqual(self.saved(), ['bad', 'bad', 'bad', 'bad'])
+        self.assertEqual(len(self.buffer), 1)
+
+
+@override_settings(CHAT_RATE_LIMIT={
+    'ENABLED': True,
+    'CONNECTION_RATE': 0,
+    'CONNECTION_BURST': 3,
+    'USER_RATE': 0,
+    'USER_BURST': 2,
+    'MAX_VIOLATIONS': 2,
+})
+class FrameLimiterTests(TestCase):
+
+    def setUp(self):
+        user_buckets.clear()
+
+    def test_refused_frames_cost_nothing(self):
+        limiter = FrameLimiter(1)
+        self.assertTrue(limiter.allow())
+        # the user's other socket takes the user's last token
+        self.assertTrue(FrameLimiter(1).allow())
+        self.assertFalse(limiter.allow())
+        self.assertFalse(limiter.allow())
+        self.assertTrue(limiter.exhausted)
+        # the user refusing left the socket's tokens alone
+        self.assertEqual(limiter.connection.tokens, 2)
+
+
+@override_settings(CHAT_SEND_QUEUE_SIZE=2)
+class SlowReaderTests(TestCase):
+
+    def test_full_queue_closes_the_socket(self):
+        async def run():
+            consumer = MultiplexChatConsumer()
+            consumer.scope = {'user': User(id=1), 'subprotocols': []}
+            consumer.channel_layer = get_channel_layer()
+            consumer.channel_name = 'socket'
+            sent, unblocked = [], asyncio.Event()
+
+            async def base_send(message):
+                sent.append(message)
+                # the client stopped reading
+                if message['type'] == 'websocket.send':
+                    await unblocked.wait()
+            consumer.base_send = base_send
+
+            await consumer.accept()
+            for number in range(4):
+                await consumer.send_frame({'number': number})
+                await asyncio.sleep(0)
+            # one frame in the server, two queued, the fourth didn't fit
+            self.assertEqual([message['type'] for message in sent], [
+                'websocket.accept', 'websocket.send', 'websocket.close'
+            ])
+            self.assertEqual(sent[-1]['code'], 1013)
+            self.assertIsNone(consumer.writer)
+            await consumer.send_frame({'number': 4})
+            self.assertEqual(len(sent), 3)
+
+        async_to_sync(run)()
+
+
+@override_settings(**CHAT_SETTINGS, CHAT_WRITE_BEHIND=write_behind())
+class ResumeTests(ChannelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        recent_messages.clear()
+
+    def write(self, *seqs, created_at=None):
+        created_at = created_at or timezone.now()
+        write_group_messages([
+            self.message(str(seq), seq=seq, created_at=created_at) for seq in seqs
+        ])
+
+    def resume(self, after, limit=10):
+        messages, has_more, source = async_to_sync(amessages_after)(self.channel.id, after, limit)
+        self.assertEqual(source, 'database')
+        return [message['seq'] for message in messages], has_more
+
+    def test_database_pages(self):
+        self.write(1, 2, 3)
+        self.assertEqual(self.resume(0), ([1, 2, 3], False))
+        self.assertEqual(self.resume(0, limit=2), ([1, 2], True))
+        self.assertEqual(self.resume(3), ([], False))
+
+
+@override_settings(**CHAT_SETTINGS)
+class UnreadTests(ChannelTestCase):
+
+    def unread(self, user):
+        return {row['channel']: row['unread_count'] for row in unread_counts(user)}[self.channel.id]
+
+    def test_counts_follow_the_seq(self):
+        self.assertEqual(self.unread(self.other), 0)
+        first, second = self.message('first'), self.message('second')
+        write_group_messages([first, second])
+        self.assertEqual((self.unread(self.other), self.unread(self.reviewer)), (2, 2))
+        # own messages are read
+        self.assertEqual(self.unread(self.reviewee), 0)
+
+        read = async_to_sync(amark_read)(self.other.id, self.channel.id, first.id)
+        self.assertEqual(read, {'last_read_message_id': first.id, 'unread_count': 1})
+        # never backwards, never to another channel's message
+        async_to_sync(amark_read)(self.other.id, self.channel.id, first.id - 1)
+        elsewhere = self.message(channel=self.second_channel, sender=self.reviewer)
+        write_group_messages([elsewhere])
+        read = async_to_sync(amark_read)(self.other.id, self.channel.id, elsewhere.id)
+        self.assertEqual(read, {'last_read_message_id': first.id, 'unread_count': 1})
+
+        # replying reads what came before
+        write_group_messages([self.message('reply', sender=self.other)])
+        self.assertEqual(self.unread(self.other), 0)
+        self.assertEqual(self.unread(self.reviewee), 1)
+
+    def test_counts_top_level_messages_of_others(self):
+        posted = self.message('posted')
+        write_group_messages([posted])
+        write_group_messages([
+            self.message('reply', parent=posted),
+            self.message('deleted'),
+            self.message('own', sender=self.other),
+        ])
+        deleted = GroupMessage.objects.get(content='deleted')
+        delete_message(self.reviewee, {'role': 'reviewee'}, self.channel.id, deleted.id)
+        self.assertEqual(self.unread(self.reviewer), 2)
+        # the reply, the tombstone and the reader's own message don't
+        # count, with the read cursor back at the start
+        ChannelRole.objects.filter(user=self.other, channel=self.channel).update(last_read_seq=0)
+        self.assertEqual(self.unread(self.other), 1)
+        read = async_to_sync(amark_read)(self.reviewer.id, self.channel.id, posted.id)
+        self.assertEqual(read['unread_count'], 1)
+
+    def test_writes_leave_other_members_alone(self):
+        with CaptureQueriesContext(connection) as context:
+            write_group_messages([self.message('first'), self.message('second')])
+        # the sender's read cursor
+        updates = [query['sql'] for query in context.captured_queries if 'workspaces_channelrole' in query['sql']]
+        self.assertEqual(len(updates), 1)
+
+
+class MessageRingTests(TestCase):
+
+    def ring(self, *seqs, size=10):
+        ring = MessageRing(size)
+        for seq in seqs:
+            ring.add({'id': seq * 10, 'seq': seq})
+        return ring
+
+    def since(self, ring, after, limit=10):
+        result = ring.since(after, limit)
+        if result is None:
+            return None
+        messages, has_more = result
+        return [message['seq'] for message in messages], has_more
+
+    def test_since(self):
+        ring = self.ring(1, 2, 3)
+        self.assertEqual(self.since(ring, 0), ([1, 2, 3], False))
+        self.assertEqual(self.since(ring, 1, limit=1), ([2], True))
+        self.assertEqual(self.since(ring, 3), ([], False))
+
+    def test_gaps(self):
+        ring = self.ring(1, 2, 4)
+        # 3 is on its way, from another worker
+        self.assertIsNone(self.since(ring, 0))
+        self.assertEqual(self.since(ring, 4), ([], False))
+        ring.add({'id': 30, 'seq': 3})
+        self.assertEqual(self.since(ring, 0), ([1, 2, 3, 4], False))
+
+        # late messages extend the floor down by one at most
+        ring = self.ring(5)
+        ring.add({'id': 40, 'seq': 4})
+        ring.add({'id': 20, 'seq': 2})
+        self.assertEqual(ring.floor, 4)
+        self.assertIsNone(self.since(ring, 2))
+        self.assertEqual(self.since(ring, 3), ([4, 5], False))
+
+    def test_eviction(self):
+        ring = self.ring(1, 2, 3, 4, 5, size=3)
+        self.assertEqual(list(ring.messages), [3, 4, 5])
+        self.assertEqual(ring.floor, 3)
+        self.assertIsNone(ring.get(10))
+        self.assertIsNone(self.since(ring, 1))
+        self.assertEqual(self.since(ring, 2), ([3, 4, 5], False))
+        # a message older than the ring reaches is left out
+        ring.add({'id': 10, 'seq': 1})
+        self.assertEqual(list(ring.messages), [3, 4, 5])
+
+    def test_eviction_out_of_order(self):
+        ring = self.ring(5, 4, 3, size=3)
+        self.assertEqual(list(ring.messages), [3, 4, 5])
+        ring.add({'id': 60, 'seq': 6})
+        # the lowest seq goes, not the one added first
+        self.assertEqual(list(ring.messages), [4, 5, 6])
+        self.assertEqual(ring.floor, 4)
+        self.assertEqual(self.since(ring, 3), ([4, 5, 6], False))
+        ring.add({'id': 80, 'seq': 8})
+        ring.add({'id': 70, 'seq': 7})
+        self.assertEqual(list(ring.messages), [6, 7, 8])
+        self.assertEqual((ring.floor, ring.get(40)), (6, None))
+        self.assertEqual(self.since(ring, 5), ([6, 7, 8], False))
+
+    def test_replies_and_patches(self):
+        ring = self.ring(1)
+        ring.add({'id': 20, 'seq': 2, 'parent': 10})
+        ring.patch({'id': 10, 'content': 'edited', 'user': 1})
+        self.assertEqual(ring.get(10), {'id': 10, 'seq': 1, 'reply_count': 1, 'content': 'edited'})
+
+
+@override_settings(**CHAT_SETTINGS)
+class SequenceTests(ChannelTestCase):
+
+    def test_channels_are_numbered_apart(self):
+        messages = [
+            self.message('first'),
+            self.message('elsewhere', channel=self.second_channel),
+            self.message('second'),
+        ]
+        number_messages(messages)
+        self.assertEqual([message.seq for message in messages], [1, 1, 2])
+
+        later = [self.message('third'), self.message('elsewhere', channel=self.second_channel)]
+        write_group_messages(later)
+        self.assertEqual([message.seq for message in later], [3, 2])
+        # numbered ones keep their seq
+        numbered = self.message('numbered', seq=10)
+        write_group_messages([numbered])
+        self.assertEqual(numbered.seq, 10)
+
+    def test_seqs_are_unique(self):
+        with self.assertRaises(IntegrityError):
+            write_group_messages([self.message('first', seq=1), self.message('again', seq=1)])
+        # in other channels they repeat
+        write_group_messages([self.message(seq=1), self.message(seq=1, channel=self.second_channel)])
+
+
+@override_settings(**CHAT_SETTINGS)
+class MessagePageTests(ChannelTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.now = now = timezone.now()
+        # two at the same time, ordered by id
+        times = [now - datetime.timedelta(days=60), now, now, now + datetime.timedelta(seconds=1)]
+        messages = [
+            cls.message(cls, str(number), created_at=created_at)
+            for number, created_at in enumerate(times)
+        ]
+        write_group_messages(messages)
+        cls.ids = [message.id for message in messages]
+
+    def page(self, **cursor):
+        messages, has_more = utils.get_message_page(
+            GroupMessage.objects.filter(channel=self.channel), **cursor
+        )
+        return [self.ids.index(message.id) for message in messages], has_more
+
+    def test_latest_page(self):
+        self.assertEqual(self.page(limit=2), ([2, 3], True))
+        # past the hot window
+        self.assertEqual(self.page(limit=10), ([0, 1, 2, 3], False))
+
+    def test_cursors(self):
+        # ties on created_at are broken by id
+        self.assertEqual(self.page(before=self.ids[2], limit=1), ([1], True))
+        self.assertEqual(self.page(after=self.ids[1], limit=1), ([2], True))
+        self.assertEqual(self.page(after=self.ids[1], limit=2), ([2, 3], False))
+        self.assertEqual(self.page(before=self.ids[1]), ([0], False))
+
+    def test_ends_and_unknown_cursors(self):
+        self.assertEqual(self.page(before=self.ids[0]), ([], False))
+        self.assertEqual(self.page(after=self.ids[3]), ([], False))
+        self.assertEqual(self.page(after=self.ids[3] + 1), ([], False))
+        # another channel's message only marks a point in time
+        elsewhere = self.message(channel=self.second_channel, created_at=self.now)
+        write_group_messages([elsewhere])
+        self.assertEqual(self.page(before=elsewhere.id), ([0, 1, 2], False))
+
+
+@override_settings(**CHAT_SETTINGS)
+class MutationTests(ChannelTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.posted = self.message('hello')
+        write_group_messages([self.posted])
+
+    def test_only_the_sender_edits(self):
+        with self.assertRaisesMessage(ValueError, "Only the sender can edit a message"):
+            edit_message(self.reviewer, self.channel.id, self.posted.id, 'changed')
+        delta = edit_message(self.reviewee, self.channel.id, self.posted.id, ' changed ')
+        self.assertEqual((delta['type'], delta['content']), ('edited', 'changed'))
+        with self.assertRaisesMessage(ValueError, "Message not found"):
+            edit_message(self.reviewee, self.second_channel.id, self.posted.id, 'changed')
+
+    def test_sender_or_reviewer_deletes(self):
+        with self.assertRaisesMessage(ValueError, "Only the sender or a reviewer can delete a message"):
+            delete_message(self.other, {'role': 'reviewee'}, self.channel.id, self.posted.id)
+        delta = delete_message(self.reviewer, {'role': 'reviewer'}, self.channel.id, self.posted.id)
+        self.assertEqual((delta['type'], delta['content']), ('deleted', ''))
+        # already gone
+        self.assertIsNone(delete_message(self.reviewee, {'role': 'reviewee'}, self.channel.id, self.posted.id))
+        with self.assertRaisesMessage(ValueError, "Message was deleted"):
+            edit_message(self.reviewee, self.channel.id, self.posted.id, 'changed')
+
+    def test_reaction_counts(self):
+        def counts():
+            return GroupMessage.objects.get(pk=self.posted.id).reactions
+
+        react(self.reviewee, self.channel.id, self.posted.id, '👍')
+        delta = react(self.other, self.channel.id, self.posted.id, '👍')
+        self.assertEqual(delta['reactions'], {'👍': 2})
+        # twice is once
+        self.assertIsNone(react(self.other, self.channel.id, self.posted.id, '👍'))
+        react(self.other, self.channel.id, self.posted.id, '🎉')
+        self.assertEqual(counts(), {'👍': 2, '🎉': 1})
+
+        react(self.other, self.channel.id, self.posted.id, '🎉', added=False)
+        self.assertIsNone(react(self.other, self.channel.id, self.posted.id, '🎉', added=False))
+        self.assertEqual(counts(), {'👍': 2})
+        self.assertEqual(MessageReaction.objects.filter(message_id=self.posted.id).count(), 2)
+
+        delete_message(self.reviewee, {'role': 'reviewee'}, self.channel.id, self.posted.id)
+        self.assertEqual(counts(), {})
+        self.assertFalse(MessageReaction.objects.filter(message_id=self.posted.id).exists())
+        with self.assertRaisesMessage(ValueError, "Message was deleted"):
+            react(self.other, self.channel.id, self.posted.id, '👍')
+
+
+@override_settings(**CHAT_SETTINGS)
+class MembershipRecheckTests(ChannelTestCase):
+
+    async def subscribed(self):
+        socket = WebsocketCommunicator(MultiplexChatConsumer.as_asgi(), '/ws/chat/')
+        socket.scope['user'] = self.other
+        connected, _ = await socket.connect()
+        self.assertTrue(connected)
+        await self.send(socket, 'subscribe')
+        self.assertEqual((await socket.receive_json_from())['type'], 'subscribed')
+        return socket
+
+    async def send(self, socket, frame_type, **data):
+        await socket.send_json_to({'type': frame_type, 'channel': str(self.channel.id), **data})
+
+    async def broadcast(self):
+        await get_channel_layer().group_send(utils.channel_group_name(self.channel.id), {
+            'type': 'chat_message',
+            'message': {'channel': str(self.channel.id), 'id': 1, 'content': 'hello'},
+        })
+
+    def remove(self, **commit):
+        with self.captureOnCommitCallbacks(**commit):
+            ChannelRole.objects.filter(user=self.other, channel=self.channel).delete()
+
+    async def test_removed_members_are_unsubscribed(self):
+        socket = await self.subscribed()
+        await self.broadcast()
+        self.assertEqual((await socket.receive_json_from())['content'], 'hello')
+
+        await sync_to_async(self.remove)(execute=True)
+        unsubscribed = {'type': 'unsubscribed', 'channel': str(self.channel.id)}
+        self.assertEqual(await socket.receive_json_from(), unsubscribed)
+        await self.broadcast()
+        self.assertTrue(await socket.receive_nothing())
+        await self.send(socket, 'history')
+        self.assertEqual(await socket.receive_json_from(), {'error': "Subscribe to the channel first"})
+        await socket.disconnect()
+
+    async def test_frames_recheck_the_role(self):
+        socket = await self.subscribed()
+        # the roles changed notice is sent on commit
+        await sync_to_async(self.remove)()
+        self.assertTrue(await socket.receive_nothing())
+        await self.send(socket, 'history')
+        self.assertEqual(await socket.receive_json_from(), {'type': 'unsubscribed', 'channel': str(self.channel.id)})
+        self.assertEqual(await socket.receive_json_from(), {'error': "User is not a member of this channel"})
+        await self.broadcast()
+        self.assertTrue(await socket.receive_nothing())
+        self.assertEqual(await GroupMessage.objects.acount(), 0)
+        await socket.disconnect()
+
+    async def test_role_changes_are_picked_up(self):
+        socket = await self.subscribed()
+        team = await Team.objects.acreate(team_name='another', channel=self.channel)
+        await ChannelRole.objects.filter(user=self.other, channel=self.channel).aupdate(team=team)
+        # bypasses the signals
+        await sync_to_async(cache.clear)()
+        await self.send(socket, 'history')
+        self.assertEqual((await socket.receive_json_from())['type'], 'history')
+        await get_channel_layer().group_send(team_group_name(self.channel.id, team.id), {
+            'type': 'channel_event',
+            'event': {'channel': str(self.channel.id), 'seq': 1},
+        })
+        self.assertEqual(await socket.receive_json_from(), {'type': 'event', 'channel': str(self.channel.id), 'seq': 1})
+        await socket.disconnect()
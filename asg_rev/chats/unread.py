@@ -0,0 +1,83 @@
+"""Read cursors and unread counts of channel members.
+
+Every ChannelRole keeps the id and the seq of the last message its user
+has read. Messages are numbered per channel (see chats.sequences), and
+what is unread are the top level messages of other members past the read
+seq that weren't deleted, counted on the (channel, seq) index. Thread
+replies, tombstones and the user's own messages don't count. The write
+path only moves the sender's own cursor past what they sent, never the
+other members' rows. Listing unread counts for all of a user's channels
+is a single query on ChannelRole."""
+from django.db.models import (
+    Count,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+from chats.models.message import GroupMessage
+from workspaces.models import ChannelRole
+
+
+def unread_expression(channel_id, user_id, last_read_seq):
+    """Unread count of a member as an expression, from the channel, the
+    member's user and their read seq."""
+    unread = GroupMessage.objects.filter(
+        ~Q(sender_id=user_id),
+        channel_id=channel_id,
+        seq__gt=last_read_seq,
+        parent__isnull=True,
+        deleted_at__isnull=True
+    ).order_by().values('channel').annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(unread), Value(0), output_field=IntegerField())
+
+
+def mark_sent(messages):
+    """Move the senders' read cursors past the messages they wrote, one
+    UPDATE per sender and channel."""
+    last_sent = {}
+    for message in messages:
+        key = (message.sender_id, message.channel_id)
+        if key not in last_sent or last_sent[key].seq < message.seq:
+            last_sent[key] = message
+    for (sender_id, channel_id), message in last_sent.items():
+        ChannelRole.objects.filter(
+            user_id=sender_id,
+            channel_id=channel_id,
+            last_read_seq__lt=message.seq
+        ).update(last_read_message_id=message.id, last_read_seq=message.seq)
+
+
+async def amark_read(user_id, channel_id, message_id):
+    """Move the user's read cursor in the channel forward to `message_id`,
+    one UPDATE.
+
+    The cursor never moves backwards and ignores ids that are not in the
+    channel. Returns the resulting {'last_read_message_id', 'unread_count'},
+    or None when the user is not a member."""
+    seq = GroupMessage.objects.filter(channel_id=channel_id, pk=message_id).values('seq')[:1]
+    membership = ChannelRole.objects.filter(user_id=user_id, channel_id=channel_id)
+
+    await membership.filter(last_read_seq__lt=Subquery(seq)).aupdate(
+        last_read_message_id=message_id,
+        last_read_seq=Subquery(seq)
+    )
+    return await _with_unread(membership).values('last_read_message_id', 'unread_count').afirst()
+
+
+def _with_unread(memberships):
+    return memberships.annotate(unread_count=unread_expression(
+        OuterRef('channel_id'), OuterRef('user_id'), OuterRef('last_read_seq')
+    ))
+
+
+def unread_counts(user):
+    """Read cursor and unread count of every channel the user is in."""
+    return _with_unread(ChannelRole.objects.filter(user=user)).values(
+        'channel',
+        'last_read_message_id',
+        'unread_count',
+    )
@@ -1,5 +1,12 @@
 from django.urls import path, include
-from chats.views import ChannelMessagesView
+from chats.views import (
+    ChannelMessagesView,
+    DirectChatsView,
+    DirectMessagesView,
+    SearchView,
+    ThreadRepliesView,
+    UnreadCountsView,
+)
 
 urlpatterns = [
     path(
@@ -7,4 +14,29 @@ urlpatterns = [
         ChannelMessagesView.as_view(), 
         name='group-chat'
     ),
+    path(
+        'api/workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/channels/<uuid:channel_pk>/chat/<int:message_pk>/replies/',
+        ThreadRepliesView.as_view(),
+        name='thread-replies'
+    ),
+    path(
+        'api/search/',
+        SearchView.as_view(),
+        name='search'
+    ),
+    path(
+        'api/unread/',
+        UnreadCountsView.as_view(),
+        name='unread-counts'
+    ),
+    path(
+        'api/dms/',
+        DirectChatsView.as_view(),
+        name='direct-chats'
+    ),
+    path(
+        'api/dms/<uuid:chat_pk>/messages/',
+        DirectMessagesView.as_view(),
+        name='direct-messages'
+    ),
 ]
@@ -0,0 +1,287 @@
+import datetime
+import logging
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# close_old_connections has to run on the thread sensitive executor, the
+# thread async ORM queries use, not on the event loop thread.
+aclose_old_connections = sync_to_async(close_old_connections)
+
+def channel_group_name(channel_id):
+    """Channel layer group every socket watching a channel joins."""
+    return f"group_chat_{channel_id}"
+
+
+def user_group_name(user_id):
+    """Channel layer group of every chat socket of a user."""
+    return f"chat_user_{user_id}"
+
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 100
+# the latest page is first looked for in this window so that on a
+# partitioned table it only touches the newest partitions
+HISTORY_HOT_WINDOW = datetime.timedelta(days=31)
+
+
+def parse_history_params(params):
+    """Validate `before`, `after` and `limit` history params.
+
+    Raises ValueError with a client facing message on bad input."""
+    cursors = {}
+    for key in ('before', 'after'):
+        value = params.get(key)
+        if value in (None, ''):
+            cursors[key] = None
+            continue
+        try:
+            cursors[key] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{key}' must be a message id")
+
+    if cursors['before'] is not None and cursors['after'] is not None:
+        raise ValueError("Only one of 'before' or 'after' can be given")
+
+    limit = params.get('limit')
+    if limit in (None, ''):
+        limit = HISTORY_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError("'limit' must be a number")
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+    return cursors['before'], cursors['after'], limit
+
+
+def _anchor(queryset, message_id):
+    """created_at of the cursor message, as a subquery."""
+    return Subquery(
+        queryset.model.objects.filter(pk=message_id).values('created_at')[:1]
+    )
+
+
+def newer_than(queryset, message_id):
+    """Messages of `queryset` after `message_id` in (created_at, id) order."""
+    created_at = _anchor(queryset, message_id)
+    return queryset.filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=message_id)
+    )
+
+
+def older_than(queryset, message_id):
+    """Messages of `queryset` before `message_id` in (created_at, id) order."""
+    created_at = _anchor(queryset, message_id)
+    return queryset.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=message_id)
+    )
+
+
+def _page_queryset(queryset, before, after, limit):
+    """Slice of `queryset` for one page plus whether it comes newest first."""
+    if after is not None:
+        return newer_than(queryset, after).order_by('created_at', 'pk')[:limit + 1], False
+    if before is not None:
+        queryset = older_than(queryset, before)
+    return queryset.order_by('-created_at', '-pk')[:limit + 1], True
+
+
+def _finish_page(page, limit, newest_first):
+    has_more = len(page) > limit
+    page = page[:limit]
+    if newest_first:
+        page.reverse()
+    return page, has_more
+
+
+def _hot(queryset):
+    return queryset.filter(created_at__gte=timezone.now() - HISTORY_HOT_WINDOW)
+
+
+def get_message_page(queryset, *, before=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """Return one keyset page of `queryset` as (messages, has_more).
+
+    Messages are paged on (created_at, id) with the message id as the
+    cursor, so every page is a single range scan on the
+    (channel, created_at, id) index no matter how long the history is.
+    Messages come back oldest first; `has_more` tells whether there is
+    another page in the direction that was asked for (older for
+    `before`/no cursor, newer for `after`).
+
+    The latest page is read from HISTORY_HOT_WINDOW first and only falls
+    back to the whole history for channels too quiet to fill it.
+    """
+    if before is None and after is None:
+        page_queryset, newest_first = _page_queryset(_hot(queryset), None, None, limit)
+        page, has_more = _finish_page(list(page_queryset), limit, newest_first)
+        if has_more:
+            return page, has_more
+
+    page_queryset, newest_first = _page_queryset(queryset, before, after, limit)
+    return _finish_page(list(page_queryset), limit, newest_first)
+
+
+async def aget_message_page(queryset, *, before=None, after=None, limit=HISTORY_PAGE_SIZE):
+    """Async ORM version of `get_message_page`."""
+    if before is None and after is None:
+        page_queryset, newest_first = _page_queryset(_hot(queryset), None, None, limit)
+        page, has_more = _finish_page(
+            [message async for message in page_queryset], limit, newest_first
+        )
+        if has_more:
+            return page, has_more
+
+    page_queryset, newest_first = _page_queryset(queryset, before, after, limit)
+    return _finish_page([message async for message in page_queryset], limit, newest_first)
+
+
+# With write-behind on, message ids are generated in the worker instead of
+# by the database so a message can be broadcast before it is written.
+# Layout, most significant bit first: 41 bits of milliseconds since
+# MESSAGE_ID_EPOCH_MS, 4 bits of worker id and an 8 bit per-millisecond
+# counter. That keeps ids ordered by creation time and below 2**53, so
+# JavaScript clients read them exactly. Written synchronously, messages
+# take the database's ids.
+MESSAGE_ID_EPOCH_MS = 1704067200000
+MESSAGE_ID_WORKER_BITS = 4
+MESSAGE_ID_COUNTER_BITS = 8
+# A process holds its worker id as a lease in the default cache, renewed
+# by a background thread, so two processes never share one and handing
+# out ids never waits for the cache.
+MESSAGE_ID_WORKER_LEASE = 60
+
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_id_counter = 0
+# (worker id, lease token) or None
+_worker = None
+_renewal = None
+
+
+def _worker_key(worker_id):
+    return f'chats:message-id-worker:{worker_id}'
+
+
+def _claim(worker_id, token):
+    key = _worker_key(worker_id)
+    if cache.add(key, token, MESSAGE_ID_WORKER_LEASE):
+        return True
+    if cache.get(key) == token:
+        cache.touch(key, MESSAGE_ID_WORKER_LEASE)
+        return True
+    return False
+
+
+def claim_worker_id():
+    """Lease this process's message id worker id, or renew its lease, and
+    return it: the configured CHAT_WRITE_BEHIND['WORKER_ID'], or the first
+    free one when it is None. Raises ImproperlyConfigured when the
+    configured id is held by another process, or all 16 are.
+
+    The asgi application claims it at startup when write-behind is on, so
+    a misconfigured process fails before it accepts a socket."""
+    global _worker
+    current = _worker
+    token = current[1] if current is not None else uuid.uuid4().hex
+    configured = settings.CHAT_WRITE_BEHIND['WORKER_ID']
+    if configured is not None:
+        if not 0 <= configured < 1 << MESSAGE_ID_WORKER_BITS:
+            raise ImproperlyConfigured(
+                f"CHAT_WRITE_BEHIND['WORKER_ID'] must be between 0 and {(1 << MESSAGE_ID_WORKER_BITS) - 1}"
+            )
+        candidates = [configured]
+    else:
+        candidates = list(range(1 << MESSAGE_ID_WORKER_BITS))
+        if current is not None:
+            # keep the id held so far
+            candidates.remove(current[0])
+            candidates.insert(0, current[0])
+    for worker_id in candidates:
+        if _claim(worker_id, token):
+            with _id_lock:
+                _worker = (worker_id, token)
+            return worker_id
+    with _id_lock:
+        _worker = None
+    if configured is not None:
+        raise ImproperlyConfigured(
+            f"Message id worker {configured} is in use by another process, "
+            "give every process its own CHAT_WRITE_BEHIND['WORKER_ID']"
+        )
+    raise ImproperlyConfigured("All message id workers are in use by other processes")
+
+
+def _renew_worker_id(stopped):
+    # a lease lost meanwhile, to an expiry or a cache restart, is claimed
+    # again; a process that can't stops handing out ids until it can
+    while not stopped.wait(MESSAGE_ID_WORKER_LEASE / 3):
+        try:
+            claim_worker_id()
+        except Exception:
+            logger.exception("Failed to renew the message id worker lease")
+
+
+def start_worker_renewal():
+    """Renew the lease a few times per lease period from a daemon thread."""
+    global _renewal
+    if _renewal is None:
+        _renewal = threading.Event()
+        threading.Thread(
+            target=_renew_worker_id,
+            args=(_renewal,),
+            name='message-id-worker',
+            daemon=True
+        ).start()
+
+
+def release_worker_id():
+    """Give the leased worker id back, at shutdown."""
+    global _worker, _renewal
+    if _renewal is not None:
+        _renewal.set()
+        _renewal = None
+    with _id_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker_id, token = worker
+        if cache.get(_worker_key(worker_id)) == token:
+            cache.delete(_worker_key(worker_id))
+
+
+def next_message_id():
+    """Return a new time ordered message id under this process's leased
+    worker id, see claim_worker_id."""
+    global _last_id_ms, _id_counter
+
+    with _id_lock:
+        if _worker is None:
+            raise ImproperlyConfigured("No message id worker is leased, see claim_worker_id")
+        worker_id = _worker[0]
+        now_ms = max(int(time.time() * 1000), _last_id_ms)
+        if now_ms == _last_id_ms:
+            _id_counter += 1
+            if _id_counter >> MESSAGE_ID_COUNTER_BITS:
+                # counter exhausted for this millisecond, borrow the next one
+                now_ms += 1
+                _id_counter = 0
+        else:
+            _id_counter = 0
+        _last_id_ms = now_ms
+
+        return (
+            ((now_ms - MESSAGE_ID_EPOCH_MS) << (MESSAGE_ID_WORKER_BITS + MESSAGE_ID_COUNTER_BITS))
+            | (worker_id << MESSAGE_ID_COUNTER_BITS)
+            | _id_counter
+        )
@@ -1,25 +1,144 @@
 from django.shortcuts import render, get_object_or_404
 from rest_framework.generics import ListAPIView
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from workspaces.permissions.channel import IsChannelMember
-from workspaces.models.channel import Channel 
+from workspaces.routes import request_route
 
-from chats.models.message import GroupMessage
+from chats import direct, mutations, search, unread, utils
+from chats.models.message import GroupMessage, PrivateMessage
 from chats.serializers.message import GroupMessageSerializer
+from chats.serializers.private_chat import PrivateChatSerializer, PrivateMessageSerializer
 
 class ChannelMessagesView(ListAPIView):
+    """Cursor paged channel history.
+
+    `?before=<message id>` loads older messages, `?after=<message id>` newer
+    ones and `?limit=` bounds the page size. Without a cursor the latest page
+    is returned."""
     serializer_class = GroupMessageSerializer
     permission_classes = [IsChannelMember & IsAuthenticated]
     
     def get_queryset(self):
-        channel_id = self.kwargs.get('channel_pk')
-        channel = get_object_or_404(Channel, id=channel_id)
-        
+        channel = request_route(self.request, self).channel
+
+        # thread replies are loaded with ThreadRepliesView
         return GroupMessage.objects.filter(
-            channel=channel
-        ).select_related(
-            'sender'  
-        ).order_by(
-            'created_at'
-        )
\ No newline at end of file
+            channel=channel,
+            parent=None
+        )
+
+    def list(self, request, *args, **kwargs):
+        try:
+            before, after, limit = utils.parse_history_params(request.query_params)
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+        messages, has_more = utils.get_message_page(
+            self.get_queryset(),
+            before=before,
+            after=after,
+            limit=limit
+        )
+        serializer = self.get_serializer(messages, many=True)
+        return Response({
+            'results': serializer.data,
+            'has_more': has_more,
+        })
+
+
+class ThreadRepliesView(ChannelMessagesView):
+    """Cursor paged replies of a message, same parameters as
+    ChannelMessagesView."""
+
+    def get_queryset(self):
+        parent = get_object_or_404(
+            GroupMessage.objects.only('id'),
+            channel_id=self.kwargs.get('channel_pk'),
+            pk=self.kwargs.get('message_pk')
+        )
+        return mutations.thread_queryset(self.kwargs.get('channel_pk'), parent.id)
+
+
+class SearchView(APIView):
+    """Full-text search over what the user can see.
+
+    `?q=` is the query (web search syntax on PostgreSQL), `?type=` one of
+    messages, submissions or remarks, `?channel=` narrows it to one channel
+    and `?cursor=` continues from a previous page's `next_cursor`."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            query, search_type, channel, cursor, limit = search.parse_search_params(
+                request.query_params
+            )
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+        results, next_cursor = search.search(
+            request.user,
+            query,
+            search_type=search_type,
+            channel=channel,
+            cursor=cursor,
+            limit=limit
+        )
+        return Response({
+            'results': results,
+            'next_cursor': next_cursor,
+        })
+
+
+class UnreadCountsView(APIView):
+    """Read cursor and unread count of every channel the user is in, so
+    clients know where there is something new without loading history."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(list(unread.unread_counts(request.user)))
+
+
+class DirectChatsView(APIView):
+    """The caller's direct chats, most recent conversation first.
+
+    POST `{"user": <id>}` opens the chat with that user, who has to share a
+    workspace with the caller."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        serializer = PrivateChatSerializer(
+            direct.inbox(request.user),
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            other_id = int(request.data.get('user'))
+        except (TypeError, ValueError):
+            raise ValidationError({"detail": "'user' must be a user id"})
+
+        chat = direct.open_chat(request.user.id, other_id)
+        if chat is None:
+            raise PermissionDenied("Cannot message this user")
+        serializer = PrivateChatSerializer(chat, context={'request': request})
+        return Response(serializer.data)
+
+
+class DirectMessagesView(ChannelMessagesView):
+    """Cursor paged history of a direct chat, same parameters as
+    ChannelMessagesView."""
+    serializer_class = PrivateMessageSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        chat = get_object_or_404(
+            direct.user_chats(self.request.user),
+            pk=self.kwargs.get('chat_pk')
+        )
+        return PrivateMessage.objects.filter(chat=chat)
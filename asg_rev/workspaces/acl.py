@@ -0,0 +1,386 @@
+"""In-process membership bitmaps of whole workspaces.
+
+Listing a category's channels, a channel's members or a team's roster
+asks the same few questions of the role tables over and over. A
+WorkspaceACL answers them from memory: the workspace's users and
+channels get dense ints, and every channel, category and team keeps a
+Python int whose set bits are its members, so the questions become a
+bitwise and plus decoding the bits that are left.
+
+Each process loads the ACL of a workspace on first use. Role and
+structure signals bump the workspace's version in the cache
+ROLE_INDEX['CACHE'] names after commit and log the change under the new
+version, see workspaces.signals.acl. Processes apply logged changes to
+their copy in place and only load the workspace again when they fell too
+far behind or a change can't be applied, e.g. a deleted channel."""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from workspaces.models import (
+    Category,
+    CategoryRole,
+    Channel,
+    ChannelRole,
+    WorkspaceRole,
+)
+from workspaces.roles import role_cache
+
+
+# a process further behind than this loads the workspace again
+MAX_CATCH_UP = 100
+# a change no ACL can apply in place
+RELOAD = ('reload',)
+# ACLs kept per process, least recently used ones are dropped first
+MAX_ACLS = 1000
+
+
+def version_key(workspace_id):
+    return f'workspaces:acl:{workspace_id}:version'
+
+
+def change_key(workspace_id, version):
+    return f'workspaces:acl:{workspace_id}:change:{version}'
+
+
+def _initial_version():
+    # like the role index, an evicted version starts again above any
+    # value it had
+    return time.time_ns() // 1000
+
+
+def _uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _bit_numbers(bits):
+    """Positions of the set bits of `bits`, lowest first."""
+    # scanning the binary digits with str.find beats shifting the int
+    # bit by bit once sets get dense
+    digits = bin(bits)[:1:-1]
+    numbers = []
+    position = digits.find('1')
+    while position != -1:
+        numbers.append(position)
+        position = digits.find('1', position + 1)
+    return numbers
+
+
+class WorkspaceACL:
+    """Who is in which category, channel and team of one workspace.
+
+    Users and channels are numbered densely in the order they are first
+    seen; numbers are never reused while the ACL lives, a rebuild packs
+    them again."""
+
+    def __init__(self, workspace_id, version):
+        self.workspace_id = workspace_id
+        self.version = version
+        self.user_ids = []
+        self.user_numbers = {}
+        self.channel_ids = []
+        self.channel_numbers = {}
+        self.channel_category = {}
+        # user bitsets
+        self.workspace_members = 0
+        self.category_members = {}
+        self.channel_members = {}
+        self.channel_reviewers = {}
+        self.team_members = {}
+        # channel bitsets
+        self.category_channels = {}
+        self.user_channels = {}
+        # (user id, channel id) -> (role, team id), to undo a role on change
+        self.channel_roles = {}
+
+    def _user(self, user_id):
+        number = self.user_numbers.get(user_id)
+        if number is None:
+            number = self.user_numbers[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return number
+
+    def add_category(self, category_id):
+        self.category_members.setdefault(category_id, 0)
+        self.category_channels.setdefault(category_id, 0)
+
+    def add_channel(self, channel_id, category_id):
+        self.add_category(category_id)
+        number = self.channel_numbers.get(channel_id)
+        if number is None:
+            number = self.channel_numbers[channel_id] = len(self.channel_ids)
+            self.channel_ids.append(channel_id)
+        moved_from = self.channel_category.get(channel_id)
+        if moved_from is not None and moved_from != category_id:
+            self.category_channels[moved_from] &= ~(1 << number)
+        self.channel_category[channel_id] = category_id
+        self.category_channels[category_id] |= 1 << number
+        self.channel_members.setdefault(channel_id, 0)
+        self.channel_reviewers.setdefault(channel_id, 0)
+
+    def set_workspace_role(self, user_id, present):
+        bit = 1 << self._user(user_id)
+        if present:
+            self.workspace_members |= bit
+        else:
+            self.workspace_members &= ~bit
+
+    def set_category_role(self, user_id, category_id, present):
+        if category_id not in self.category_members:
+            return
+        bit = 1 << self._user(user_id)
+        if present:
+            self.category_members[category_id] |= bit
+        else:
+            self.category_members[category_id] &= ~bit
+
+    def set_channel_role(self, user_id, channel_id, role, team_id):
+        """Give the user `role` in `team_id` of the channel, a None role
+        removes the user from it."""
+        if channel_id not in self.channel_numbers:
+            return
+        user = self._user(user_id)
+        bit = 1 << user
+        channel_bit = 1 << self.channel_numbers[channel_id]
+
+        old = self.channel_roles.pop((user_id, channel_id), None)
+        if old is not None:
+            self.channel_members[channel_id] &= ~bit
+            self.channel_reviewers[channel_id] &= ~bit
+            if old[1] is not None:
+                self.team_members[old[1]] = self.team_members.get(old[1], 0) & ~bit
+            self.user_channels[user] = self.user_channels.get(user, 0) & ~channel_bit
+        if role is None:
+            return
+
+        self.channel_roles[(user_id, channel_id)] = (role, team_id)
+        self.channel_members[channel_id] |= bit
+        if role == 'reviewer':
+            self.channel_reviewers[channel_id] |= bit
+        if team_id is not None:
+            self.team_members[team_id] = self.team_members.get(team_id, 0) | bit
+        self.user_channels[user] = self.user_channels.get(user, 0) | channel_bit
+
+    def apply(self, change):
+        """Apply a logged change, see workspaces.signals.acl. False when
+        it can't be applied in place."""
+        kind, *args = change
+        if kind == 'workspace_role':
+            self.set_workspace_role(*args)
+        elif kind == 'category_role':
+            # a category or channel created in the same transaction may
+            # only be logged after its roles
+            if args[1] not in self.category_members:
+                return False
+            self.set_category_role(*args)
+        elif kind == 'channel_role':
+            if args[1] not in self.channel_numbers:
+                return False
+            self.set_channel_role(*args)
+        elif kind == 'category':
+            self.add_category(*args)
+        elif kind == 'channel':
+            self.add_channel(*args)
+        else:
+            return False
+        return True
+
+    def _users(self, bits):
+        return [self.user_ids[number] for number in _bit_numbers(bits)]
+
+    def _channels(self, bits):
+        return [self.channel_ids[number] for number in _bit_numbers(bits)]
+
+    # ids may come straight from URL kwargs, as strings
+
+    def visible_channels(self, user_id, category_id):
+        """Ids of the channels of the category the user has a role in."""
+        number = self.user_numbers.get(user_id)
+        if number is None:
+            return []
+        return self._channels(
+            self.user_channels.get(number, 0) & self.category_channels.get(int(category_id), 0)
+        )
+
+    def is_channel_member(self, user_id, channel_id):
+        number = self.user_numbers.get(user_id)
+        members = self.channel_members.get(_uuid(channel_id), 0)
+        return number is not None and bool(members >> number & 1)
+
+    def channel_members_of(self, channel_id):
+        return self._users(self.channel_members.get(_uuid(channel_id), 0))
+
+    def reviewers_of(self, channel_id):
+        return self._users(self.channel_reviewers.get(_uuid(channel_id), 0))
+
+    def team_roster(self, team_id):
+        return self._users(self.team_members.get(_uuid(team_id), 0))
+
+    def category_members_of(self, category_id):
+        return self._users(self.category_members.get(int(category_id), 0))
+
+    def workspace_members_of(self):
+        return self._users(self.workspace_members)
+
+    @classmethod
+    def load(cls, workspace_id, version):
+        """Build the ACL of the workspace, five queries."""
+        acl = cls(workspace_id, version)
+        for user_id in WorkspaceRole.objects.filter(
+            workspace_id=workspace_id
+        ).values_list('user_id', flat=True):
+            acl.set_workspace_role(user_id, True)
+
+        for category_id in Category.objects.filter(
+            workspace_id=workspace_id
+        ).values_list('id', flat=True):
+            acl.add_category(category_id)
+        for user_id, category_id in CategoryRole.objects.filter(
+            category__workspace_id=workspace_id
+        ).values_list('user_id', 'category_id'):
+            acl.set_category_role(user_id, category_id, True)
+
+        for channel_id, category_id in Channel.objects.filter(
+            category__workspace_id=workspace_id
+        ).values_list('id', 'category_id'):
+            acl.add_channel(channel_id, category_id)
+        for user_id, channel_id, role, team_id in ChannelRole.objects.filter(
+            channel__category__workspace_id=workspace_id
+        ).values_list('user_id', 'channel_id', 'role', 'team_id'):
+            acl.set_channel_role(user_id, channel_id, role, team_id)
+        return acl
+
+
+class ACLRegistry:
+    """The WorkspaceACLs of this process, at most `max_size` of them, and
+    which of them each of their categories and channels is in."""
+
+    def __init__(self, max_size=MAX_ACLS):
+        self.max_size = max_size
+        self._acls = OrderedDict()
+        # ('category', id) or ('channel', id) -> workspace id
+        self._containers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._acls)
+
+    @staticmethod
+    def _keys(acl):
+        keys = [('category', category_id) for category_id in acl.category_channels]
+        keys += [('channel', channel_id) for channel_id in acl.channel_numbers]
+        return keys
+
+    def _index(self, acl, change=None):
+        """Map the categories and channels of `acl`, or only the one a
+        `change` added."""
+        if change is None:
+            keys = self._keys(acl)
+        elif change[0] in ('category', 'channel'):
+            keys = [(change[0], change[1])]
+        else:
+            return
+        for key in keys:
+            self._containers[key] = acl.workspace_id
+
+    def _store(self, acl):
+        self._acls[acl.workspace_id] = acl
+        self._index(acl)
+        while len(self._acls) > self.max_size:
+            self._drop(next(iter(self._acls)))
+
+    def _drop(self, workspace_id):
+        acl = self._acls.pop(workspace_id, None)
+        if acl is None:
+            return
+        for key in self._keys(acl):
+            if self._containers.get(key) == workspace_id:
+                del self._containers[key]
+
+    def _version(self, cache, workspace_id):
+        version = cache.get(version_key(workspace_id))
+        if version is None:
+            cache.add(version_key(workspace_id), _initial_version(), None)
+            version = cache.get(version_key(workspace_id))
+        return version
+
+    def _catch_up(self, cache, acl, version):
+        """Apply the logged changes that bring `acl` to `version`, False
+        when some of them are missing."""
+        if not 0 < version - acl.version <= MAX_CATCH_UP:
+            return False
+        versions = range(acl.version + 1, version + 1)
+        changes = cache.get_many([change_key(acl.workspace_id, v) for v in versions])
+        if len(changes) != len(versions):
+            return False
+        for v in versions:
+            change = changes[change_key(acl.workspace_id, v)]
+            if not acl.apply(change):
+                return False
+            self._index(acl, change)
+        acl.version = version
+        return True
+
+    def get(self, workspace_id):
+        """The current ACL of the workspace, brought up to date with the
+        changes other processes logged since, or loaded again."""
+        workspace_id = _uuid(workspace_id)
+        cache = role_cache()
+        version = self._version(cache, workspace_id)
+        with self._lock:
+            acl = self._acls.get(workspace_id)
+            if acl is not None and (acl.version == version or self._catch_up(cache, acl, version)):
+                self._acls.move_to_end(workspace_id)
+                return acl
+            self._drop(workspace_id)
+        acl = WorkspaceACL.load(workspace_id, version)
+        with self._lock:
+            self._drop(workspace_id)
+            self._store(acl)
+        return acl
+
+    def changed(self, workspace_id, change=RELOAD):
+        """Log `change` under the workspace's next version and apply it to
+        this process's ACL. Call after commit."""
+        workspace_id = _uuid(workspace_id)
+        cache = role_cache()
+        try:
+            version = cache.incr(version_key(workspace_id))
+        except ValueError:
+            # evicted, every process loads the workspace again
+            cache.add(version_key(workspace_id), _initial_version(), None)
+            return
+        cache.set(change_key(workspace_id, version), change, settings.ROLE_INDEX['TIMEOUT'])
+        with self._lock:
+            acl = self._acls.get(workspace_id)
+            if acl is not None and acl.version == version - 1:
+                if acl.apply(change):
+                    acl.version = version
+                    self._index(acl, change)
+                else:
+                    self._drop(workspace_id)
+
+    def find(self, category_id=None, channel_id=None):
+        """The loaded ACL with the category or channel, if any."""
+        if category_id is not None:
+            key = ('category', category_id)
+        else:
+            key = ('channel', channel_id)
+        with self._lock:
+            workspace_id = self._containers.get(key)
+            return None if workspace_id is None else self._acls.get(workspace_id)
+
+    def changed_on_commit(self, workspace_id, change=RELOAD):
+        transaction.on_commit(lambda: self.changed(workspace_id, change))
+
+    def clear(self):
+        with self._lock:
+            self._acls.clear()
+            self._containers.clear()
+
+
+workspace_acls = ACLRegistry()
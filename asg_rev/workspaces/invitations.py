@@ -0,0 +1,54 @@
+"""Workspace invitation emails.
+
+A user joins a workspace by following the link of an invitation, see
+AcceptWorkspaceInviteView; the link carries a password reset style token
+for the user and the role they are invited with."""
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.http import urlsafe_base64_encode
+
+from users.models import User
+
+
+def invitation_email(user, workspace, role, connection=None):
+    """The email inviting `user` to join `workspace` as `role`."""
+    token = default_token_generator.make_token(user)
+    uid = urlsafe_base64_encode(str(user.pk).encode('utf-8'))
+    accept_url = reverse(
+        'accept_workspace_invite',
+        kwargs={
+            'workspace_pk': workspace.pk,
+            'token': token,
+            'uidb64': uid,
+            'role': role
+        },
+    )
+    invite_url = f"http://{settings.MY_DOMAIN}{accept_url}"
+
+    subject = "Invitation to join the Workspace"
+    html_content = format_html(
+        """
+        <p>Hello {username},</p>
+        <p>You have been invited to join a workspace. Click the link below to accept the invitation:</p>
+        <p><a href="{invite_url}" style="color: blue; text-decoration: underline;">Accept Invitation</a></p>
+        <p>If you did not request this, please ignore this email.</p>
+        """,
+        username=user.username,
+        invite_url=invite_url,
+    )
+    email = EmailMultiAlternatives(subject, "", None, [user.email], connection=connection)
+    email.attach_alternative(html_content, "text/html")
+    return email
+
+
+def send_invitations(workspace, roles):
+    """Invite the users of `roles`, user id -> role, to the workspace, one
+    query for the users and one mail server connection for all emails."""
+    users = User.objects.filter(pk__in=list(roles))
+    connection = get_connection()
+    connection.send_messages([
+        invitation_email(user, workspace, roles[user.pk], connection) for user in users
+    ])
@@ -0,0 +1,308 @@
+"""Adding many members to a workspace, category or channel at once.
+
+The member views take one user per request and spend a handful of
+queries on each. BulkMembers takes a list of rows (user email, role and,
+for channels, team) and, in one transaction, resolves every user
+together with their workspace membership and current role in one query,
+creates the channel's missing teams with one insert and upserts all the
+roles with another. Rows that can't be applied are reported and skipped,
+the others are applied. A dry run reports the same without writing.
+
+Users new to a workspace are sent an invitation rather than added, like
+the single member endpoint does, unless the request asks for `direct`
+enrollment; see BulkWorkspaceMembers.
+
+One BulkMembers can take the rows of a long file in chunks, see
+workspaces.roster; users listed twice are caught across chunks.
+
+bulk_create sends no post_save, so the role index, workspace ACL and
+version counter updates the role signals make are made here, once for
+the whole batch."""
+import uuid
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from users.models import User
+from workspaces.acl import workspace_acls
+from workspaces.invitations import send_invitations
+from workspaces.models import (
+    CategoryRole,
+    ChannelRole,
+    Team,
+    WorkspaceRole,
+)
+from workspaces.roles import invalidate_role_indexes, roles_committed
+from workspaces.versions import (
+    bump_versions,
+    channel_version_key,
+    workspace_version_key,
+)
+
+# rows per request
+MAX_ROWS = 1000
+# rows per INSERT
+BATCH_SIZE = 500
+
+
+def _team_id(value):
+    # subqueries of uuid columns come back as hex text on SQLite
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+class BulkMembers:
+    """Upserts roles of `container`, one of the workspace's objects, or
+    only reports what it would upsert when `dry_run`."""
+
+    model = None
+    container_field = None
+    default_role = None
+    update_fields = ['role']
+    # users have to be workspace members before joining anything in it
+    requires_workspace_member = True
+    # users new to the container are invited instead of added
+    invites = False
+
+    def __init__(self, container, workspace_id, dry_run=False):
+        self.container = container
+        self.workspace_id = workspace_id
+        self.dry_run = dry_run
+        # email -> row it was first listed in
+        self.seen = {}
+
+    def roles(self):
+        return self.model.objects.filter(**{self.container_field: self.container})
+
+    def check(self, row):
+        """Fill in and check one row, set its error if it can't be applied."""
+        choices = dict(self.model.ROLE_CHOICES)
+        if row['role'] not in choices:
+            row['error'] = f"Role must be one of: {', '.join(choices)}"
+
+    def prepare(self, rows):
+        """Load what writing `rows` needs beyond their users."""
+
+    def changed(self, row):
+        return row['current_role'] != row['role']
+
+    def build(self, row):
+        return self.model(user_id=row['user_id'], role=row['role'], **{self.container_field: self.container})
+
+    def version_keys(self):
+        return [workspace_version_key(self.workspace_id)]
+
+    def invite(self, rows):
+        """Invite the users of `rows` once the transaction commits."""
+        raise NotImplementedError
+
+    def _rows(self, members, numbers):
+        rows, seen = [], self.seen
+        for number, member in zip(numbers, members):
+            if not isinstance(member, dict):
+                member = {}
+            email = str(member.get('user_email') or '').strip()
+            row = {
+                'row': number,
+                'user_email': email,
+                'role': member.get('role') or self.default_role,
+                'team': member.get('team'),
+                'error': None,
+            }
+            if not email:
+                row['error'] = "User email is required."
+            elif email in seen:
+                row['error'] = f"User is listed in row {seen[email]} already."
+            else:
+                seen[email] = number
+                self.check(row)
+            rows.append(row)
+        return rows
+
+    def _resolve_users(self, rows):
+        """Set `user_id` and the current value of each update field,
+        `current_role` etc., of the rows whose user exists, one query."""
+        pending = {row['user_email']: row for row in rows if row['error'] is None}
+        if not pending:
+            return
+        current = self.roles().filter(user=OuterRef('pk'))
+        users = User.objects.filter(email__in=list(pending)).only('id', 'email').annotate(
+            in_workspace=Exists(WorkspaceRole.objects.filter(
+                workspace_id=self.workspace_id,
+                user=OuterRef('pk')
+            )),
+            **{
+                f'current_{field}': Subquery(current.values(field)[:1])
+                for field in self.update_fields
+            }
+        )
+        found = set()
+        for user in users:
+            row = pending[user.email]
+            found.add(user.email)
+            if self.requires_workspace_member and not user.in_workspace:
+                row['error'] = "User is not a workspace member."
+                continue
+            row['user_id'] = user.pk
+            for field in self.update_fields:
+                row[f'current_{field}'] = getattr(user, f'current_{field}')
+        for email, row in pending.items():
+            if email not in found:
+                row['error'] = "User does not exist."
+
+    def _roles_changed(self, user_ids):
+        # now and again after commit, like workspaces.signals.roles
+        invalidate_role_indexes(user_ids)
+        transaction.on_commit(lambda: roles_committed(user_ids))
+        workspace_acls.changed_on_commit(self.workspace_id)
+        bump_versions(self.version_keys())
+
+    def add(self, members, numbers=None):
+        """Apply the rows of `members`, dicts with `user_email`, `role`
+        and `team`, numbered 1, 2, ... or by `numbers`. Returns one result
+        per row, in order."""
+        if numbers is None:
+            numbers = range(1, len(members) + 1)
+        rows = self._rows(members, numbers)
+        with transaction.atomic():
+            self._resolve_users(rows)
+            valid = [row for row in rows if row['error'] is None]
+            self.prepare(valid)
+            writes, invitations = [], []
+            for row in valid:
+                if row['current_role'] is None and self.invites:
+                    row['status'] = 'invited'
+                    invitations.append(row)
+                    continue
+                if row['current_role'] is None:
+                    row['status'] = 'created'
+                elif self.changed(row):
+                    row['status'] = 'updated'
+                else:
+                    row['status'] = 'unchanged'
+                    continue
+                writes.append(self.build(row))
+            if writes and not self.dry_run:
+                # a role added concurrently is updated rather than failing
+                # the batch
+                self.model.objects.bulk_create(
+                    writes,
+                    batch_size=BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=['user', self.container_field],
+                    update_fields=self.update_fields,
+                )
+                self._roles_changed([role.user_id for role in writes])
+            if invitations and not self.dry_run:
+                self.invite(invitations)
+        return [self.result(row) for row in rows]
+
+    def result(self, row):
+        result = {'row': row['row'], 'user_email': row['user_email']}
+        if row['error'] is not None:
+            result.update(status='error', detail=row['error'])
+        else:
+            result.update(status=row['status'], role=row['role'])
+        return result
+
+
+class BulkWorkspaceMembers(BulkMembers):
+    """Role changes of members are applied, users who aren't members yet
+    get an invitation email to accept, or are added right away when
+    `direct`: an explicit choice of the admin enrolling users who agreed
+    to it elsewhere, e.g. a course's students."""
+
+    model = WorkspaceRole
+    container_field = 'workspace'
+    default_role = 'workspace_member'
+    requires_workspace_member = False
+
+    def __init__(self, container, workspace_id, dry_run=False, direct=False):
+        super().__init__(container, workspace_id, dry_run)
+        self.invites = not direct
+
+    def invite(self, rows):
+        roles = {row['user_id']: row['role'] for row in rows}
+        workspace = self.container
+        transaction.on_commit(lambda: send_invitations(workspace, roles))
+
+
+class BulkCategoryMembers(BulkMembers):
+    model = CategoryRole
+    container_field = 'category'
+    default_role = 'category_member'
+
+
+class BulkChannelMembers(BulkMembers):
+    """Channel roles also put the user in a team, created when the channel
+    has none of that name: reviewers in 'Reviewers', reviewees in theirs
+    or 'Unassigned'."""
+
+    model = ChannelRole
+    container_field = 'channel'
+    default_role = 'reviewee'
+    update_fields = ['role', 'team']
+
+    def check(self, row):
+        super().check(row)
+        if row['error'] is not None:
+            return
+        team = str(row['team'] or '').strip()
+        if row['role'] == 'reviewer':
+            team = 'Reviewers'
+        elif not team:
+            team = 'Unassigned'
+        elif team == 'Reviewers':
+            row['error'] = "Reviewers cannot have reviewees."
+        row['team'] = team
+
+    def __init__(self, container, workspace_id, dry_run=False):
+        super().__init__(container, workspace_id, dry_run)
+        # team name -> id, of the teams loaded or created so far
+        self.teams = {}
+        # names of the teams created, or a dry run would create
+        self.new_teams = []
+
+    def prepare(self, rows):
+        names = {row['team'] for row in rows} - set(self.teams)
+        if names:
+            for team_id, name in Team.objects.filter(
+                channel=self.container,
+                team_name__in=names
+            ).order_by('team_name', 'id').values_list('id', 'team_name'):
+                self.teams.setdefault(name, team_id)
+            missing = [Team(team_name=name, channel=self.container) for name in sorted(names - set(self.teams))]
+            if missing and not self.dry_run:
+                Team.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+            # a dry run makes the new teams' ids up, nobody is in them yet
+            self.teams.update({team.team_name: team.id for team in missing})
+            self.new_teams.extend(team.team_name for team in missing)
+        for row in rows:
+            row['team_id'] = self.teams[row['team']]
+
+    def changed(self, row):
+        return super().changed(row) or _team_id(row['current_team']) != row['team_id']
+
+    def build(self, row):
+        role = super().build(row)
+        role.team_id = row['team_id']
+        return role
+
+    def version_keys(self):
+        return [channel_version_key(self.container.pk)]
+
+    def result(self, row):
+        result = super().result(row)
+        if row['error'] is None:
+            result['team'] = row['team']
+        return result
+
+
+def summarize(results):
+    """Counts of each status of `results`, next to the results."""
+    summary = {'created': 0, 'invited': 0, 'updated': 0, 'unchanged': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    summary['results'] = results
+    return summary
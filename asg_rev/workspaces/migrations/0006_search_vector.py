@@ -0,0 +1,64 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:46
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# (table, text column) pairs kept searchable by a tsvector_update_trigger
+SEARCHABLE = [
+    ('workspaces_submission', 'content'),
+    ('workspaces_iteration', 'remarks'),
+]
+
+
+def create_search_triggers(apps, schema_editor):
+    """Keep `search_vector` in sync from the database itself so bulk and
+    write-behind inserts are indexed too. PostgreSQL only, the other
+    backends fall back to LIKE matching in chats.search."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCHABLE:
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_search_vector_update "
+            f"BEFORE INSERT OR UPDATE OF {column} ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE tsvector_update_trigger("
+            f"search_vector, 'pg_catalog.english', {column})"
+        )
+        schema_editor.execute(
+            f"UPDATE {table} SET search_vector = "
+            f"to_tsvector('pg_catalog.english', coalesce({column}, ''))"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {table}_search_vector_idx "
+            f"ON {table} USING GIN (search_vector)"
+        )
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in SEARCHABLE:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_vector_idx")
+        schema_editor.execute(
+            f"DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0005_iteration_reviewee'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iteration',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0006_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workspace',
+            name='message_retention_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0007_workspace_message_retention_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channelrole',
+            name='last_read_message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='channelrole',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_read_seq(apps, schema_editor):
+    """Start the seq cursor at the seq of the message the id cursor is at."""
+    ChannelRole = apps.get_model('workspaces', 'ChannelRole')
+    GroupMessage = apps.get_model('chats', 'GroupMessage')
+    ChannelRole.objects.filter(last_read_message_id__isnull=False).update(
+        last_read_seq=Coalesce(
+            Subquery(GroupMessage.objects.filter(
+                pk=OuterRef('last_read_message_id'),
+                channel_id=OuterRef('channel_id')
+            ).values('seq')[:1]),
+            Value(0),
+            output_field=models.PositiveBigIntegerField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workspaces', '0008_channelrole_read_cursor'),
+        ('chats', '0011_groupmessage_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channelrole',
+            name='last_read_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_read_seq, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='channelrole',
+            name='unread_count',
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from users.models import User 
 from workspaces.models.assignment.submission import (
@@ -26,6 +27,10 @@ class Iteration(models.Model):
     )
     remarks = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
 
     def __str__(self):
         reviewer_usernames = ", ".join([reviewer.username for reviewer in self.reviewers.all()])
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 from workspaces import utils
@@ -37,6 +38,10 @@ class Submission(models.Model):
     submitted_at = models.DateTimeField(
         auto_now_add=True
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
     
     def __str__(self):
         return f"Submission by {self.sender}[{self.sender_team}] for {self.assignment}"
@@ -31,6 +31,16 @@ class ChannelRole(models.Model):
         on_delete=models.CASCADE,
         related_name='team_channel_role'
     )
+    # read cursor, see chats.unread. A plain id rather than a foreign key,
+    # chat messages are stored partitioned
+    last_read_message_id = models.BigIntegerField(
+        null=True,
+        blank=True
+    )
+    # seq of that message, 0 before the first one is read
+    last_read_seq = models.PositiveBigIntegerField(
+        default=0
+    )
 
     class Meta:
         unique_together = ('user', 'channel')
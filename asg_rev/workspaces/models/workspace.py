@@ -21,6 +21,12 @@ class Workspace(models.Model):
         related_name='workspaces'  
     )
     created_at = models.DateTimeField(auto_now_add=True)  
+    # chat messages older than this are archived by `manage.py chat_retention`,
+    # empty keeps them forever
+    message_retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True
+    )
 
     def __str__(self):
         return self.name
@@ -15,3 +15,7 @@ from workspaces.permissions.channel import (
 from workspaces.permissions.team import (
     IsTeamMember
 )
+from workspaces.permissions.membership import (
+    RequestMembership,
+    request_membership,
+)
@@ -1,5 +1,7 @@
 from rest_framework.permissions import BasePermission
 
+from workspaces.permissions.membership import request_membership
+
 
 class IsCategoryAdmin(BasePermission):
     '''not implemented'''
@@ -17,6 +19,5 @@ class IsCategoryMember(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        return request.user.category_role.filter(
-            role__startswith='category_'
-        ).exists()
+        role = request_membership(request, view).category_role()
+        return role is not None and role.startswith('category_')
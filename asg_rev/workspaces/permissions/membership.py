@@ -0,0 +1,65 @@
+"""Roles of the requesting user along the URL's workspace, category,
+channel and submission, loaded once per request.
+
+Permission classes are composed, e.g. `IsWorkspaceOwnerOrAdmin |
+(IsWorkspaceMember & IsChannelMember)`, so instead of fetching their
+objects and roles on every check they all read `request_membership`,
+which keeps on the request the user's cached role index and the chain of
+objects the URL names, see workspaces.routes."""
+from workspaces.roles import get_role_index
+from workspaces.routes import request_route
+
+
+class RequestMembership:
+    """What the user is in the objects `route` names. Roles come from the
+    user's role index, owners and submissions from the route."""
+
+    def __init__(self, user, route):
+        self.user = user
+        self.route = route
+        self.ids = route.ids
+        self._roles = None
+
+    @property
+    def roles(self):
+        """The RoleIndex of the user, see workspaces.roles."""
+        if self._roles is None:
+            self._roles = get_role_index(self.user.pk)
+        return self._roles
+
+    def workspace_role(self):
+        if self.route.workspace is None:
+            return None
+        return self.roles.workspace_role(self.route.workspace.pk)
+
+    def is_workspace_owner(self):
+        workspace = self.route.workspace
+        return workspace is not None and workspace.owner_id == self.user.pk
+
+    def category_role(self):
+        if self.route.category is None:
+            return None
+        return self.roles.category_role(self.route.category.pk)
+
+    def channel_role(self):
+        if self.route.channel is None:
+            return None
+        return self.roles.channel_role(self.route.channel.pk)
+
+    def is_team_member(self):
+        """Whether the user is in the team that sent the URL's submission."""
+        if self.ids['submission'] is None:
+            return False
+        return self.roles.is_in_team(self.route.channel.pk, self.route.submission_team_id)
+
+
+def request_membership(request, view):
+    """The RequestMembership of `request`, created on first use. Raises
+    NotFound when the URL's objects don't exist or don't nest."""
+    membership = getattr(request, '_membership', None)
+    if membership is None:
+        membership = request._membership = RequestMembership(
+            request.user,
+            request_route(request, view)
+        )
+    return membership
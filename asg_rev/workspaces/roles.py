@@ -0,0 +1,203 @@
+"""Per user index of roles: what the user is in every workspace, category
+and channel, so permission checks, queryset filters and socket connects
+don't go to the database for them.
+
+The index lives in the cache ROLE_INDEX['CACHE'] names, next to a version
+counter of the user. Saving or deleting any role bumps the counter (see
+workspaces.signals.roles), which retires the cached index in one atomic
+step however many processes read it; the next read loads it again with
+one query. An index loaded while a role changed is stored under the old
+version and never served.
+
+Once the change commits `roles_changed` is sent with the users' ids, so
+what holds on to a role, like an open chat socket, can look again."""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast
+from django.dispatch import Signal
+
+from workspaces.models import CategoryRole, ChannelRole, WorkspaceRole
+
+
+# sent with `user_ids` after roles of theirs changed and committed
+roles_changed = Signal()
+
+
+def role_cache():
+    return caches[settings.ROLE_INDEX['CACHE']]
+
+
+def version_key(user_id):
+    return f'workspaces:roles:{user_id}:version'
+
+
+def index_key(user_id):
+    return f'workspaces:roles:{user_id}'
+
+
+def _initial_version():
+    # a counter the cache evicted starts again above any value it had, so
+    # an index cached under an old version can't match it by chance
+    return time.time_ns() // 1000
+
+
+def _uuid_key(value):
+    try:
+        return str(value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _int_key(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RoleIndex:
+    """Roles of one user: workspace id -> role, category id -> role and
+    channel id -> (role, team id). A user has at most one role per object,
+    so these are the (id, role) and (id, role, team id) sets keyed by id.
+    `version` is the user's counter the index is current for."""
+
+    def __init__(self, workspaces, categories, channels, version=None):
+        self.workspaces = workspaces
+        self.categories = categories
+        self.channels = channels
+        self.version = version
+
+    def workspace_role(self, workspace_id):
+        return self.workspaces.get(_uuid_key(workspace_id))
+
+    def category_role(self, category_id):
+        return self.categories.get(_int_key(category_id))
+
+    def channel_role(self, channel_id):
+        membership = self.channels.get(_uuid_key(channel_id))
+        return None if membership is None else membership[0]
+
+    def channel_membership(self, channel_id):
+        """{'role', 'team_id'} of the user in the channel, or None."""
+        membership = self.channels.get(_uuid_key(channel_id))
+        if membership is None:
+            return None
+        return {'role': membership[0], 'team_id': membership[1]}
+
+    def is_in_team(self, channel_id, team_id):
+        membership = self.channels.get(_uuid_key(channel_id))
+        return membership is not None and team_id is not None and membership[1] == _uuid_key(team_id)
+
+    def workspace_ids(self):
+        return list(self.workspaces)
+
+    def category_ids(self):
+        return list(self.categories)
+
+    def channel_ids(self):
+        return list(self.channels)
+
+    def as_cached(self, version):
+        return {
+            'version': version,
+            'workspaces': self.workspaces,
+            'categories': self.categories,
+            'channels': self.channels,
+        }
+
+    @classmethod
+    def from_cached(cls, value, version):
+        """The index in a cached value, None unless it is of `version`."""
+        if not isinstance(value, dict) or value.get('version') != version:
+            return None
+        return cls(value['workspaces'], value['categories'], value['channels'], version)
+
+    @classmethod
+    def from_rows(cls, rows, version=None):
+        workspaces, categories, channels = {}, {}, {}
+        for level, object_id, role, team_id in rows:
+            # ids come back as text, hex or dashed depending on the database
+            if level == 'workspace':
+                workspaces[_uuid_key(object_id)] = role
+            elif level == 'category':
+                categories[int(object_id)] = role
+            else:
+                channels[_uuid_key(object_id)] = (role, team_id and _uuid_key(team_id))
+        return cls(workspaces, categories, channels, version)
+
+
+def roles_queryset(user_id):
+    """(level, object id, role, team id) of every role of the user."""
+    text = CharField()
+
+    def rows(model, level, object_field, team=Value(None, output_field=text)):
+        return model.objects.filter(user_id=user_id).order_by().values_list(
+            Value(level, output_field=text),
+            Cast(object_field, text),
+            'role',
+            team
+        )
+
+    return rows(WorkspaceRole, 'workspace', 'workspace_id').union(
+        rows(CategoryRole, 'category', 'category_id'),
+        rows(ChannelRole, 'channel', 'channel_id', Cast('team_id', text)),
+        all=True
+    )
+
+
+def get_role_index(user_id):
+    """The RoleIndex of the user, from the cache or loaded with one query."""
+    cache = role_cache()
+    cached = cache.get_many([version_key(user_id), index_key(user_id)])
+    version = cached.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), _initial_version(), None)
+        version = cache.get(version_key(user_id))
+    index = RoleIndex.from_cached(cached.get(index_key(user_id)), version)
+    if index is None:
+        index = RoleIndex.from_rows(roles_queryset(user_id), version)
+        cache.set(index_key(user_id), index.as_cached(version), settings.ROLE_INDEX['TIMEOUT'])
+    return index
+
+
+async def aget_role_index(user_id):
+    """`get_role_index` for async code."""
+    cache = role_cache()
+    cached = await cache.aget_many([version_key(user_id), index_key(user_id)])
+    version = cached.get(version_key(user_id))
+    if version is None:
+        await cache.aadd(version_key(user_id), _initial_version(), None)
+        version = await cache.aget(version_key(user_id))
+    index = RoleIndex.from_cached(cached.get(index_key(user_id)), version)
+    if index is None:
+        index = RoleIndex.from_rows([row async for row in roles_queryset(user_id)], version)
+        await cache.aset(index_key(user_id), index.as_cached(version), settings.ROLE_INDEX['TIMEOUT'])
+    return index
+
+
+def invalidate_role_index(user_id):
+    """Retire the cached index of the user by bumping its version."""
+    cache = role_cache()
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        # evicted, starting it again retires whatever index is cached
+        cache.add(version_key(user_id), _initial_version(), None)
+
+
+def invalidate_role_indexes(user_ids):
+    """`invalidate_role_index` for many users in one cache round trip.
+    Dropping the counters retires the indexes just the same, they start
+    again above any value they had."""
+    role_cache().delete_many([version_key(user_id) for user_id in user_ids])
+
+
+def roles_committed(user_ids):
+    """Retire the indexes of users whose role changes just committed and
+    send `roles_changed`."""
+    invalidate_role_indexes(user_ids)
+    roles_changed.send(sender=None, user_ids=user_ids)
@@ -0,0 +1,231 @@
+"""Importing a channel's roster from an uploaded CSV or XLSX file.
+
+Rows are read one at a time, the CSV through the csv module and the XLSX
+by walking the first sheet's XML with iterparse, dropping every row once
+read, and applied CHUNK_SIZE at a time through BulkChannelMembers. Besides
+the emails seen so far, to catch users listed twice, a chunk of rows, the
+users and teams it names and the report are all that is kept in memory
+however long the file. The report keeps the counts of every status but
+lists at most REPORT_LIMIT rows. An XLSX is a zip archive, its parts are
+checked against the MAX_*_SIZE limits by the size they unpack to before
+they are read, and cells past column XFD, the last Excel has, are refused.
+
+The columns are `user_email` (or `email`), `role` and `team`, named in
+the first row, in any order; other columns are ignored."""
+import codecs
+import csv
+import itertools
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
+from django.db import transaction
+
+from workspaces.members import BulkChannelMembers
+
+CHUNK_SIZE = 1000
+MAX_ROWS = 100_000
+REPORT_LIMIT = 1000
+# columns up to XFD
+MAX_COLUMNS = 16384
+# unpacked sizes of the XLSX parts read
+MAX_SHEET_SIZE = 100 * 1024 * 1024
+MAX_SHARED_STRINGS_SIZE = 32 * 1024 * 1024
+MAX_PART_SIZE = 1024 * 1024
+
+COLUMNS = {
+    'user_email': 'user_email',
+    'email': 'user_email',
+    'role': 'role',
+    'team': 'team',
+    'team_name': 'team',
+}
+
+MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class RosterError(ValueError):
+    """The file can't be read as a roster."""
+
+
+def read_csv(file):
+    """Cells of each line of a UTF-8 CSV file."""
+    yield from csv.reader(codecs.iterdecode(file, 'utf-8-sig'))
+
+
+def _open(archive, name, limit):
+    """Open a part of the archive that unpacks to at most `limit` bytes."""
+    if archive.getinfo(name).file_size > limit:
+        raise RosterError("The workbook is too large.")
+    # reading stops at the size the archive declares
+    return archive.open(name)
+
+
+def _first_sheet(archive):
+    """Path in the archive of the workbook's first sheet."""
+    names = set(archive.namelist())
+    if not {'xl/workbook.xml', 'xl/_rels/workbook.xml.rels'} <= names:
+        raise RosterError("The file isn't an XLSX workbook.")
+    with _open(archive, 'xl/workbook.xml', MAX_PART_SIZE) as part:
+        workbook = ElementTree.parse(part).getroot()
+    sheet = workbook.find(f'{MAIN}sheets/{MAIN}sheet')
+    if sheet is None:
+        raise RosterError("The workbook has no sheets.")
+    with _open(archive, 'xl/_rels/workbook.xml.rels', MAX_PART_SIZE) as part:
+        relationships = ElementTree.parse(part).getroot()
+    for relationship in relationships.iter(f'{PACKAGE}Relationship'):
+        if relationship.get('Id') == sheet.get(f'{RELATIONSHIP}id'):
+            target = relationship.get('Target') or ''
+            if target.startswith('/'):
+                path = target.lstrip('/')
+            else:
+                path = posixpath.normpath(posixpath.join('xl', target))
+            if path in names:
+                return path
+    raise RosterError("The workbook's first sheet is missing.")
+
+
+def _shared_strings(archive):
+    # XLSX keeps each distinct text once, in this table; it has to be
+    # held to read the cells that point into it
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with _open(archive, 'xl/sharedStrings.xml', MAX_SHARED_STRINGS_SIZE) as table:
+        for _, element in ElementTree.iterparse(table):
+            if element.tag == f'{MAIN}si':
+                strings.append(''.join(text.text or '' for text in element.iter(f'{MAIN}t')))
+                element.clear()
+    return strings
+
+
+def _column(reference):
+    """0 based column of a cell reference like 'AB12'."""
+    number = 0
+    for letter in reference:
+        if not letter.isalpha():
+            break
+        number = number * 26 + ord(letter.upper()) - ord('A') + 1
+        if number > MAX_COLUMNS:
+            raise RosterError("The workbook has cells past column XFD.")
+    return number - 1
+
+
+def _cell(cell, strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(f'{MAIN}t'))
+    value = cell.findtext(f'{MAIN}v')
+    if value is None:
+        return ''
+    try:
+        if kind == 's':
+            return strings[int(value)]
+        if kind is None or kind == 'n':
+            # whole numbers, like team 1, may be stored as 1.0
+            number = float(value)
+            if number.is_integer():
+                return str(int(number))
+    except (IndexError, ValueError):
+        raise RosterError("The workbook has a broken cell.")
+    return value
+
+
+def read_xlsx(file):
+    """Cells of each row of the first sheet of an XLSX file."""
+    archive = zipfile.ZipFile(file)
+    strings = _shared_strings(archive)
+    with _open(archive, _first_sheet(archive), MAX_SHEET_SIZE) as sheet:
+        rows = None
+        for event, element in ElementTree.iterparse(sheet, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == f'{MAIN}sheetData':
+                    rows = element
+                continue
+            if element.tag != f'{MAIN}row':
+                continue
+            cells = []
+            for cell in element.iter(f'{MAIN}c'):
+                reference = cell.get('r')
+                column = _column(reference) if reference else len(cells)
+                if column >= MAX_COLUMNS:
+                    raise RosterError("The workbook has cells past column XFD.")
+                cells.extend([''] * (column - len(cells)))
+                cells.append(_cell(cell, strings))
+            # drop the row from the tree iterparse is building
+            if rows is not None:
+                rows.remove(element)
+            yield cells
+
+
+def read_rows(file, name):
+    """(row number, {'user_email', 'role', 'team'}) of each row of the
+    uploaded roster, by the columns its first row names. Blank rows are
+    skipped but counted."""
+    extension = posixpath.splitext(name or '')[1].lower()
+    if extension == '.csv':
+        lines = read_csv(file)
+    elif extension == '.xlsx':
+        lines = read_xlsx(file)
+    else:
+        raise RosterError("Upload a .csv or .xlsx file.")
+
+    header = next(lines, None)
+    if header is None:
+        raise RosterError("The file is empty.")
+    columns = [COLUMNS.get(cell.strip().lower().replace(' ', '_')) for cell in header]
+    if 'user_email' not in columns:
+        raise RosterError("The first row has to name a user_email column.")
+
+    for number, cells in enumerate(lines, 2):
+        if not any(cell.strip() for cell in cells):
+            continue
+        if number > MAX_ROWS + 1:
+            raise RosterError(f"The file has more than {MAX_ROWS} rows.")
+        member = {}
+        for column, cell in zip(columns, cells):
+            if column is not None:
+                member[column] = cell.strip()
+        yield number, member
+
+
+def import_roster(channel, workspace_id, file, name, dry_run=False):
+    """Add or update the channel members the roster file lists, in one
+    transaction. Returns the counts of each row status, the teams created
+    and up to REPORT_LIMIT rows that changed or failed."""
+    bulk = BulkChannelMembers(channel, workspace_id, dry_run=dry_run)
+    report = {
+        'dry_run': dry_run,
+        'rows': 0,
+        'created': 0,
+        'updated': 0,
+        'unchanged': 0,
+        'error': 0,
+        'results': [],
+        'truncated': False,
+    }
+    try:
+        rows = read_rows(file, name)
+        with transaction.atomic():
+            while True:
+                chunk = list(itertools.islice(rows, CHUNK_SIZE))
+                if not chunk:
+                    break
+                numbers, members = zip(*chunk)
+                for result in bulk.add(list(members), numbers):
+                    report['rows'] += 1
+                    report[result['status']] += 1
+                    if result['status'] == 'unchanged':
+                        continue
+                    if len(report['results']) < REPORT_LIMIT:
+                        report['results'].append(result)
+                    else:
+                        report['truncated'] = True
+    except (UnicodeDecodeError, csv.Error):
+        raise RosterError("The file isn't a UTF-8 encoded CSV.")
+    except (zipfile.BadZipFile, ElementTree.ParseError):
+        raise RosterError("The file isn't an XLSX workbook.")
+    report['new_teams'] = bulk.new_teams
+    return report
@@ -0,0 +1,119 @@
+"""The workspace -> category -> channel chain a nested URL names, checked
+and loaded once per request.
+
+`/api/workspaces/<w>/categories/<c>/channels/<ch>/...` names a channel
+that has to be in category <c> of workspace <w>. `request_route` loads
+the innermost object the URL names together with everything above it
+(and the channel's assignment) in one joined query, answers 404 when the
+chain doesn't hold, and keeps the result on the request for the
+permissions, views and serializers of that request."""
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef, Subquery
+from rest_framework.exceptions import NotFound
+
+from workspaces.models import (
+    Assignment,
+    Category,
+    Channel,
+    Submission,
+    Workspace,
+)
+
+# URL kwargs `<level>_pk`, outermost first. A bare `pk` is the level below
+# the innermost one named, e.g. the channel of .../channels/<pk>/
+LEVELS = ('workspace', 'category', 'channel', 'submission')
+
+
+def hierarchy_ids(kwargs):
+    """level -> id the URL names, None for the levels it doesn't."""
+    ids = {level: kwargs.get(f'{level}_pk') for level in LEVELS}
+    if kwargs.get('pk') is not None:
+        named = [index for index, level in enumerate(LEVELS) if ids[level] is not None]
+        below = named[-1] + 1 if named else 0
+        if below < len(LEVELS):
+            ids[LEVELS[below]] = kwargs['pk']
+    return ids
+
+
+class NestedRoute:
+    """The objects a URL names, None for the levels it doesn't. A named
+    submission is only checked and described by its sender's team."""
+
+    def __init__(self, ids, workspace=None, category=None, channel=None, submission_team_id=None):
+        self.ids = ids
+        self.workspace = workspace
+        self.category = category
+        self.channel = channel
+        self.submission_team_id = submission_team_id
+
+    @property
+    def assignment(self):
+        """The channel's assignment, None when it has none."""
+        if self.channel is None:
+            return None
+        try:
+            return self.channel.assignment
+        except Assignment.DoesNotExist:
+            return None
+
+
+def _channel_route(ids):
+    channels = Channel.objects.select_related('category__workspace', 'assignment').filter(
+        pk=ids['channel']
+    )
+    if ids['category'] is not None:
+        channels = channels.filter(category_id=ids['category'])
+    if ids['workspace'] is not None:
+        channels = channels.filter(category__workspace_id=ids['workspace'])
+    if ids['submission'] is not None:
+        submission = Submission.objects.filter(pk=ids['submission'], assignment_id=OuterRef('pk'))
+        channels = channels.annotate(
+            submission_exists=Exists(submission),
+            submission_team_id=Subquery(submission.values('sender_team_id')[:1]),
+        )
+    channel = channels.first()
+    if channel is None:
+        raise NotFound("Channel not found")
+    if ids['submission'] is not None and not channel.submission_exists:
+        raise NotFound("Submission not found")
+    return NestedRoute(
+        ids,
+        workspace=channel.category.workspace,
+        category=channel.category,
+        channel=channel,
+        submission_team_id=getattr(channel, 'submission_team_id', None),
+    )
+
+
+def load_route(kwargs):
+    """The NestedRoute of URL kwargs, one query. Raises NotFound when an
+    object is missing or not inside the one above it."""
+    ids = hierarchy_ids(kwargs)
+    try:
+        if ids['channel'] is not None:
+            return _channel_route(ids)
+        if ids['category'] is not None:
+            categories = Category.objects.select_related('workspace').filter(pk=ids['category'])
+            if ids['workspace'] is not None:
+                categories = categories.filter(workspace_id=ids['workspace'])
+            category = categories.first()
+            if category is None:
+                raise NotFound("Category not found")
+            return NestedRoute(ids, workspace=category.workspace, category=category)
+        if ids['workspace'] is not None:
+            workspace = Workspace.objects.filter(pk=ids['workspace']).first()
+            if workspace is None:
+                raise NotFound("Workspace not found")
+            return NestedRoute(ids, workspace=workspace)
+    except (ValidationError, ValueError):
+        # a router's `pk` that isn't an id of the model
+        raise NotFound()
+    return NestedRoute(ids)
+
+
+def request_route(request, view):
+    """The NestedRoute of `request`, loaded on first use."""
+    route = getattr(request, '_route', None)
+    if route is None:
+        route = request._route = load_route(view.kwargs)
+    return route
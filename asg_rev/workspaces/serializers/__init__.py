@@ -22,5 +22,9 @@ from workspaces.serializers.iteration import (
     IterationRevieweeSerializer,
     IterationReviewerSerializer
 )
+from workspaces.serializers.sidebar import (
+    SidebarCategorySerializer,
+    SidebarChannelSerializer,
+)
 
 
@@ -7,8 +7,8 @@ from workspaces.models.category import (
 )
 from workspaces.models import (
     Channel,
-    ChannelRole
 )
+from workspaces.acl import workspace_acls
 
 from workspaces.serializers.channel import (
     ChannelSerializer,
@@ -24,15 +24,10 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'workspace', 'channels']
 
     def get_channels(self, obj):
-        user = self.context['request'].user       
+        user = self.context['request'].user
+        acl = workspace_acls.get(obj.workspace_id)
 
-        user_channel_roles = ChannelRole.objects.filter(user=user)
-        channel_ids = user_channel_roles.values_list('channel_id', flat=True)
-
-        channels = Channel.objects.filter(
-            category=obj,
-            id__in=channel_ids
-        )
+        channels = Channel.objects.filter(id__in=acl.visible_channels(user.id, obj.id))
         return ChannelSerializer(channels, many=True).data
 
 class CategoryRoleSerializer(serializers.ModelSerializer):
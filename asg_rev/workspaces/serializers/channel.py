@@ -3,8 +3,6 @@ from rest_framework import exceptions
 from users.models.user import User
 from users.serializers import UserSerializer
 from workspaces.models import (
-    Workspace,
-    Category,
     Channel,
     ChannelRole,
     Assignment,
@@ -14,6 +12,7 @@ from workspaces.serializers.assignment import (
     AssignmentSerializer
 )
 from workspaces.serializers.team import TeamSerializer
+from workspaces.routes import request_route
 
 class ChannelSerializer(serializers.ModelSerializer):
     assignment_data = AssignmentSerializer(write_only=True, required=True)
@@ -32,17 +31,12 @@ class ChannelSerializer(serializers.ModelSerializer):
         ]
             
     def validate(self, data):
-        category_id = self.context['view'].kwargs.get('category_pk')
-        workspace_id = self.context['view'].kwargs.get('workspace_pk')
-        try:
-            workspace = Workspace.objects.get(id=workspace_id)
-        except:
-            raise serializers.ValidationError("workspace does not exist")
-        try:
-            category = Category.objects.get(id=category_id)
-        except Category.DoesNotExist:
+        # the permissions already answered 404 unless the category is in
+        # the workspace
+        route = request_route(self.context['request'], self.context['view'])
+        if route.category is None:
             raise serializers.ValidationError("category does not exist")
-        data['category'] = category
+        data['category'] = route.category
         return data
 
     def create(self, validated_data):
@@ -0,0 +1,62 @@
+from rest_framework import serializers
+
+from workspaces.models import (
+    Assignment,
+    Category,
+    Channel,
+)
+
+
+class SidebarChannelSerializer(serializers.ModelSerializer):
+    """A channel of the caller's sidebar, from the annotations of
+    `workspaces.views.sidebar.sidebar_categories`. The context carries the
+    caller's `roles` and assignment `statuses` by channel id."""
+    role = serializers.SerializerMethodField()
+    team = serializers.SerializerMethodField()
+    unread_count = serializers.IntegerField(read_only=True)
+    last_read_message_id = serializers.IntegerField(read_only=True)
+    assignment = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Channel
+        fields = [
+            'id',
+            'name',
+            'role',
+            'team',
+            'unread_count',
+            'last_read_message_id',
+            'assignment',
+        ]
+
+    def _membership(self, obj):
+        return self.context['roles'].channel_membership(obj.id) or {}
+
+    def get_role(self, obj):
+        return self._membership(obj).get('role')
+
+    def get_team(self, obj):
+        return self._membership(obj).get('team_id')
+
+    def get_assignment(self, obj):
+        try:
+            assignment = obj.assignment
+        except Assignment.DoesNotExist:
+            return None
+        status = self.context['statuses'].get(obj.id, {})
+        return {
+            'total_points': assignment.total_points,
+            'for_teams': assignment.for_teams,
+            'task_count': obj.task_count,
+            'next_due_date': obj.next_due_date and obj.next_due_date.isoformat(),
+            'status': status.get('status'),
+            'earned_points': status.get('earned_points'),
+        }
+
+
+class SidebarCategorySerializer(serializers.ModelSerializer):
+    channels = SidebarChannelSerializer(source='sidebar_channels', many=True, read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'channels']
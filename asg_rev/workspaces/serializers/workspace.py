@@ -10,7 +10,7 @@ class WorkspaceSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     class Meta:
         model = Workspace
-        fields = ['id', 'name', 'icon', 'owner'] 
+        fields = ['id', 'name', 'icon', 'owner', 'message_retention_days']
         read_only_fields = ['owner']
 
     def create(self, validated_data):
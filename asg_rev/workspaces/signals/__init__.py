@@ -6,4 +6,28 @@ from workspaces.signals.category import (
 )
 from workspaces.signals.channel import (
     create_rolechannel,
-)
\ No newline at end of file
+)
+from workspaces.signals.roles import (
+    invalidate_roles,
+)
+from workspaces.signals.acl import (
+    workspace_role_changed,
+    category_role_changed,
+    channel_role_changed,
+    category_saved,
+    channel_saved,
+    category_deleted,
+    channel_deleted,
+    workspace_deleted,
+)
+from workspaces.signals.versions import (
+    workspace_changed,
+    workspace_member_changed,
+    category_changed,
+    category_member_changed,
+    channel_changed,
+    assignment_changed,
+    task_changed,
+    channel_member_changed,
+    member_profile_changed,
+)
@@ -0,0 +1,108 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from workspaces.acl import RELOAD, workspace_acls
+from workspaces.models import (
+    Category,
+    CategoryRole,
+    Channel,
+    ChannelRole,
+    Workspace,
+    WorkspaceRole,
+)
+
+# deleting these logs a reload of the workspace, the roles they take
+# with them needn't be logged one by one
+CONTAINERS = (Workspace, Category, Channel)
+
+
+def workspace_of_category(category_id):
+    acl = workspace_acls.find(category_id=category_id)
+    if acl is not None:
+        return acl.workspace_id
+    return Category.objects.filter(pk=category_id).values_list('workspace_id', flat=True).first()
+
+
+def workspace_of_channel(channel_id):
+    acl = workspace_acls.find(channel_id=channel_id)
+    if acl is not None:
+        return acl.workspace_id
+    return Channel.objects.filter(pk=channel_id).values_list(
+        'category__workspace_id', flat=True
+    ).first()
+
+
+def _cascaded(kwargs):
+    return isinstance(kwargs.get('origin'), CONTAINERS)
+
+
+def _changed(workspace_id, change=RELOAD):
+    # the workspace is looked up now, a cascade may delete it before commit
+    if workspace_id is not None:
+        workspace_acls.changed_on_commit(workspace_id, change)
+
+
+@receiver(post_save, sender=WorkspaceRole)
+@receiver(post_delete, sender=WorkspaceRole)
+def workspace_role_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    present = kwargs['signal'] is post_save
+    _changed(instance.workspace_id, ('workspace_role', instance.user_id, present))
+
+
+@receiver(post_save, sender=CategoryRole)
+@receiver(post_delete, sender=CategoryRole)
+def category_role_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    present = kwargs['signal'] is post_save
+    _changed(
+        workspace_of_category(instance.category_id),
+        ('category_role', instance.user_id, instance.category_id, present)
+    )
+
+
+@receiver(post_save, sender=ChannelRole)
+@receiver(post_delete, sender=ChannelRole)
+def channel_role_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    role = instance.role if kwargs['signal'] is post_save else None
+    _changed(
+        workspace_of_channel(instance.channel_id),
+        ('channel_role', instance.user_id, instance.channel_id, role, instance.team_id)
+    )
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if created:
+        _changed(instance.workspace_id, ('category', instance.id))
+
+
+@receiver(post_save, sender=Channel)
+def channel_saved(sender, instance, **kwargs):
+    _changed(
+        workspace_of_category(instance.category_id),
+        ('channel', instance.id, instance.category_id)
+    )
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), Workspace):
+        return
+    _changed(instance.workspace_id)
+
+
+@receiver(post_delete, sender=Channel)
+def channel_deleted(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), (Workspace, Category)):
+        return
+    _changed(workspace_of_category(instance.category_id))
+
+
+@receiver(post_delete, sender=Workspace)
+def workspace_deleted(sender, instance, **kwargs):
+    _changed(instance.id)
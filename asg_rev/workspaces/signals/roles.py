@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from workspaces.models import (
+    CategoryRole,
+    ChannelRole,
+    WorkspaceRole,
+)
+from workspaces.roles import invalidate_role_index, roles_committed
+
+# queryset deletes, the member views' and the cascades from deleting a
+# workspace, category, channel, team or user, send post_delete per role
+@receiver(post_save, sender=WorkspaceRole)
+@receiver(post_delete, sender=WorkspaceRole)
+@receiver(post_save, sender=CategoryRole)
+@receiver(post_delete, sender=CategoryRole)
+@receiver(post_save, sender=ChannelRole)
+@receiver(post_delete, sender=ChannelRole)
+def invalidate_roles(sender, instance, **kwargs):
+    # now and again after commit so a read racing the transaction can't
+    # cache the old roles under the new version
+    invalidate_role_index(instance.user_id)
+    transaction.on_commit(lambda: roles_committed([instance.user_id]))
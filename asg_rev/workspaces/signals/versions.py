@@ -0,0 +1,122 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.models import User
+from workspaces.models import (
+    Assignment,
+    Category,
+    CategoryRole,
+    Channel,
+    ChannelRole,
+    Task,
+    Team,
+    Workspace,
+    WorkspaceRole,
+)
+from workspaces.roles import get_role_index
+from workspaces.signals.acl import workspace_of_category, workspace_of_channel
+from workspaces.versions import (
+    bump_versions,
+    channel_version_key,
+    workspace_version_key,
+)
+
+# Workspace endpoints (categories, channel lists with their assignments,
+# workspace and category members) read the workspace counter, channel
+# endpoints (the channel, its assignment and members) the channel's.
+
+# deleting these bumps their own counter, the rows they take with them
+# needn't bump it again
+CONTAINERS = (Workspace, Category, Channel)
+
+
+def _cascaded(kwargs):
+    return isinstance(kwargs.get('origin'), CONTAINERS)
+
+
+def _bump(workspace_id=None, channel_id=None):
+    keys = []
+    if workspace_id is not None:
+        keys.append(workspace_version_key(workspace_id))
+    if channel_id is not None:
+        keys.append(channel_version_key(channel_id))
+    if keys:
+        bump_versions(keys)
+
+
+@receiver(post_save, sender=Workspace)
+@receiver(post_delete, sender=Workspace)
+def workspace_changed(sender, instance, **kwargs):
+    _bump(workspace_id=instance.id)
+
+
+@receiver(post_save, sender=WorkspaceRole)
+@receiver(post_delete, sender=WorkspaceRole)
+def workspace_member_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    _bump(workspace_id=instance.workspace_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), Workspace):
+        return
+    _bump(workspace_id=instance.workspace_id)
+
+
+@receiver(post_save, sender=CategoryRole)
+@receiver(post_delete, sender=CategoryRole)
+def category_member_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    _bump(workspace_id=workspace_of_category(instance.category_id))
+
+
+@receiver(post_save, sender=Channel)
+@receiver(post_delete, sender=Channel)
+def channel_changed(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), (Workspace, Category)):
+        return
+    # channel lists show the channel
+    _bump(workspace_of_category(instance.category_id), instance.id)
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def assignment_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    # channel lists show the assignment of each channel
+    _bump(workspace_of_channel(instance.id_id), instance.id_id)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs) or isinstance(kwargs.get('origin'), Assignment):
+        return
+    _bump(workspace_of_channel(instance.assignment_id), instance.assignment_id)
+
+
+@receiver(post_save, sender=ChannelRole)
+@receiver(post_delete, sender=ChannelRole)
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+def channel_member_changed(sender, instance, **kwargs):
+    if _cascaded(kwargs):
+        return
+    _bump(channel_id=instance.channel_id)
+
+
+@receiver(post_save, sender=User)
+def member_profile_changed(sender, instance, created, update_fields=None, **kwargs):
+    # member lists show the user; a login only touches last_login
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    roles = get_role_index(instance.pk)
+    keys = [workspace_version_key(workspace_id) for workspace_id in roles.workspace_ids()]
+    keys += [channel_version_key(channel_id) for channel_id in roles.channel_ids()]
+    if keys:
+        bump_versions(keys)
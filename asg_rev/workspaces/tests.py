@@ -1,3 +1,733 @@
-from django.test import TestCase
+import datetime
+import io
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from crum import impersonate
+from django.core import mail
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from chats.models import ChannelCounter, GroupMessage
+from users.models import User
+from workspaces.models import (
+    Assignment,
+    AssignmentStatus,
+    Category,
+    CategoryRole,
+    Channel,
+    ChannelRole,
+    Submission,
+    Task,
+    Team,
+    Workspace,
+    WorkspaceRole,
+)
+from workspaces.acl import ACLRegistry, workspace_acls
+from workspaces.roles import get_role_index
+
+
+ROLE_INDEX_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'roles': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'workspaces-tests-roles',
+        },
+    },
+    'ROLE_INDEX': {'CACHE': 'roles', 'TIMEOUT': 60},
+}
+
+
+@override_settings(**ROLE_INDEX_SETTINGS)
+class AuthorizationQueryCountTests(TestCase):
+    """Every endpoint authorizes with at most one query, however its
+    permission classes are composed, and with none for the user's own
+    roles once the role index is cached."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x')
+        cls.reviewee = User.objects.create_user(username='reviewee', email='reviewee@example.com', password='x')
+        cls.outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='x')
+
+        cls.workspace = Workspace.objects.create(name='workspace', owner=cls.admin)
+        WorkspaceRole.objects.create(user=cls.admin, workspace=cls.workspace, role='workspace_admin')
+        WorkspaceRole.objects.create(user=cls.reviewee, workspace=cls.workspace, role='workspace_member')
+        cls.category = Category.objects.create(name='category', workspace=cls.workspace)
+        CategoryRole.objects.create(user=cls.admin, category=cls.category, role='category_admin')
+        CategoryRole.objects.create(user=cls.reviewee, category=cls.category, role='category_member')
+        with impersonate(cls.admin):
+            # makes the admin the channel's reviewer
+            cls.channel = Channel.objects.create(name='channel', category=cls.category)
+        cls.team = Team.objects.create(team_name='team', channel=cls.channel)
+        ChannelRole.objects.create(user=cls.reviewee, channel=cls.channel, role='reviewee', team=cls.team)
+        Assignment.objects.create(id=cls.channel, description='assignment', total_points=10)
+        cls.submission = Submission.objects.create(
+            assignment_id=cls.channel.id,
+            sender=cls.reviewee,
+            sender_team=cls.team,
+            content='submission'
+        )
+        cls.message = GroupMessage.objects.create(
+            id=1,
+            channel=cls.channel,
+            sender=cls.reviewee,
+            sender_name=cls.reviewee.username,
+            sender_email=cls.reviewee.email,
+            content='message'
+        )
+
+    def setUp(self):
+        caches['roles'].clear()
+        workspace_acls.clear()
+
+    def urls(self):
+        workspace = f'/api/workspaces/{self.workspace.id}/'
+        category = f'{workspace}categories/{self.category.id}/'
+        channel = f'{category}channels/{self.channel.id}/'
+        submission = f'{channel}submissions/{self.submission.id}/'
+        return [
+            workspace,
+            f'{workspace}members/',
+            f'{workspace}categories/',
+            category,
+            f'{category}members/',
+            f'{category}channels/',
+            channel,
+            f'{channel}members/',
+            f'{channel}assignment/',
+            f'{channel}submissions/reviewee/',
+            f'{channel}submissions/reviewer/',
+            f'{submission}reviewee-iterations/',
+            f'{submission}reviewer-iterations/',
+            f'{channel}chat/',
+            f'{channel}chat/{self.message.id}/replies/',
+        ]
+
+    def authorization_queries(self, user, url):
+        """(status code, queries the permission checks of GET `url` ran)."""
+        queries = []
+        check_permissions = APIView.check_permissions
+        check_object_permissions = APIView.check_object_permissions
+
+        def counted(check):
+            def wrapper(view, request, *args):
+                with CaptureQueriesContext(connection) as context:
+                    try:
+                        return check(view, request, *args)
+                    finally:
+                        queries.extend(context.captured_queries)
+            return wrapper
+
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch.object(APIView, 'check_permissions', counted(check_permissions)), \
+                mock.patch.object(APIView, 'check_object_permissions', counted(check_object_permissions)):
+            response = client.get(url)
+        return response.status_code, len(queries)
+
+    def test_one_authorization_query_per_request(self):
+        for user in (self.admin, self.reviewee, self.outsider):
+            for url in self.urls():
+                with self.subTest(user=user.username, url=url):
+                    caches['roles'].clear()
+                    # loading the role index is the one extra
+                    status_code, queries = self.authorization_queries(user, url)
+                    self.assertNotEqual(status_code, 500)
+                    self.assertLessEqual(queries, 2)
+
+                    status_code, queries = self.authorization_queries(user, url)
+                    self.assertNotEqual(status_code, 500)
+                    self.assertLessEqual(queries, 1)
+
+    def test_cached_roles_leave_only_the_route_query(self):
+        workspace = f'/api/workspaces/{self.workspace.id}/'
+        channel = f'{workspace}categories/{self.category.id}/channels/{self.channel.id}/'
+        self.authorization_queries(self.reviewee, workspace)
+        for url in (workspace, f'{workspace}categories/', channel, f'{channel}chat/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.authorization_queries(self.reviewee, url), (200, 1))
+
+    def test_role_changes_invalidate_the_index(self):
+        workspace = f'/api/workspaces/{self.workspace.id}/'
+        category = f'{workspace}categories/{self.category.id}/'
+        chat = f'{category}channels/{self.channel.id}/chat/'
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(self.authorization_queries(self.reviewee, chat)[0], 200)
+
+        # the channel role goes with the category membership, in a queryset delete
+        response = client.delete(f'{category}members/', {'user_email': self.reviewee.email})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.authorization_queries(self.reviewee, chat)[0], 403)
+        self.assertEqual(self.authorization_queries(self.reviewee, f'{workspace}categories/')[0], 200)
+
+        response = client.put(
+            f'{workspace}members/',
+            {'user_email': self.reviewee.email, 'role': 'workspace_admin'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            get_role_index(self.reviewee.pk).workspace_role(self.workspace.id),
+            'workspace_admin'
+        )
+
+        response = client.delete(f'{workspace}members/', {'user_email': self.reviewee.email})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.authorization_queries(self.reviewee, workspace)[0], 403)
+
+    def test_roles(self):
+        channel = f'/api/workspaces/{self.workspace.id}/categories/{self.category.id}/channels/{self.channel.id}/'
+        self.assertEqual(self.authorization_queries(self.reviewee, f'{channel}submissions/reviewee/')[0], 200)
+        self.assertEqual(self.authorization_queries(self.reviewee, f'{channel}submissions/reviewer/')[0], 403)
+        self.assertEqual(self.authorization_queries(self.admin, f'{channel}submissions/reviewer/')[0], 200)
+        self.assertEqual(self.authorization_queries(self.outsider, f'{channel}chat/')[0], 403)
+        self.assertEqual(
+            self.authorization_queries(
+                self.reviewee,
+                f'{channel}submissions/{self.submission.id}/reviewee-iterations/'
+            )[0],
+            200
+        )
+        missing = f'/api/workspaces/{self.workspace.id}/categories/{self.category.id}/channels/{self.team.id}/'
+        self.assertEqual(self.authorization_queries(self.admin, f'{missing}chat/')[0], 404)
+
+    def test_urls_must_nest(self):
+        other_workspace = Workspace.objects.create(name='other', owner=self.admin)
+        WorkspaceRole.objects.create(user=self.admin, workspace=other_workspace, role='workspace_admin')
+        other_category = Category.objects.create(name='other', workspace=self.workspace)
+        CategoryRole.objects.create(user=self.admin, category=other_category, role='category_admin')
+        with impersonate(self.admin):
+            other_channel = Channel.objects.create(name='other', category=other_category)
+        Assignment.objects.create(id=other_channel, description='other', total_points=10)
+        other_submission = Submission.objects.create(
+            assignment_id=other_channel.id, sender=self.reviewee, sender_team=self.team, content='other'
+        )
+
+        workspace = f'/api/workspaces/{self.workspace.id}/'
+        for url in (
+            f'/api/workspaces/{other_workspace.id}/categories/{self.category.id}/',
+            f'/api/workspaces/{other_workspace.id}/categories/{self.category.id}/channels/{self.channel.id}/',
+            f'{workspace}categories/{other_category.id}/channels/{self.channel.id}/chat/',
+            f'{workspace}categories/{other_category.id}/channels/{self.channel.id}/assignment/',
+            f'{workspace}categories/{self.category.id}/channels/{self.channel.id}'
+            f'/submissions/{other_submission.id}/reviewee-iterations/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.authorization_queries(self.admin, url)[0], 404)
+        channel = f'{workspace}categories/{other_category.id}/channels/{other_channel.id}/'
+        self.assertEqual(self.authorization_queries(self.admin, f'{channel}assignment/')[0], 200)
+
+
+@override_settings(**ROLE_INDEX_SETTINGS)
+class WorkspaceACLTests(TestCase):
+    """Role changes reach the ACL of this process in place and the ones of
+    other processes through the change log."""
+
+    def setUp(self):
+        caches['roles'].clear()
+        workspace_acls.clear()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.workspace = Workspace.objects.create(name='workspace', owner=self.owner)
+            self.category = Category.objects.create(name='category', workspace=self.workspace)
+            with impersonate(self.owner):
+                self.channel = Channel.objects.create(name='channel', category=self.category)
+
+    def test_changes(self):
+        acl = workspace_acls.get(self.workspace.id)
+        other_process = ACLRegistry()
+        other_acl = other_process.get(self.workspace.id)
+        self.assertEqual(acl.visible_channels(self.owner.id, self.category.id), [self.channel.id])
+        self.assertEqual(acl.reviewers_of(self.channel.id), [self.owner.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            team = Team.objects.create(team_name='team', channel=self.channel)
+            role = ChannelRole.objects.create(
+                user=self.member, channel=self.channel, role='reviewee', team=team
+            )
+        for registry, loaded in ((workspace_acls, acl), (other_process, other_acl)):
+            self.assertIs(registry.get(self.workspace.id), loaded)
+            self.assertEqual(loaded.visible_channels(self.member.id, self.category.id), [self.channel.id])
+            self.assertEqual(loaded.team_roster(team.id), [self.member.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            role.role = 'reviewer'
+            role.team = None
+            role.save()
+        self.assertCountEqual(acl.reviewers_of(self.channel.id), [self.owner.id, self.member.id])
+        self.assertEqual(acl.team_roster(team.id), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ChannelRole.objects.filter(user=self.member).delete()
+        self.assertEqual(other_process.get(self.workspace.id).channel_members_of(self.channel.id), [self.owner.id])
+
+        # the new channel's reviewer role is logged before the channel, so
+        # the ACLs load again
+        with self.captureOnCommitCallbacks(execute=True):
+            with impersonate(self.member):
+                channel = Channel.objects.create(name='other', category=self.category)
+        for registry in (workspace_acls, other_process):
+            self.assertEqual(
+                registry.get(self.workspace.id).visible_channels(self.member.id, str(self.category.id)),
+                [channel.id]
+            )
+
+    def test_registry(self):
+        registry = ACLRegistry(max_size=1)
+        self.assertIsNone(registry.find(channel_id=self.channel.id))
+        acl = registry.get(self.workspace.id)
+        self.assertIs(registry.find(category_id=self.category.id), acl)
+        self.assertIs(registry.find(channel_id=self.channel.id), acl)
+
+        # the channels a logged change adds are found too
+        with impersonate(self.owner):
+            channel_id = Channel.objects.create(name='other', category=self.category).id
+        registry.changed(self.workspace.id, ('channel', channel_id, self.category.id))
+        self.assertIs(registry.find(channel_id=channel_id), acl)
+
+        # the least recently used ACL makes room, with its channels
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Workspace.objects.create(name='other', owner=self.owner)
+        registry.get(other.id)
+        self.assertEqual(len(registry), 1)
+        self.assertIsNone(registry.find(channel_id=self.channel.id))
+        self.assertIsNone(registry.find(category_id=self.category.id))
+
+
+@override_settings(**ROLE_INDEX_SETTINGS)
+class SidebarQueryCountTests(TestCase):
+    """The sidebar takes the same number of queries however many
+    categories, channels and tasks the workspace has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.reviewee = User.objects.create_user(username='reviewee', email='reviewee@example.com', password='x')
+        cls.workspace = Workspace.objects.create(name='workspace', owner=cls.owner)
+        WorkspaceRole.objects.create(user=cls.owner, workspace=cls.workspace, role='workspace_admin')
+        WorkspaceRole.objects.create(user=cls.reviewee, workspace=cls.workspace, role='workspace_member')
+
+    def setUp(self):
+        caches['roles'].clear()
+        self.count = 0
+
+    def grow(self, categories, channels):
+        for _ in range(categories):
+            self.count += 1
+            category = Category.objects.create(name=f'category {self.count}', workspace=self.workspace)
+            CategoryRole.objects.create(user=self.reviewee, category=category, role='category_member')
+            for i in range(channels):
+                with impersonate(self.owner):
+                    channel = Channel.objects.create(name=f'channel {i}', category=category)
+                team = Team.objects.create(team_name='team', channel=channel)
+                ChannelRole.objects.create(
+                    user=self.reviewee, channel=channel, role='reviewee', team=team, last_read_seq=2
+                )
+                ChannelCounter.objects.create(channel=channel, last_message_seq=2 + i)
+                GroupMessage.objects.bulk_create([
+                    GroupMessage(
+                        channel=channel, sender=self.owner, sender_name='owner',
+                        sender_email='owner@example.com', content='hello', seq=seq
+                    ) for seq in range(1, 3 + i)
+                ])
+                assignment = Assignment.objects.create(id=channel, description='a', total_points=10)
+                Task.objects.create(assignment=assignment, task='t', due_date=datetime.date(2999, 1, 1))
+                Task.objects.create(assignment=assignment, task='t', due_date=datetime.date(2000, 1, 1))
+                AssignmentStatus.objects.create(
+                    assignment=assignment, team=team, status='ongoing', earned_points=i
+                )
+
+    def sidebar(self):
+        client = APIClient()
+        client.force_authenticate(self.reviewee)
+        url = f'/api/workspaces/{self.workspace.id}/sidebar/'
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(context.captured_queries)
+
+    def test_flat_query_count(self):
+        self.grow(categories=1, channels=1)
+        sidebar, queries = self.sidebar()
+        channel = sidebar['categories'][0]['channels'][0]
+        self.assertEqual(channel['role'], 'reviewee')
+        self.assertEqual(channel['assignment']['task_count'], 2)
+        self.assertEqual(channel['assignment']['next_due_date'], '2999-01-01')
+        self.assertEqual(channel['assignment']['status'], 'ongoing')
+
+        self.grow(categories=4, channels=5)
+        sidebar, more_queries = self.sidebar()
+        self.assertEqual(len(sidebar['categories']), 5)
+        self.assertEqual(sum(len(category['channels']) for category in sidebar['categories']), 21)
+        self.assertEqual(sidebar['categories'][-1]['channels'][4]['unread_count'], 4)
+        self.assertEqual(more_queries, queries)
+        self.assertLessEqual(queries, 4)
+
+
+@override_settings(**ROLE_INDEX_SETTINGS)
+class ConditionalGetTests(TestCase):
+    """Read endpoints answer a current If-None-Match with 304 before any
+    queryset or serializer runs, and writes retire their ETags."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.reviewee = User.objects.create_user(username='reviewee', email='reviewee@example.com', password='x')
+        cls.workspace = Workspace.objects.create(name='workspace', owner=cls.owner)
+        WorkspaceRole.objects.create(user=cls.owner, workspace=cls.workspace, role='workspace_admin')
+        WorkspaceRole.objects.create(user=cls.reviewee, workspace=cls.workspace, role='workspace_member')
+        cls.category = Category.objects.create(name='category', workspace=cls.workspace)
+        CategoryRole.objects.create(user=cls.reviewee, category=cls.category, role='category_member')
+        cls.channels = []
+        for name in ('first', 'second'):
+            with impersonate(cls.owner):
+                channel = Channel.objects.create(name=name, category=cls.category)
+            team = Team.objects.create(team_name='team', channel=channel)
+            ChannelRole.objects.create(user=cls.reviewee, channel=channel, role='reviewee', team=team)
+            Assignment.objects.create(id=channel, description=name, total_points=10)
+            cls.channels.append(channel)
+
+    def setUp(self):
+        caches['roles'].clear()
+        workspace_acls.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reviewee)
+
+    def url(self, channel=None, suffix=''):
+        url = f'/api/workspaces/{self.workspace.id}/categories/{self.category.id}/channels/'
+        return url if channel is None else f'{url}{channel.id}/{suffix}'
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag, if_none_match=None, queries=1):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=if_none_match or etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # the route, nothing of the response
+        self.assertEqual(len(context.captured_queries), queries)
+
+    def test_not_modified(self):
+        for url in (
+            '/api/workspaces/',
+            f'/api/workspaces/{self.workspace.id}/members/',
+            self.url(),
+            self.url(self.channels[0]),
+            self.url(self.channels[0], 'members/'),
+            self.url(self.channels[0], 'assignment/'),
+        ):
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                self.assertTrue(etag.startswith('"'))
+                # no route to load for the user's workspaces
+                queries = 0 if url == '/api/workspaces/' else 1
+                self.assertNotModified(url, etag, queries=queries)
+                self.assertNotModified(url, etag, f'"other", W/{etag}', queries=queries)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_writes_retire_etags(self):
+        first, second = self.channels
+        channels = self.etag(self.url())
+        assignment = self.etag(self.url(first, 'assignment/'))
+
+        # another channel's task: the list shows it, this assignment doesn't
+        Task.objects.create(assignment_id=second.id, task='task', due_date=datetime.date(2999, 1, 1))
+        self.assertEqual(self.client.get(self.url(), HTTP_IF_NONE_MATCH=channels).status_code, 200)
+        self.assertNotModified(self.url(first, 'assignment/'), assignment)
+
+        Task.objects.create(assignment_id=first.id, task='task', due_date=datetime.date(2999, 1, 1))
+        response = self.client.get(self.url(first, 'assignment/'), HTTP_IF_NONE_MATCH=assignment)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['tasks']), 1)
+
+    def test_permissions_come_first(self):
+        url = self.url(self.channels[0])
+        etag = self.etag(url)
+        ChannelRole.objects.filter(user=self.reviewee, channel=self.channels[0]).delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+
+@override_settings(**ROLE_INDEX_SETTINGS)
+class BulkMembersTests(TestCase):
+    """Bulk member endpoints resolve users, teams and roles with a fixed
+    number of queries and report every row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(60)
+        ])
+        cls.workspace = Workspace.objects.create(name='workspace', owner=cls.owner)
+        WorkspaceRole.objects.create(user=cls.owner, workspace=cls.workspace, role='workspace_admin')
+        cls.category = Category.objects.create(name='category', workspace=cls.workspace)
+        with impersonate(cls.owner):
+            cls.channel = Channel.objects.create(name='channel', category=cls.category)
+
+    def setUp(self):
+        caches['roles'].clear()
+        workspace_acls.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.base = f'/api/workspaces/{self.workspace.id}/'
+        self.channel_url = f'{self.base}categories/{self.category.id}/channels/{self.channel.id}/'
+
+    def post(self, url, members, **data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {'members': members, **data}, format='json')
+        return response, len(context.captured_queries)
+
+    def test_workspace_invitations(self):
+        url = f'{self.base}members/bulk/'
+        WorkspaceRole.objects.create(user=self.users[0], workspace=self.workspace)
+        with self.captureOnCommitCallbacks(execute=True):
+            response, _ = self.post(url, [
+                {'user_email': self.users[0].email, 'role': 'workspace_admin'},
+                {'user_email': self.users[1].email},
+                {'user_email': self.users[2].email, 'role': 'workspace_admin'},
+            ])
+        body = response.json()
+        self.assertEqual([body[status] for status in ('invited', 'updated', 'created')], [2, 1, 0])
+        # members' roles change, new users have to accept first
+        self.assertCountEqual(
+            WorkspaceRole.objects.filter(workspace=self.workspace).values_list('user_id', 'role'),
+            [(self.owner.id, 'workspace_admin'), (self.users[0].id, 'workspace_admin')]
+        )
+        self.assertCountEqual([email.to for email in mail.outbox], [[self.users[1].email], [self.users[2].email]])
+        invitation = next(email for email in mail.outbox if email.to == [self.users[2].email])
+        self.assertIn('/workspace_admin/', invitation.alternatives[0][0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(url, [{'user_email': self.users[3].email}], dry_run=True)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_workspace_members(self):
+        url = f'{self.base}members/bulk/'
+        get_role_index(self.owner.id)
+        response, few = self.post(url, [{'user_email': user.email} for user in self.users[:5]], direct=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 5)
+        self.assertEqual(len(mail.outbox), 0)
+
+        response, many = self.post(url, [
+            {'user_email': user.email} for user in self.users[5:55]
+        ] + [
+            {'user_email': self.users[0].email, 'role': 'workspace_admin'},
+            {'user_email': self.users[1].email},
+            {'user_email': 'nobody@example.com'},
+            {'user_email': self.users[5].email},
+            {'user_email': self.users[55].email, 'role': 'owner'},
+            {'role': 'workspace_member'},
+        ], direct=True)
+        self.assertEqual(many, few)
+        body = response.json()
+        self.assertEqual(
+            [body[status] for status in ('created', 'updated', 'unchanged', 'error')],
+            [50, 1, 1, 4]
+        )
+        errors = [result['detail'] for result in body['results'] if result['status'] == 'error']
+        self.assertEqual(errors, [
+            "User does not exist.",
+            "User is listed in row 1 already.",
+            "Role must be one of: workspace_admin, workspace_member",
+            "User email is required.",
+        ])
+        self.assertEqual(
+            WorkspaceRole.objects.get(workspace=self.workspace, user=self.users[0]).role,
+            'workspace_admin'
+        )
+        self.assertEqual(get_role_index(self.users[0].id).workspace_role(self.workspace.id), 'workspace_admin')
+
+    def test_channel_members(self):
+        WorkspaceRole.objects.bulk_create([
+            WorkspaceRole(user=user, workspace=self.workspace) for user in self.users[:50]
+        ])
+        response, queries = self.post(f'{self.channel_url}members/bulk/', [
+            {'user_email': user.email, 'team': f'team {i % 5}'} for i, user in enumerate(self.users[:48])
+        ] + [
+            {'user_email': self.users[48].email, 'role': 'reviewer', 'team': 'team 0'},
+            {'user_email': self.users[49].email, 'team': 'Reviewers'},
+            {'user_email': self.users[50].email},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['created'], 49)
+        self.assertEqual(
+            [result['detail'] for result in body['results'] if result['status'] == 'error'],
+            ["Reviewers cannot have reviewees.", "User is not a workspace member."]
+        )
+        self.assertEqual(body['results'][48]['team'], 'Reviewers')
+        # users, teams, new teams, roles, in a savepoint
+        self.assertLessEqual(queries, 8)
+        self.assertEqual(Team.objects.filter(channel=self.channel).count(), 6)
+        self.assertEqual(ChannelRole.objects.filter(channel=self.channel, team__team_name='team 0').count(), 10)
+
+        # moving teams updates, the new member can read the channel at once
+        response, _ = self.post(f'{self.channel_url}members/bulk/', [
+            {'user_email': self.users[0].email, 'team': 'team 1'},
+            {'user_email': self.users[1].email, 'team': 'team 1'},
+        ])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['updated', 'unchanged'])
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        self.assertEqual(client.get(f'{self.channel_url}members/').status_code, 200)
+        self.assertIn(self.users[0].id, workspace_acls.get(self.workspace.id).channel_members_of(self.channel.id))
+
+    def test_admins_only(self):
+        WorkspaceRole.objects.create(user=self.users[0], workspace=self.workspace)
+        self.client.force_authenticate(self.users[0])
+        response, _ = self.post(f'{self.base}members/bulk/', [{'user_email': self.users[1].email}])
+        self.assertEqual(response.status_code, 403)
+        response, _ = self.post(f'{self.base}members/bulk/', [])
+        self.assertEqual(response.status_code, 403)
+
+
+def xlsx(rows, columns='BCD'):
+    """An XLSX workbook of `rows`, the first cell of each row a shared
+    string and the others inline, in `columns`."""
+    main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    relationships = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    strings = [row[0] for row in rows]
+    sheet = ''.join(
+        f'<row r="{number}"><c r="A{number}" t="s"><v>{number - 1}</v></c>'
+        + ''.join(
+            f'<c r="{columns[column]}{number}" t="inlineStr"><is><t>{value}</t></is></c>'
+            for column, value in enumerate(row[1:]) if value
+        )
+        + '</row>'
+        for number, row in enumerate(rows, 1)
+    )
+    file = io.BytesIO()
+    with zipfile.ZipFile(file, 'w') as archive:
+        archive.writestr('xl/workbook.xml', (
+            f'<workbook xmlns="{main}" xmlns:r="{relationships}">'
+            '<sheets><sheet name="Roster" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="worksheets/sheet1.xml" Type="worksheet"/></Relationships>'
+        ))
+        archive.writestr('xl/sharedStrings.xml', (
+            f'<sst xmlns="{main}">' + ''.join(f'<si><t>{string}</t></si>' for string in strings) + '</sst>'
+        ))
+        archive.writestr('xl/worksheets/sheet1.xml', (
+            f'<worksheet xmlns="{main}"><sheetData>{sheet}</sheetData></worksheet>'
+        ))
+    file.seek(0)
+    file.name = 'roster.xlsx'
+    return file
+
+
+@override_settings(**ROLE_INDEX_SETTINGS)
+class RosterImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', email='owner@example.com', password='x')
+        cls.users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(30)
+        ])
+        cls.workspace = Workspace.objects.create(name='workspace', owner=cls.owner)
+        WorkspaceRole.objects.create(user=cls.owner, workspace=cls.workspace, role='workspace_admin')
+        WorkspaceRole.objects.bulk_create([
+            WorkspaceRole(user=user, workspace=cls.workspace) for user in cls.users[:25]
+        ])
+        cls.category = Category.objects.create(name='category', workspace=cls.workspace)
+        with impersonate(cls.owner):
+            cls.channel = Channel.objects.create(name='channel', category=cls.category)
+
+    def setUp(self):
+        caches['roles'].clear()
+        workspace_acls.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = (
+            f'/api/workspaces/{self.workspace.id}/categories/{self.category.id}'
+            f'/channels/{self.channel.id}/members/import/'
+        )
+
+    def upload(self, file, **data):
+        return self.client.post(self.url, {'file': file, **data}, format='multipart')
+
+    def csv(self, text):
+        file = io.BytesIO(text.encode())
+        file.name = 'roster.csv'
+        return file
+
+    def test_csv(self):
+        lines = ['Email,Team,Role,Notes'] + [f'user{i}@example.com,team {i % 3},,x' for i in range(25)]
+        lines[1:1] = ['', 'user0@example.com,team 1,,', 'user26@example.com,,,', 'nobody@example.com,,,']
+        roster = '\r\n'.join(lines) + '\r\n'
+
+        with mock.patch('workspaces.roster.CHUNK_SIZE', 10):
+            response = self.upload(self.csv(roster), dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(
+            [report[status] for status in ('rows', 'created', 'updated', 'unchanged', 'error')],
+            [28, 25, 0, 0, 3]
+        )
+        self.assertEqual(report['new_teams'], ['team 0', 'team 1', 'team 2'])
+        self.assertEqual(
+            [(result['row'], result['detail']) for result in report['results'] if result['status'] == 'error'],
+            [(4, "User is not a workspace member."), (5, "User does not exist."), (6, "User is listed in row 3 already.")]
+        )
+        self.assertFalse(ChannelRole.objects.filter(channel=self.channel, role='reviewee').exists())
+        self.assertEqual(Team.objects.filter(channel=self.channel).count(), 1)
+
+        with mock.patch('workspaces.roster.CHUNK_SIZE', 10):
+            report = self.upload(self.csv(roster)).json()
+        self.assertEqual(report['created'], 25)
+        self.assertEqual(ChannelRole.objects.filter(channel=self.channel, team__team_name='team 2').count(), 8)
+        self.assertEqual(get_role_index(self.users[3].id).channel_role(self.channel.id), 'reviewee')
+
+        report = self.upload(self.csv(roster)).json()
+        self.assertEqual([report['created'], report['unchanged']], [0, 25])
+
+    def test_xlsx(self):
+        rows = [('user_email', 'role', 'team')] + [
+            (f'user{i}@example.com', 'reviewee', f'{i % 2}') for i in range(10)
+        ] + [('user10@example.com', 'reviewer', '')]
+        response = self.upload(xlsx(rows))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 11)
+        self.assertEqual(
+            ChannelRole.objects.get(channel=self.channel, user=self.users[10]).team.team_name,
+            'Reviewers'
+        )
+        self.assertEqual(ChannelRole.objects.filter(channel=self.channel, team__team_name='1').count(), 5)
+
+    def test_bad_files(self):
+        for file, detail in (
+            (self.csv('name,team\nx,y\n'), "The first row has to name a user_email column."),
+            (self.csv(''), "The file is empty."),
+            (io.BytesIO(b'user_email'), "Upload a .csv or .xlsx file."),
+        ):
+            with self.subTest(detail=detail):
+                response = self.upload(file)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['detail'], detail)
+        broken = io.BytesIO(b'not a zip')
+        broken.name = 'roster.xlsx'
+        self.assertEqual(self.upload(broken).json()['detail'], "The file isn't an XLSX workbook.")
+
+        wide = xlsx([('user_email', 'team'), ('user0@example.com', '1')], columns=['XFD'])
+        self.assertEqual(self.upload(wide).json()['created'], 1)
+        wide = xlsx([('user_email', 'team'), ('user1@example.com', '1')], columns=['XFE'])
+        self.assertEqual(self.upload(wide).json()['detail'], "The workbook has cells past column XFD.")
+        for limit in ('MAX_SHEET_SIZE', 'MAX_SHARED_STRINGS_SIZE', 'MAX_PART_SIZE'):
+            with self.subTest(limit=limit), mock.patch(f'workspaces.roster.{limit}', 100):
+                response = self.upload(xlsx([('user_email',), ('user1@example.com',)]))
+                self.assertEqual(response.json()['detail'], "The workbook is too large.")
@@ -28,6 +28,15 @@ from workspaces.views.iteration import (
     RevieweeIterationView,
     ReviewerIterationView
 )
+from workspaces.views.sidebar import (
+    WorkspaceSidebarView
+)
+from workspaces.views.members import (
+    BulkWorkspaceMemberView,
+    BulkCategoryMemberView,
+    BulkChannelMemberView,
+    ChannelRosterImportView,
+)
 
 router = DefaultRouter()
 router.register(r'workspaces', WorkspaceViewSet, basename='workspaces')
@@ -49,16 +58,41 @@ urlpatterns = [
         WorkspaceMemberView.as_view(), 
         name='workspace-member'
     ),
+    path(
+        f'{prefix_url}workspaces/<uuid:workspace_pk>/members/bulk/',
+        BulkWorkspaceMemberView.as_view(),
+        name='workspace-member-bulk'
+    ),
+    path(
+        f'{prefix_url}workspaces/<uuid:workspace_pk>/sidebar/',
+        WorkspaceSidebarView.as_view(),
+        name='workspace-sidebar'
+    ),
     path(
         f'{prefix_url}workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/members/', 
         CategoryMemberView.as_view(), 
         name='category-member'
     ),
+    path(
+        f'{prefix_url}workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/members/bulk/',
+        BulkCategoryMemberView.as_view(),
+        name='category-member-bulk'
+    ),
     path(
         f'{prefix_url}workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/channels/<uuid:channel_pk>/members/', 
         ChannelMemberView.as_view(), 
         name='channel-member'
     ),
+    path(
+        f'{prefix_url}workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/channels/<uuid:channel_pk>/members/bulk/',
+        BulkChannelMemberView.as_view(),
+        name='channel-member-bulk'
+    ),
+    path(
+        f'{prefix_url}workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/channels/<uuid:channel_pk>/members/import/',
+        ChannelRosterImportView.as_view(),
+        name='channel-member-import'
+    ),
     path(
         f'{prefix_url}workspaces/<uuid:workspace_pk>/categories/<int:category_pk>/channels/<uuid:pk>/assignment/',
         AssignmentView.as_view(), 
@@ -0,0 +1,69 @@
+"""Version counters of workspaces and channels, for conditional GETs.
+
+Every write that changes what a read endpoint of a workspace or channel
+returns bumps the counter of that workspace or channel in the cache
+ROLE_INDEX['CACHE'] names, see workspaces.signals.versions. The read
+endpoints derive their ETag from the counters they depend on and answer
+a matching If-None-Match with 304 before loading anything, see
+workspaces.views.conditional.
+
+Counters are read before the data they describe and bumped both when a
+write happens and after it commits, so a response is never older than
+its ETag claims."""
+import time
+import uuid
+
+from django.db import transaction
+
+from workspaces.roles import role_cache
+
+
+def _uuid(value):
+    # ids come from models, role indexes and URL kwargs alike
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def workspace_version_key(workspace_id):
+    return f'workspaces:version:workspace:{_uuid(workspace_id)}'
+
+
+def channel_version_key(channel_id):
+    return f'workspaces:version:channel:{_uuid(channel_id)}'
+
+
+def _initial_version():
+    # an evicted counter starts again above any value it had, so an ETag
+    # of an old version can't match it by chance
+    return time.time_ns() // 1000
+
+
+def get_versions(keys):
+    """key -> current value of the counters `keys`, one cache round trip
+    unless some have to be started."""
+    cache = role_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def _bump(key):
+    cache = role_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+
+def _bump_all(keys):
+    for key in keys:
+        _bump(key)
+
+
+def bump_versions(keys):
+    """Bump the counters `keys` now and again after commit, so a read
+    racing the transaction can't keep the old data under the new version."""
+    _bump_all(keys)
+    transaction.on_commit(lambda: _bump_all(keys))
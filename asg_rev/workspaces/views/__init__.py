@@ -20,4 +20,13 @@ from workspaces.views.submission import (
 from workspaces.views.iteration import (
     RevieweeIterationView,
     ReviewerIterationView
+)
+from workspaces.views.sidebar import (
+    WorkspaceSidebarView,
+)
+from workspaces.views.members import (
+    BulkWorkspaceMemberView,
+    BulkCategoryMemberView,
+    BulkChannelMemberView,
+    ChannelRosterImportView,
 )
\ No newline at end of file
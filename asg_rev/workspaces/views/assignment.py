@@ -1,9 +1,8 @@
 from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import exceptions
-from django.shortcuts import get_object_or_404
 
-from workspaces.models import Assignment, Channel
+from workspaces.models import Assignment
 from workspaces.serializers import AssignmentSerializer
 from workspaces.permissions import (
     IsWorkspaceMember,
@@ -12,14 +11,23 @@ from workspaces.permissions import (
     IsReviewer, 
     IsReviewee,
 )
+from workspaces.routes import request_route
+from workspaces.views.conditional import ConditionalGetMixin
 
-class AssignmentView(RetrieveUpdateAPIView):
+class AssignmentView(ConditionalGetMixin, RetrieveUpdateAPIView):
     serializer_class = AssignmentSerializer
+    etag_scope = 'channel'
     lookup_field = 'pk'
     def get_queryset(self):
-        channel_pk = self.kwargs.get('pk')
-        channel = get_object_or_404(Channel, id=channel_pk)
-        return Assignment.objects.filter(id=channel)
+        return Assignment.objects.filter(id=self.kwargs.get('pk'))
+
+    def get_object(self):
+        # loaded with the channel the URL names
+        assignment = request_route(self.request, self).assignment
+        if assignment is None:
+            raise exceptions.NotFound("Assignment not found")
+        self.check_object_permissions(self.request, assignment)
+        return assignment
 
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -4,7 +4,6 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 
-from workspaces.models.workspace import Workspace
 from workspaces.models import (
     Category, 
     CategoryRole,
@@ -13,42 +12,33 @@ from workspaces.models import (
 from workspaces.permissions import (
     IsWorkspaceMember, 
     IsWorkspaceOwnerOrAdmin,
+    request_membership,
 )
 from workspaces.serializers import (
     CategorySerializer,
     CategoryRoleSerializer,
 )
 from workspaces import utils
+from workspaces.routes import request_route
+from workspaces.views.conditional import ConditionalGetMixin
 
 from django.shortcuts import get_object_or_404
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all() 
     serializer_class = CategorySerializer
 
     def get_queryset(self):
-        user = self.request.user
         workspace_id = self.kwargs.get('workspace_pk')
-        workspace = get_object_or_404(Workspace, id=workspace_id)
-
-        if not CategoryRole.objects.filter(user=user, category__workspace=workspace).exists():
-            return Category.objects.none()
-
-        category_ids = CategoryRole.objects.filter(
-                user=user, 
-                category__workspace=workspace
-            ).values_list('category', flat=True)
-
-        return Category.objects.filter(id__in=category_ids)
+        # the permissions already answered 404 for a missing workspace
+        roles = request_membership(self.request, self).roles
+        return Category.objects.filter(
+            id__in=roles.category_ids(),
+            workspace_id=workspace_id
+        )
 
     def perform_create(self, serializer):
-        workspace_id = self.kwargs.get('workspace_pk')
-        try:
-            workspace = Workspace.objects.get(id=workspace_id)
-        except Workspace.DoesNotExist:
-            raise ValidationError({"detail": "Workspace does not exist"})
-        
-        serializer.save(workspace=workspace)
+        serializer.save(workspace=request_route(self.request, self).workspace)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -58,7 +48,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         
         return [permission() for permission in permission_classes]
 
-class CategoryMemberView(APIView):
+class CategoryMemberView(ConditionalGetMixin, APIView):
     def get_permissions(self):
         if self.request.method in ['POST','DELETE','PUT']:
             permission_classes = [IsWorkspaceOwnerOrAdmin]
@@ -75,8 +65,8 @@ class CategoryMemberView(APIView):
         return Response(serializer.data)
 
     def post(self, request, workspace_pk, category_pk):
-        category = get_object_or_404(Category, pk=category_pk)
-        
+        category = request_route(request, self).category
+
         user_email = request.data.get('user_email')
         role = request.data.get('role', 'category_member')
 
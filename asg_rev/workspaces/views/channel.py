@@ -6,6 +6,9 @@ from rest_framework.permissions import IsAuthenticated
 
 from users.models import User
 from workspaces import utils
+from workspaces.acl import workspace_acls
+from workspaces.routes import request_route
+from workspaces.views.conditional import ConditionalGetMixin
 from workspaces.models import (
     Category,
     Channel, 
@@ -27,17 +30,17 @@ from workspaces.permissions import (
     IsWorkspaceMember,
 )
 
-class ChannelViewSet(viewsets.ModelViewSet):
+class ChannelViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ChannelSerializer
 
+    def get_etag_scope(self):
+        # a list shows every channel of the category
+        return 'channel' if self.action == 'retrieve' else 'workspace'
+
     def get_queryset(self):
-        user = self.request.user
-        category_id = self.kwargs.get('category_pk')
-        channel_ids = ChannelRole.objects.filter(user=user).values_list('channel', flat=True)
-        return Channel.objects.filter(
-            id__in=channel_ids,
-            category_id=category_id
-        )
+        acl = workspace_acls.get(self.kwargs.get('workspace_pk'))
+        channel_ids = acl.visible_channels(self.request.user.id, self.kwargs.get('category_pk'))
+        return Channel.objects.filter(id__in=channel_ids)
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy', 'create']:
@@ -49,7 +52,9 @@ class ChannelViewSet(viewsets.ModelViewSet):
 
         return [permission() for permission in permission_classes]
 
-class ChannelMemberView(APIView):
+class ChannelMemberView(ConditionalGetMixin, APIView):
+    etag_scope = 'channel'
+
     def get_permissions(self):
         if self.request.method in ['POST','DELETE','PUT']:
             permission_classes = [IsWorkspaceOwnerOrAdmin | IsReviewer]
@@ -76,7 +81,7 @@ class ChannelMemberView(APIView):
         return Response(serializer.data)
 
     def post(self, request, workspace_pk, category_pk, channel_pk):
-        channel = get_object_or_404(Channel, pk=channel_pk)
+        channel = request_route(request, self).channel
         email = request.data.get('user_email')
         role = request.data.get('role', 'reviewee')
         team_name = request.data.get('team')
@@ -0,0 +1,90 @@
+"""Conditional GETs of the workspace and channel read endpoints.
+
+Clients refetch the same workspace, category and channel lists on every
+screen focus. These endpoints send a strong ETag derived from the version
+counters their response depends on (see workspaces.versions), and answer
+an If-None-Match that still matches with 304 right after the permission
+checks, which only need the route and the cached role index, before any
+queryset or serializer runs."""
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from workspaces.permissions import request_membership
+from workspaces.routes import hierarchy_ids
+from workspaces.versions import (
+    channel_version_key,
+    get_versions,
+    workspace_version_key,
+)
+
+
+class NotModified(Exception):
+    """The client's copy of the response is current."""
+
+
+class ConditionalGetMixin:
+    """ETags and 304s for GET and HEAD.
+
+    `etag_scope` names the counter the response depends on: 'workspace'
+    for the URL's workspace, the user's workspaces when the URL names
+    none, or 'channel' for the URL's channel. The user's role index
+    version is part of every ETag, responses differ by what the user is
+    in."""
+
+    etag_scope = 'workspace'
+    response_etag = None
+
+    def get_etag_scope(self):
+        return self.etag_scope
+
+    def get_version_keys(self):
+        ids = hierarchy_ids(self.kwargs)
+        if self.get_etag_scope() == 'channel':
+            return [channel_version_key(ids['channel'])]
+        if ids['workspace'] is None:
+            roles = request_membership(self.request, self).roles
+            return sorted(workspace_version_key(workspace_id) for workspace_id in roles.workspace_ids())
+        return [workspace_version_key(ids['workspace'])]
+
+    def get_etag(self, request):
+        roles = request_membership(request, self).roles
+        keys = self.get_version_keys()
+        # read before the response is built, so it is never older than
+        # the versions it is tagged with
+        versions = get_versions(keys)
+        parts = [
+            request.get_full_path(),
+            request.accepted_media_type,
+            str(request.user.pk),
+            str(roles.version),
+            *(f'{key}={versions[key]}' for key in keys),
+        ]
+        return '"%s"' % hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return
+        self.response_etag = self.get_etag(request)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # If-None-Match compares weakly
+            etags = [etag.removeprefix('W/') for etag in parse_etags(if_none_match)]
+            if '*' in etags or self.response_etag in etags:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.response_etag is not None and response.status_code in (200, 304):
+            response['ETag'] = self.response_etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -33,7 +33,8 @@ class ReviewerIterationView(APIView):
         """Create a new iteration with remarks and optionally update status."""
         submission = get_object_or_404(
             Submission.objects.select_related('assignment', 'sender'),
-            id=submission_id
+            id=submission_id,
+            assignment_id=channel_pk
         )
 
         iteration_serializer = IterationCreateSerializer(data=request.data)
@@ -62,7 +63,7 @@ class ReviewerIterationView(APIView):
 
     def get(self, request, workspace_pk, category_pk, channel_pk, submission_id):
         """Get iteration details with submission and status information."""
-        submission = get_object_or_404(Submission, id=submission_id)
+        submission = get_object_or_404(Submission, id=submission_id, assignment_id=channel_pk)
         iterations = Iteration.objects.filter(
             submission=submission,
             reviewer=request.user
@@ -82,8 +83,9 @@ class RevieweeIterationView(APIView):
     def get(self, request, workspace_pk, category_pk, channel_pk, submission_pk):
         """Get iterations with remarks and status for reviewee."""
         submission = get_object_or_404(
-            Submission,
-            id=submission_pk
+            Submission.objects.select_related('assignment'),
+            id=submission_pk,
+            assignment_id=channel_pk
         )
 
         iterations = Iteration.objects.filter(
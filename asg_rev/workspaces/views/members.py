@@ -0,0 +1,107 @@
+from rest_framework import status
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from workspaces.members import (
+    MAX_ROWS,
+    BulkCategoryMembers,
+    BulkChannelMembers,
+    BulkWorkspaceMembers,
+    summarize,
+)
+from workspaces.permissions import (
+    IsReviewer,
+    IsWorkspaceOwnerOrAdmin,
+)
+from workspaces.roster import RosterError, import_roster
+from workspaces.routes import request_route
+
+
+def _flag(data, name):
+    return str(data.get(name, '')).lower() in ('1', 'true', 'yes', 'on')
+
+
+class BulkMemberView(APIView):
+    """Add or update up to MAX_ROWS members in one request.
+
+    POST {"members": [{"user_email", "role", "team"}, ...]} answers with
+    the result of every row and counts of each status, see
+    workspaces.members. With "dry_run": true nothing is written."""
+
+    bulk_class = None
+    level = None
+    permission_classes = [IsWorkspaceOwnerOrAdmin]
+
+    def get_bulk(self, request, container, workspace_id):
+        return self.bulk_class(container, workspace_id, dry_run=_flag(request.data, 'dry_run'))
+
+    def post(self, request, **kwargs):
+        members = request.data.get('members')
+        if not isinstance(members, list) or not members:
+            return Response(
+                {"detail": "members must be a non-empty list."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(members) > MAX_ROWS:
+            return Response(
+                {"detail": f"At most {MAX_ROWS} members per request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        route = request_route(request, self)
+        bulk = self.get_bulk(request, getattr(route, self.level), route.workspace.pk)
+        return Response(summarize(bulk.add(members)), status=status.HTTP_200_OK)
+
+
+class BulkWorkspaceMemberView(BulkMemberView):
+    """Users who aren't members yet are invited by email, with "direct":
+    true they are added without an invitation."""
+
+    bulk_class = BulkWorkspaceMembers
+    level = 'workspace'
+
+    def get_bulk(self, request, container, workspace_id):
+        return self.bulk_class(
+            container,
+            workspace_id,
+            dry_run=_flag(request.data, 'dry_run'),
+            direct=_flag(request.data, 'direct')
+        )
+
+
+class BulkCategoryMemberView(BulkMemberView):
+    bulk_class = BulkCategoryMembers
+    level = 'category'
+
+
+class BulkChannelMemberView(BulkMemberView):
+    bulk_class = BulkChannelMembers
+    level = 'channel'
+    permission_classes = [IsWorkspaceOwnerOrAdmin | IsReviewer]
+
+
+class ChannelRosterImportView(APIView):
+    """Add or update channel members from an uploaded roster.
+
+    POST a multipart `file`, a .csv or .xlsx with user_email, role and
+    team columns, and optionally `dry_run`, see workspaces.roster."""
+
+    parser_classes = [MultiPartParser, FormParser]
+    permission_classes = [IsWorkspaceOwnerOrAdmin | IsReviewer]
+
+    def post(self, request, workspace_pk, category_pk, channel_pk):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "A roster file is required."}, status=status.HTTP_400_BAD_REQUEST)
+        route = request_route(request, self)
+        try:
+            report = import_roster(
+                route.channel,
+                route.workspace.pk,
+                upload,
+                upload.name,
+                dry_run=_flag(request.data, 'dry_run')
+            )
+        except RosterError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
@@ -0,0 +1,104 @@
+from django.db.models import (
+    Count,
+    IntegerField,
+    Min,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from chats.unread import unread_expression
+
+from workspaces.models import (
+    AssignmentStatus,
+    Category,
+    Channel,
+    ChannelRole,
+    Task,
+)
+from workspaces.permissions import (
+    IsWorkspaceMember,
+    request_membership,
+)
+from workspaces.routes import request_route
+from workspaces.serializers import SidebarCategorySerializer
+
+
+def _task_summary(aggregate, **filters):
+    return Subquery(
+        Task.objects.filter(
+            assignment_id=OuterRef('pk'),
+            **filters
+        ).order_by().values('assignment').annotate(value=aggregate).values('value')
+    )
+
+
+def sidebar_categories(user, workspace, roles):
+    """The categories of the workspace the user is in, each with the
+    user's channels in `sidebar_channels`, annotated with their task
+    count, next due date and the user's read cursor. Two queries however
+    large the workspace is."""
+    membership = ChannelRole.objects.filter(user=user, channel=OuterRef('pk'))
+    channels = Channel.objects.filter(
+        id__in=roles.channel_ids()
+    ).select_related('assignment').annotate(
+        task_count=Coalesce(_task_summary(Count('*')), Value(0), output_field=IntegerField()),
+        next_due_date=_task_summary(Min('due_date'), due_date__gte=timezone.localdate()),
+        last_read_seq=Subquery(membership.values('last_read_seq')[:1]),
+        last_read_message_id=Subquery(membership.values('last_read_message_id')[:1]),
+    ).annotate(
+        unread_count=unread_expression(OuterRef('pk'), user.id, OuterRef('last_read_seq')),
+    ).order_by('name', 'id')
+
+    return Category.objects.filter(
+        workspace=workspace,
+        id__in=roles.category_ids()
+    ).prefetch_related(
+        Prefetch('channel', queryset=channels, to_attr='sidebar_channels')
+    ).order_by('id')
+
+
+def assignment_statuses(workspace, roles):
+    """channel id -> {'status', 'earned_points'} of the user's teams in
+    the workspace."""
+    team_ids = {team_id for _, team_id in roles.channels.values() if team_id is not None}
+    if not team_ids:
+        return {}
+    return {
+        status['assignment_id']: status
+        for status in AssignmentStatus.objects.filter(
+            team_id__in=team_ids,
+            assignment__id__category__workspace=workspace
+        ).values('assignment_id', 'status', 'earned_points')
+    }
+
+
+class WorkspaceSidebarView(APIView):
+    """Everything the sidebar shows in one response: the caller's
+    categories, their channels with role, team and unread count, and the
+    channel's assignment with task count, next due date and the team's
+    status. A constant number of queries whatever the workspace's size."""
+    permission_classes = [IsWorkspaceMember]
+
+    def get(self, request, workspace_pk):
+        workspace = request_route(request, self).workspace
+        roles = request_membership(request, self).roles
+        categories = sidebar_categories(request.user, workspace, roles)
+        serializer = SidebarCategorySerializer(
+            categories,
+            many=True,
+            context={
+                'request': request,
+                'roles': roles,
+                'statuses': assignment_statuses(workspace, roles),
+            }
+        )
+        return Response({
+            'workspace': {'id': workspace.id, 'name': workspace.name},
+            'categories': serializer.data,
+        })
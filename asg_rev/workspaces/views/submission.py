@@ -1,12 +1,10 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import NotFound
 
 from workspaces.models import (
-    Assignment, 
     Submission,
-    ChannelRole
 )
 from workspaces.serializers.submission import (
     SubmissionRevieweeSerializer,
@@ -21,7 +19,9 @@ from workspaces.permissions import (
     IsChannelMember,
     IsReviewer, 
     IsReviewee,
+    request_membership,
 )
+from workspaces.routes import request_route
 
 class SubmissionRevieweeView(APIView):
     permission_classes = [
@@ -30,23 +30,22 @@ class SubmissionRevieweeView(APIView):
     ]
 
     def get_assignment(self):
-        channel_pk = self.kwargs.get('channel_pk')
-        return get_object_or_404(Assignment, id=channel_pk)
-
-    def get_team(self, request):
-        channel_role = ChannelRole.objects.filter(
-            user=request.user,
-            channel=self.get_assignment().id
-        ).first()
-        if channel_role and channel_role.team:
-            return channel_role.team
+        assignment = request_route(self.request, self).assignment
+        if assignment is None:
+            raise NotFound("Assignment not found")
+        return assignment
+
+    def get_team_id(self, request):
+        membership = request_membership(request, self).roles.channel_membership(
+            self.kwargs.get('channel_pk')
+        )
+        return membership and membership['team_id']
 
     def get(self, request, *args, **kwargs):
         assignment = self.get_assignment()
-        team = self.get_team(request)
+        team_id = self.get_team_id(request)
         submissions = Submission.objects.filter(
-           # sender_team=team,
-            sender_team=team,
+            sender_team_id=team_id,
             assignment=assignment
         )
         serializer = SubmissionRevieweeSerializer(submissions, many=True)
@@ -116,11 +115,10 @@ class SubmissionReviewerView(APIView):
     ]
 
     def get_assignment(self):
-        channel_pk = self.kwargs.get('channel_pk')
-        return get_object_or_404(
-            Assignment, 
-            id=channel_pk
-        )
+        assignment = request_route(self.request, self).assignment
+        if assignment is None:
+            raise NotFound("Assignment not found")
+        return assignment
 
     def get_submissions(self, assignment, team_id=None):
         if team_id:
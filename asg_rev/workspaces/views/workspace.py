@@ -6,16 +6,13 @@ from rest_framework.permissions import IsAuthenticated
 
 from django.shortcuts import get_object_or_404 , redirect
 from django.contrib.auth.tokens import default_token_generator
-from django.urls import reverse
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.utils.html import format_html
+from django.utils.http import urlsafe_base64_decode
 
 import base64
         
 from users.models.user import User
 from workspaces import utils
+from workspaces.invitations import invitation_email
 from workspaces.models.workspace import (
     Workspace, 
     WorkspaceRole,
@@ -34,14 +31,16 @@ from workspaces.permissions.workspace import (
     IsWorkspaceMember, 
     IsWorkspaceOwnerOrAdmin
 )
+from workspaces.permissions.membership import request_membership
+from workspaces.routes import request_route
+from workspaces.views.conditional import ConditionalGetMixin
 
-class WorkspaceViewSet(ModelViewSet):
+class WorkspaceViewSet(ConditionalGetMixin, ModelViewSet):
     serializer_class = WorkspaceSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        workspace_ids = WorkspaceRole.objects.filter(user=user).values_list('workspace', flat=True)
-        return Workspace.objects.filter(id__in = workspace_ids)
+        roles = request_membership(self.request, self).roles
+        return Workspace.objects.filter(id__in=roles.workspace_ids())
 
     def perform_create(self, serializer):
         serializer.save()
@@ -56,7 +55,7 @@ class WorkspaceViewSet(ModelViewSet):
 
         return super().get_permissions()
 
-class WorkspaceMemberView(APIView):
+class WorkspaceMemberView(ConditionalGetMixin, APIView):
     def get_permissions(self):
         if self.request.method in ['POST','DELETE','PUT']:
             permission_classes = [IsWorkspaceOwnerOrAdmin]
@@ -77,8 +76,8 @@ class WorkspaceMemberView(APIView):
         return Response(serializer.data)
 
     def post(self, request, workspace_pk):
-        workspace = get_object_or_404(Workspace, pk=workspace_pk)
-        
+        workspace = request_route(request, self).workspace
+
         user_email = request.data.get('user_email')
         role = request.data.get('role', 'workspace_member')  
         if not user_email:
@@ -86,10 +85,7 @@ class WorkspaceMemberView(APIView):
 
         user = get_object_or_404(User, email=user_email)
 
-        token = default_token_generator.make_token(user)
-        user_id = str(user.pk).encode('utf-8')
-        uid = urlsafe_base64_encode(user_id)
-        self.send_invitation_email(user, workspace, token, uid, role)
+        invitation_email(user, workspace, role).send()
         return Response(
             {"detail": "Invitation has been sent to user"}, 
             status=status.HTTP_200_OK
@@ -143,34 +139,6 @@ class WorkspaceMemberView(APIView):
             status=status.HTTP_204_NO_CONTENT
         )
 
-    def send_invitation_email(self, user, workspace, token, uid, role):
-        accept_url = reverse(
-            'accept_workspace_invite', 
-            kwargs={
-                'workspace_pk': workspace.pk, 
-                'token': token,         
-                'uidb64': uid,    
-                'role': role 
-            }, 
-        )
-        print(accept_url)
-        invite_url=f"http://{settings.MY_DOMAIN}{accept_url}"
-
-        subject = "Invitation to join the Workspace"
-        html_content = format_html(
-            """
-            <p>Hello {username},</p>
-            <p>You have been invited to join a workspace. Click the link below to accept the invitation:</p>
-            <p><a href="{invite_url}" style="color: blue; text-decoration: underline;">Accept Invitation</a></p>
-            <p>If you did not request this, please ignore this email.</p>
-            """,
-            username=user.username,
-            invite_url=invite_url,
-        )
-        email = EmailMultiAlternatives(subject, "", None, [user.email])
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-
 from django.views import View
 from django.shortcuts import render
 